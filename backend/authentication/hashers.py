@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    Django's PBKDF2-SHA256 with the iteration count taken from
+    ``PASSWORD_PBKDF2_ITERATIONS``. Hashes keep the ``pbkdf2_sha256`` format,
+    so existing passwords still verify, and a hash made with a different
+    count is re-encoded the next time its user logs in.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
@@ -0,0 +1,72 @@
+"""
+Bounded pool for password hashing.
+
+Login and registration spend nearly all of their time in the password
+hasher. ``run_hashing`` runs that work on a fixed pool of ``WORKERS``
+threads (hashlib releases the GIL while hashing, so they use separate
+cores), with at most ``MAX_QUEUE`` more requests waiting. During a signup
+spike, extra requests wait up to ``QUEUE_TIMEOUT`` seconds and then get
+``HashingBusy`` (served as 503), instead of every request thread hashing at
+once and starving the rest of the API of CPU.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections
+
+
+class HashingBusy(Exception):
+    """Raised when a request waited longer than the queue timeout for the pool"""
+
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # authenticate() reads the user (and saves a rehash) on this thread
+        close_old_connections()
+
+
+class HashingPool:
+
+    def __init__(self, workers, max_queue, queue_timeout):
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='auth-hashing')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def run(self, func, *args, **kwargs):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HashingBusy(f"No hashing capacity within {self.queue_timeout}s")
+        try:
+            return self._executor.submit(_call, func, args, kwargs).result()
+        finally:
+            self._slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config = settings.AUTH_HASHING
+                _pool = HashingPool(
+                    workers=config['WORKERS'],
+                    max_queue=config['MAX_QUEUE'],
+                    queue_timeout=config['QUEUE_TIMEOUT'],
+                )
+    return _pool
+
+
+def run_hashing(func, *args, **kwargs):
+    """``func(*args, **kwargs)`` on the hashing pool; raises HashingBusy when saturated"""
+    return get_hashing_pool().run(func, *args, **kwargs)
+
+
+def hash_password(password):
+    return run_hashing(make_password, password)
@@ -7,6 +7,9 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from health.warmup import schedule_warmup
+
+from .hashing import HashingBusy, hash_password, run_hashing
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -25,8 +28,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
-        user = User.objects.create_user(**validated_data)
-        user.set_password(password)
+        # What create_user() does, but with the single hash done on the pool
+        user = User(**validated_data)
+        user.clean()
+        user.password = hash_password(password)
         user.save()
         return user
 
@@ -36,6 +41,14 @@ class LoginSerializer(serializers.Serializer):
     password = serializers.CharField()
 
 
+def hashing_busy_response():
+    response = Response({
+        'error': 'Too many sign-ins right now, please try again shortly'
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = '1'
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
@@ -44,8 +57,13 @@ def register(request):
     """
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
+        try:
+            user = serializer.save()
+        except HashingBusy:
+            return hashing_busy_response()
         token, created = Token.objects.get_or_create(user=user)
+        # Build the first home screen while the client handles the response
+        schedule_warmup(user)
         
         return Response({
             'user': {
@@ -72,9 +90,14 @@ def login(request):
         username = serializer.validated_data['username']
         password = serializer.validated_data['password']
         
-        user = authenticate(username=username, password=password)
+        try:
+            # Also upgrades the stored hash if the hasher settings changed
+            user = run_hashing(authenticate, username=username, password=password)
+        except HashingBusy:
+            return hashing_busy_response()
         if user:
             token, created = Token.objects.get_or_create(user=user)
+            schedule_warmup(user)
             return Response({
                 'user': {
                     'id': user.id,
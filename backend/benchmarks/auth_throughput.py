@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Register/login throughput with password hashing on and off the request thread.
+
+``--clients`` threads act as request threads: each registers users, then
+logs them in, for ``--duration`` seconds per phase. Another thread keeps
+issuing a cheap read and records its latency, which shows how much CPU the
+hashing leaves for the rest of the API. "baseline" is the old path: hash on
+the request thread, and register hashes twice (``create_user`` then
+``set_password``). "pooled" is the current path: one hash per registration,
+run on the bounded pool from authentication.hashing.
+
+Usage:
+    python benchmarks/auth_throughput.py --clients 16 --duration 5 --iterations 100000
+"""
+import argparse
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(db_path, iterations, workers):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'drugsheild_api.settings'
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    if iterations:
+        settings.PASSWORD_PBKDF2_ITERATIONS = iterations
+    if workers:
+        settings.AUTH_HASHING['WORKERS'] = workers
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def baseline_register(data):
+    from django.contrib.auth.models import User
+    password = data.pop('password')
+    user = User.objects.create_user(**data)
+    user.set_password(password)
+    user.save()
+    return user
+
+
+def pooled_register(data):
+    from authentication.views import UserRegistrationSerializer
+    serializer = UserRegistrationSerializer(data={**data, 'password_confirm': data['password']})
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def baseline_login(username, password):
+    from django.contrib.auth import authenticate
+    return authenticate(username=username, password=password)
+
+
+def pooled_login(username, password):
+    from django.contrib.auth import authenticate
+    from authentication.hashing import run_hashing
+    return run_hashing(authenticate, username=username, password=password)
+
+
+def probe(stop, latencies):
+    from django.contrib.auth.models import User
+    from django.db import connection
+    while not stop.is_set():
+        started = time.perf_counter()
+        list(User.objects.order_by('-pk').values('username', 'email')[:20])
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.005)
+    connection.close()
+
+
+def phase(func, clients, duration, make_args):
+    from authentication.hashing import HashingBusy
+    from django.db import connection
+
+    latencies, busy, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client():
+        local = []
+        while time.perf_counter() < deadline:
+            args = make_args()
+            if args is None:
+                break
+            started = time.perf_counter()
+            try:
+                func(*args)
+            except HashingBusy:
+                with lock:
+                    busy[0] += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+        connection.close()
+
+    stop, probe_latencies = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(stop, probe_latencies))
+    prober.start()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    prober.join()
+    return latencies, busy[0], elapsed, probe_latencies
+
+
+def p95(values):
+    return statistics.quantiles(values, n=20)[-1] if len(values) >= 2 else (values[0] if values else 0.0)
+
+
+def report(mode, name, latencies, busy, elapsed, probe_latencies):
+    print(f"{mode:<9} {name:<8} ok={len(latencies):<6} req/s={len(latencies) / elapsed:8.1f}  "
+          f"p50={statistics.median(latencies) * 1000 if latencies else 0:7.1f}ms  "
+          f"p95={p95(latencies) * 1000:7.1f}ms  busy={busy:<4} "
+          f"probe_p95={p95(probe_latencies) * 1000:6.1f}ms")
+
+
+def run(mode, clients, duration):
+    register, login = {
+        'baseline': (baseline_register, baseline_login),
+        'pooled': (pooled_register, pooled_login),
+    }[mode]
+    counter = itertools.count()
+    created, created_lock = [], threading.Lock()
+
+    def register_args():
+        name = f'{mode}-{next(counter)}'
+        with created_lock:
+            created.append(name)
+        return ({'username': name, 'email': f'{name}@example.com',
+                 'password': f'pw-{name}-secret'},)
+
+    report(mode, 'register', *phase(register, clients, duration, register_args))
+
+    logins = itertools.cycle(list(created))
+    next_login = threading.Lock()
+
+    def login_args():
+        with next_login:
+            name = next(logins)
+        return (name, f'pw-{name}-secret')
+
+    report(mode, 'login', *phase(login, clients, duration, login_args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent request threads')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per phase')
+    parser.add_argument('--iterations', type=int, help='PBKDF2 iterations (default: settings)')
+    parser.add_argument('--workers', type=int, help='hashing pool size (default: settings)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_django(os.path.join(tmp, 'bench.sqlite3'), args.iterations, args.workers)
+        from django.conf import settings
+        print(f"🔍 Auth throughput: {args.clients} clients, "
+              f"{settings.PASSWORD_PBKDF2_ITERATIONS} PBKDF2 iterations, "
+              f"{settings.AUTH_HASHING['WORKERS']} hashing workers")
+        for mode in ('baseline', 'pooled'):
+            run(mode, args.clients, args.duration)
+
+
+if __name__ == '__main__':
+    main()
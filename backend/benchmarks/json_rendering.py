@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Serialization time and bytes on the wire for a typical health summary.
+
+Builds a summary the size of an active user's home screen (profile, allergies,
+medications, recent checks and analyses, unread alerts) with the real
+serializers, then compares DRF's stdlib JSONRenderer with the orjson renderer
+and the response size uncompressed, gzipped and (if installed) brotli.
+
+Usage:
+    python benchmarks/json_rendering.py --iterations 2000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drugsheild_api.settings')
+    import django
+    django.setup()
+
+
+def build_summary():
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from health.models import (
+        Allergy, HealthAlert, Medication, RiskCheckRecord, SymptomAnalysis, UserProfile
+    )
+    from health.serializers import (
+        AllergySerializer, HealthAlertSerializer, MedicationSerializer,
+        RiskCheckRecordSerializer, SymptomAnalysisSerializer, UserProfileSerializer
+    )
+
+    now = timezone.now()
+    user = User(id=1, username='janedoe', email='jane@example.com', first_name='Jane', last_name='Doe')
+    profile = UserProfile(id=1, user=user, gender='female', blood_type='O+', height=168.0, weight=61.5,
+                          phone_number='+15550100', emergency_contact='John Doe',
+                          emergency_phone='+15550101', created_at=now, updated_at=now)
+    allergies = [
+        Allergy(id=i, user=user, name=name, severity='severe', symptoms='Hives, swelling and itching',
+                diagnosed_date=date(2020, 1, 1), created_at=now)
+        for i, name in enumerate(['Penicillin', 'Sulfa drugs', 'Peanuts', 'Latex', 'Aspirin'], 1)
+    ]
+    medications = [
+        Medication(id=i, user=user, name=f'Medication {i}', dosage='10mg', frequency='Twice daily',
+                   start_date=date(2024, 1, 1), prescribing_doctor='Dr. Smith',
+                   notes='Take with food. Avoid alcohol.', is_active=True, created_at=now)
+        for i in range(1, 7)
+    ]
+    risk_checks = [
+        RiskCheckRecord(id=i, user=user, drug_name='Amoxicillin', risk_level='high',
+                        potential_reactions=['Anaphylaxis', 'Urticaria', 'Angioedema'],
+                        recommendations='Avoid this drug.\nDiscuss alternatives such as macrolides with your doctor.\n' * 3,
+                        checked_at=now - timedelta(days=i))
+        for i in range(1, 6)
+    ]
+    analyses = [
+        SymptomAnalysis(id=i, user=user, symptoms='Rash and itching on both arms after a new medication',
+                        classification='allergic_reaction', confidence_score=0.86,
+                        ai_analysis='The pattern of symptoms is consistent with a mild allergic reaction. ' * 8,
+                        recommendations='Stop the new medication.\nTake an antihistamine.\nSee a doctor.',
+                        analyzed_at=now - timedelta(days=i))
+        for i in range(1, 6)
+    ]
+    alerts = [
+        HealthAlert(id=i, user=user, title='Possible interaction detected',
+                    message='A newly added medication may interact with one of your allergies. ' * 2,
+                    alert_type='warning', is_read=False, created_at=now - timedelta(hours=i))
+        for i in range(1, 11)
+    ]
+    return {
+        'user_profile': UserProfileSerializer(profile).data,
+        'allergies': AllergySerializer(allergies, many=True).data,
+        'medications': MedicationSerializer(medications, many=True).data,
+        'recent_risk_checks': RiskCheckRecordSerializer(risk_checks, many=True).data,
+        'recent_symptom_analyses': SymptomAnalysisSerializer(analyses, many=True).data,
+        'unread_alerts': HealthAlertSerializer(alerts, many=True).data,
+    }
+
+
+def time_per_call(func, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    import gzip
+    import io
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from drugsheild_api import middleware, renderers
+
+    summary = build_summary()
+    stdlib_body = JSONRenderer().render(summary)
+    fast_body = renderers.ORJSONRenderer().render(summary)
+
+    print("🔍 Health summary JSON benchmark")
+    print(f"orjson available: {renderers.orjson is not None}; identical output: {stdlib_body == fast_body}")
+    print(f"render stdlib : {time_per_call(lambda: JSONRenderer().render(summary), args.iterations):8.1f} µs")
+    print(f"render orjson : {time_per_call(lambda: renderers.ORJSONRenderer().render(summary), args.iterations):8.1f} µs")
+    print(f"parse  stdlib : {time_per_call(lambda: JSONParser().parse(io.BytesIO(stdlib_body)), args.iterations):8.1f} µs")
+    print(f"parse  orjson : {time_per_call(lambda: renderers.ORJSONParser().parse(io.BytesIO(stdlib_body)), args.iterations):8.1f} µs")
+
+    print(f"bytes raw     : {len(fast_body):8d}")
+    print(f"bytes gzip    : {len(gzip.compress(fast_body, 6)):8d}")
+    if middleware.brotli is not None:
+        print(f"bytes brotli  : {len(middleware.brotli.compress(fast_body, quality=5)):8d}")
+    else:
+        print("bytes brotli  :      n/a (pip install brotli)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Endpoint and admin latency as the database grows.
+
+For each scale a fresh SQLite database is filled by the synthetic data
+generator, plus one probe user whose history has a fixed size. Every
+endpoint is then timed as the probe user (and every admin changelist as a
+superuser). Per-user endpoints should stay flat as total volume grows, so
+the growth exponent of latency against total rows is reported between
+consecutive scales and anything above --max-exponent is flagged.
+
+Usage:
+    python benchmarks/query_scaling.py --scales 200,2000,20000 --history 10
+"""
+import argparse
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = [
+    '/api/health/profiles/',
+    '/api/health/allergies/',
+    '/api/health/medications/',
+    '/api/health/risk-checks/',
+    '/api/health/symptom-analyses/',
+    '/api/health/chat-messages/',
+    '/api/health/alerts/',
+    '/api/health/alerts/unread-count/',
+    '/api/health/summary/',
+    '/api/health/sync/',
+]
+ADMIN_PAGES = [
+    '/admin/health/userprofile/',
+    '/admin/health/allergy/',
+    '/admin/health/medication/',
+    '/admin/health/riskcheckrecord/',
+    '/admin/health/riskcheckrecord/?q=probe',
+    '/admin/health/symptomanalysis/',
+    '/admin/health/chatmessage/',
+    '/admin/health/healthalert/',
+    '/admin/health/archivedrecord/',
+]
+
+
+def setup_django(db_path):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drugsheild_api.settings')
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    django.setup()
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+
+def switch_database(db_path):
+    from django.conf import settings
+    from django.db import connections
+    connections['default'].close()
+    settings.DATABASES['default']['NAME'] = db_path
+    connections['default'].settings_dict['NAME'] = db_path
+
+
+def build(users, history, probe_history):
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from health.synthetic import SyntheticDataGenerator
+
+    call_command('migrate', verbosity=0)
+    SyntheticDataGenerator(seed=users).generate(users, history)
+    # The probe user's history has the same size at every scale
+    SyntheticDataGenerator(seed=0, username_prefix='probe').generate(1, probe_history)
+    probe = User.objects.get(username='probe0')
+    admin = User.objects.create_superuser('bench-admin', 'admin@example.com', 'bench-password')
+    return probe, admin
+
+
+def total_rows():
+    from django.apps import apps
+    return sum(model.objects.count() for model in apps.get_app_config('health').get_models())
+
+
+def time_get(client, url, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return statistics.median(timings) * 1000, len(queries.captured_queries)
+
+
+def measure(probe, admin, repeat):
+    from django.test import Client
+    from rest_framework.test import APIClient
+
+    api = APIClient()
+    api.force_authenticate(probe)
+    site = Client()
+    site.force_login(admin)
+    results = {}
+    for url in ENDPOINTS:
+        results[url] = time_get(api, url, repeat)
+    for url in ADMIN_PAGES:
+        results[url] = time_get(site, url, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--scales', default='200,2000,20000', help='Comma-separated user counts')
+    parser.add_argument('--history', type=int, default=10, help='Mean history rows per user per table')
+    parser.add_argument('--probe-history', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--max-exponent', type=float, default=1.0,
+                        help='Flag latency growing faster than total_rows ** this')
+    args = parser.parse_args()
+    scales = [int(s) for s in args.scales.split(',')]
+
+    workdir = tempfile.mkdtemp(prefix='query-scaling-')
+    setup_django(os.path.join(workdir, f'scale-{scales[0]}.sqlite3'))
+
+    runs = []
+    for users in scales:
+        switch_database(os.path.join(workdir, f'scale-{users}.sqlite3'))
+        started = time.perf_counter()
+        probe, admin = build(users, args.history, args.probe_history)
+        rows = total_rows()
+        print(f"🔧 {users:,} users, {rows:,} rows built in {time.perf_counter() - started:.1f}s")
+        runs.append((rows, measure(probe, admin, args.repeat)))
+
+    header = ''.join(f"{rows:>14,}" for rows, _ in runs)
+    print(f"\n🔍 Median latency in ms (queries) by total rows\n{'path':<44}{header}  exponent")
+    flagged = []
+    for url in ENDPOINTS + ADMIN_PAGES:
+        cells = ''.join(f"{r[url][0]:>9.1f} ({r[url][1]:>2})" for _, r in runs)
+        exponents = [
+            math.log(max(b[url][0], 1e-3) / max(a[url][0], 1e-3)) / math.log(rows_b / rows_a)
+            for (rows_a, a), (rows_b, b) in zip(runs, runs[1:])
+        ]
+        worst = max(exponents) if exponents else 0.0
+        mark = '  ⚠️ super-linear' if worst > args.max_exponent else ''
+        if mark:
+            flagged.append(url)
+        print(f"{url:<44}{cells}  {worst:>6.2f}{mark}")
+
+    if flagged:
+        print(f"\n❌ {len(flagged)} paths grow faster than rows^{args.max_exponent}")
+        sys.exit(1)
+    print(f"\n✅ No path grows faster than rows^{args.max_exponent}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Per-row cost of ModelSerializer vs the values-based fast path.
+
+Loads N rows per model into an in-memory database and renders each list
+both ways, checking that the output is identical.
+
+Usage:
+    python benchmarks/serializer_fast_path.py --rows 10000
+"""
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drugsheild_api.settings')
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = ':memory:'
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def load_rows(count):
+    from datetime import date
+    from django.contrib.auth.models import User
+    from health.models import (
+        Allergy, ChatMessage, HealthAlert, RiskCheckRecord, SymptomAnalysis, UserProfile
+    )
+
+    users = User.objects.bulk_create([
+        User(username=f'user{i}', email=f'user{i}@example.com', first_name='Jane', last_name='Doe')
+        for i in range(count)
+    ])
+    owner = users[0]
+    UserProfile.objects.bulk_create([UserProfile(user=u, blood_type='A+', height=170.0) for u in users])
+    Allergy.objects.bulk_create([
+        Allergy(user=owner, name=f'Allergy {i}', severity='moderate', symptoms='Hives',
+                diagnosed_date=date(2020, 1, 1))
+        for i in range(count)
+    ])
+    RiskCheckRecord.objects.bulk_create([
+        RiskCheckRecord(user=owner, drug_name='Amoxicillin', risk_level='high',
+                        potential_reactions=['Anaphylaxis', 'Hives'], recommendations='Avoid')
+        for _ in range(count)
+    ])
+    SymptomAnalysis.objects.bulk_create([
+        SymptomAnalysis(user=owner, symptoms='Rash', classification='allergic_reaction',
+                        confidence_score=0.8, ai_analysis='Likely allergy', recommendations='See a doctor')
+        for _ in range(count)
+    ])
+    ChatMessage.objects.bulk_create([
+        ChatMessage(user=owner, message='Can I take ibuprofen?', response='Ask your doctor')
+        for _ in range(count)
+    ])
+    HealthAlert.objects.bulk_create([
+        HealthAlert(user=owner, title='Check', message='New interaction', alert_type='info')
+        for _ in range(count)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    load_rows(args.rows)
+
+    from health.fast_serializers import render_values
+    from health.models import (
+        Allergy, ChatMessage, HealthAlert, RiskCheckRecord, SymptomAnalysis, UserProfile
+    )
+    from health.serializers import (
+        AllergySerializer, ChatMessageSerializer, HealthAlertSerializer,
+        RiskCheckRecordSerializer, SymptomAnalysisSerializer, UserProfileSerializer
+    )
+
+    cases = [
+        (UserProfile, UserProfileSerializer),
+        (Allergy, AllergySerializer),
+        (RiskCheckRecord, RiskCheckRecordSerializer),
+        (SymptomAnalysis, SymptomAnalysisSerializer),
+        (ChatMessage, ChatMessageSerializer),
+        (HealthAlert, HealthAlertSerializer),
+    ]
+
+    print(f"🔍 Serializer fast path, {args.rows} rows per list (µs per row)")
+    print(f"{'serializer':<28}{'model':>10}{'values':>10}{'speedup':>10}  identical")
+    for model, serializer_class in cases:
+        queryset = model.objects.order_by('pk')
+        if model is UserProfile:
+            queryset = queryset.select_related('user')
+
+        start = time.perf_counter()
+        slow = serializer_class(queryset.all(), many=True).data
+        slow_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = render_values(serializer_class, queryset.all())
+        fast_time = time.perf_counter() - start
+
+        identical = [dict(row) for row in slow] == fast
+        print(f"{serializer_class.__name__:<28}{slow_time / args.rows * 1e6:>10.2f}"
+              f"{fast_time / args.rows * 1e6:>10.2f}{slow_time / fast_time:>9.1f}x  {identical}")
+
+
+if __name__ == '__main__':
+    main()
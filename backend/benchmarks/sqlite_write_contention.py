@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Concurrent write throughput on SQLite, before and after production mode.
+
+Each worker process mimics the AI endpoints: read the user's allergies,
+then insert a RiskCheckRecord, SymptomAnalysis or ChatMessage row in the
+same transaction. "baseline" uses Django's stock SQLite settings with a
+plain atomic block; "tuned" uses SQLITE_PRODUCTION_MODE (WAL, pragmas,
+IMMEDIATE transactions) and the retrying write path from health.db.
+
+Usage:
+    python benchmarks/sqlite_write_contention.py --workers 8 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(db_path, tuned):
+    sys.path.insert(0, BACKEND_DIR)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'drugsheild_api.settings'
+    os.environ['SQLITE_PRODUCTION_MODE'] = 'true' if tuned else 'false'
+    import django
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    django.setup()
+
+
+def prepare_database(db_path, tuned):
+    setup_django(db_path, tuned)
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from health.models import Allergy
+
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('bench', password='bench-password')
+    Allergy.objects.create(user=user, name='Penicillin', severity='severe')
+    return user.id
+
+
+def worker(db_path, tuned, user_id, duration, results):
+    setup_django(db_path, tuned)
+    from django.db import OperationalError, transaction
+    from health.db import write_with_retry
+    from health.models import Allergy, ChatMessage, RiskCheckRecord, SymptomAnalysis
+
+    def write_once(i):
+        allergies = list(Allergy.objects.filter(user_id=user_id).values_list('name', flat=True))
+        kind = i % 3
+        if kind == 0:
+            RiskCheckRecord.objects.create(
+                user_id=user_id, drug_name='Amoxicillin', risk_level='high',
+                potential_reactions=allergies, recommendations='Avoid'
+            )
+        elif kind == 1:
+            SymptomAnalysis.objects.create(
+                user_id=user_id, symptoms='rash, itching', classification='allergic_reaction',
+                confidence_score=0.9, ai_analysis='Likely allergy', recommendations='See a doctor'
+            )
+        else:
+            ChatMessage.objects.create(
+                user_id=user_id, message='Can I take ibuprofen?', response='Ask your doctor',
+                message_type='medication'
+            )
+
+    ok = errors = 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        try:
+            if tuned:
+                write_with_retry(lambda: write_once(i))
+            else:
+                with transaction.atomic():
+                    write_once(i)
+            ok += 1
+        except OperationalError:
+            errors += 1
+        i += 1
+    results.put((ok, errors))
+
+
+def run(mode, workers, duration):
+    tuned = mode == 'tuned'
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.sqlite3')
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(1) as pool:
+            user_id = pool.apply(prepare_database, (db_path, tuned))
+
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(target=worker, args=(db_path, tuned, user_id, duration, results))
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        totals = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    ok = sum(t[0] for t in totals)
+    errors = sum(t[1] for t in totals)
+    print(f"{mode:<9} workers={workers:<3} writes={ok:<7} "
+          f"writes/s={ok / duration:9.1f}  locked_errors={errors}")
+    return ok, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per mode')
+    args = parser.parse_args()
+
+    print("🔍 SQLite concurrent write benchmark")
+    for mode in ('baseline', 'tuned'):
+        run(mode, args.workers, args.duration)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Cold-start cost of the Django app: import time and peak RSS.
+
+Each run starts a fresh interpreter that sets up Django and loads the URL
+conf (which imports every view), then optionally preloads the AI SDK the
+way a worker with AI_SDK_PRELOAD=true does. Reports the median of the runs.
+
+Usage:
+    python benchmarks/startup.py --repeat 5
+    python benchmarks/startup.py --budget-ms 600   # exit 1 if over budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, os, resource, sys, time
+sys.path.insert(0, {backend!r})
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'drugsheild_api.settings')
+start = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver(settings.ROOT_URLCONF).url_patterns
+app_ms = (time.perf_counter() - start) * 1000
+sdk_loaded = 'google.generativeai' in sys.modules
+preload_ms = None
+if {preload!r}:
+    from health.gemini_service import preload
+    start = time.perf_counter()
+    preload()
+    preload_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{
+    'app_ms': app_ms,
+    'preload_ms': preload_ms,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'sdk_loaded': sdk_loaded,
+}}))
+"""
+
+
+def run_once(preload):
+    code = CHILD.format(backend=BACKEND_DIR, preload=preload)
+    output = subprocess.run(
+        [sys.executable, '-c', code], capture_output=True, text=True, check=True, cwd=BACKEND_DIR
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(label, runs):
+    app_ms = statistics.median(r['app_ms'] for r in runs)
+    rss_mb = statistics.median(r['rss_mb'] for r in runs)
+    line = f"{label:<22}{app_ms:>10.0f}{rss_mb:>10.1f}"
+    if runs[0]['preload_ms'] is not None:
+        line += f"{statistics.median(r['preload_ms'] for r in runs):>12.0f}"
+    else:
+        line += f"{'-':>12}"
+    print(line + f"  {runs[0]['sdk_loaded']}")
+    return app_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='fail if the median app start time exceeds this')
+    args = parser.parse_args()
+
+    print(f"🔍 Django startup, median of {args.repeat} fresh interpreters")
+    print(f"{'mode':<22}{'app ms':>10}{'rss MB':>10}{'preload ms':>12}  sdk imported")
+    app_ms = summarize('lazy (default)', [run_once(False) for _ in range(args.repeat)])
+    summarize('AI_SDK_PRELOAD=true', [run_once(True) for _ in range(args.repeat)])
+
+    if args.budget_ms is not None and app_ms > args.budget_ms:
+        print(f"❌ startup {app_ms:.0f} ms exceeds budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+orjson-backed JSON renderer and parser for Django REST Framework.
+
+orjson is an optional dependency (``pip install orjson``). Without it, or for
+anything orjson can't represent the way DRF's stdlib encoder would (indented
+output, ASCII-only output, out-of-range integers), these classes defer to the
+stock JSONRenderer / JSONParser.
+
+The rendered documents decode to the same values either way, but they are not
+always byte-identical: orjson spells float exponents without a sign or
+padding (``1e16`` rather than ``1e+16``, ``1.5e-7`` rather than ``1.5e-07``),
+and it renders NaN and infinities as ``null`` where DRF's strict encoder
+raises ValueError.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def _default(self, obj):
+        # Datetimes, decimals, lazy strings etc. are formatted exactly like DRF does
+        return self.encoder_class().default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self._default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Match DRF: escape U+2028/U+2029 so the output is a strict JavaScript subset
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding') or 'utf-8'
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
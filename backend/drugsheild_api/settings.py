@@ -51,11 +51,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'drugsheild_api.middleware.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'health.routers.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -91,6 +93,70 @@ DATABASES = {
     }
 }
 
+# Production SQLite mode: WAL lets readers run alongside the single writer,
+# and IMMEDIATE transactions take the write lock up front so concurrent
+# writers wait in busy_timeout instead of failing with "database is locked"
+# when a read transaction tries to upgrade.
+SQLITE_PRODUCTION_MODE = os.getenv('SQLITE_PRODUCTION_MODE', 'true').lower() == 'true'
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # durable across app crashes; WAL keeps this safe
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'cache_size': -20000,  # ~20 MB page cache per connection
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PRODUCTION_MODE:
+    DATABASES['default']['OPTIONS'] = {
+        'transaction_mode': 'IMMEDIATE',
+        'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+        'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+    }
+
+# Read replicas: comma-separated SQLite files holding copies of the primary
+# (`python manage.py sync_replicas` refreshes them). Read-only health requests
+# use them; a user is pinned to the primary for PIN_SECONDS after a write.
+DATABASE_REPLICAS = [path for path in os.getenv('DATABASE_REPLICAS', '').split(',') if path.strip()]
+for _index, _path in enumerate(DATABASE_REPLICAS, 1):
+    DATABASES[f'replica{_index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': _path.strip(),
+        'OPTIONS': {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'init_command': ';'.join(
+                [f'PRAGMA {name}={SQLITE_PRAGMAS[name]}' for name in ('mmap_size', 'cache_size', 'temp_store')]
+                + ['PRAGMA query_only=ON']
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Per-user shards for the history tables (chat messages, risk checks, symptom
+# analyses): comma-separated SQLite files added after the primary, which is
+# shard 0. Only append to the list, then run `python manage.py rebalance_shards`.
+HEALTH_SHARD_FILES = [path for path in os.getenv('HEALTH_SHARD_FILES', '').split(',') if path.strip()]
+for _index, _path in enumerate(HEALTH_SHARD_FILES, 1):
+    DATABASES[f'shard{_index}'] = {**DATABASES['default'], 'NAME': _path.strip()}
+
+HEALTH_SHARDING = {
+    'ALIASES': ['default'] + [f'shard{index}' for index in range(1, len(HEALTH_SHARD_FILES) + 1)],
+    'ID_BLOCK': int(os.getenv('HEALTH_SHARD_ID_BLOCK', '100')),
+}
+
+DATABASE_ROUTERS = ['health.routers.ShardRouter', 'health.routers.ReadReplicaRouter']
+
+READ_REPLICAS = {
+    'ALIASES': [f'replica{index}' for index in range(1, len(DATABASE_REPLICAS) + 1)],
+    'PIN_SECONDS': float(os.getenv('READ_REPLICA_PIN_SECONDS', '5')),
+    'CACHE_ALIAS': 'health',
+}
+
+# Bounded retry for record inserts that still hit a locked database
+SQLITE_WRITE_RETRIES = int(os.getenv('SQLITE_WRITE_RETRIES', '3'))
+SQLITE_WRITE_RETRY_BACKOFF = float(os.getenv('SQLITE_WRITE_RETRY_BACKOFF', '0.05'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -111,6 +177,29 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashers: the first hashes new passwords, the others still verify
+# existing hashes, and a user's hash is upgraded to the first hasher (and the
+# current PBKDF2 iteration count) on their next login.
+PASSWORD_HASHERS = [
+    name.strip() for name in os.getenv('PASSWORD_HASHERS', ','.join([
+        'authentication.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+        'django.contrib.auth.hashers.ScryptPasswordHasher',
+    ])).split(',') if name.strip()
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '1000000'))
+
+# Login and registration hash on a bounded pool: WORKERS hashes at once, up to
+# MAX_QUEUE more requests waiting, and 503 after QUEUE_TIMEOUT seconds
+AUTH_HASHING = {
+    'WORKERS': int(os.getenv('AUTH_HASHING_WORKERS', str(os.cpu_count() or 2))),
+    'MAX_QUEUE': int(os.getenv('AUTH_HASHING_MAX_QUEUE', '64')),
+    'QUEUE_TIMEOUT': float(os.getenv('AUTH_HASHING_QUEUE_TIMEOUT', '10')),
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -142,8 +231,165 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    # orjson-backed JSON when orjson is installed; the same decoded values either
+    # way, though floats may be spelled differently (1e16 vs 1e+16)
+    'DEFAULT_RENDERER_CLASSES': [
+        'drugsheild_api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'drugsheild_api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    # Trusted reverse proxies in front of the app. With 0 the client IP is
+    # REMOTE_ADDR and X-Forwarded-For (set by the caller) is ignored.
+    'NUM_PROXIES': int(os.getenv('API_NUM_PROXIES', '0')),
+}
+
+# Responses at least this large are gzip/brotli compressed when the client
+# accepts it (brotli needs the optional `brotli` package)
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv('RESPONSE_COMPRESSION_MIN_SIZE', '1024'))
+RESPONSE_BROTLI_QUALITY = 5
+
+# The Gemini SDK is imported on the first AI call. Set AI_SDK_PRELOAD=true to
+# import it when a WSGI/ASGI worker starts instead (never for manage.py).
+AI_SDK_PRELOAD = os.getenv('AI_SDK_PRELOAD', 'false').lower() == 'true'
+
+# Admission control in front of the Gemini API. Calls are granted by priority
+# (emergency chat, symptom analysis, drug risk, general chat) and round-robin
+# between users; EMERGENCY_RESERVE extra slots are kept for emergency chat.
+# The limits are host-wide: workers share them through lock files in LOCK_DIR.
+AI_SCHEDULER = {
+    'MAX_CONCURRENCY': int(os.getenv('AI_MAX_CONCURRENCY', '4')),
+    'EMERGENCY_RESERVE': int(os.getenv('AI_EMERGENCY_RESERVE', '1')),
+    'QUEUE_TIMEOUT': float(os.getenv('AI_QUEUE_TIMEOUT', '30')),  # seconds
+    'LOCK_DIR': Path(os.getenv('AI_SCHEDULER_LOCK_DIR', BASE_DIR / 'ai_slots')),
+}
+
+# Token-bucket quotas on the AI endpoints, per user (or client IP when
+# anonymous). Bucket state is shared by all workers through a local SQLite file;
+# buckets that have refilled completely are pruned every
+# AI_THROTTLE_PRUNE_INTERVAL seconds.
+AI_THROTTLE_STORE_PATH = Path(os.getenv('AI_THROTTLE_STORE_PATH', BASE_DIR / 'throttle.sqlite3'))
+AI_THROTTLE_PRUNE_INTERVAL = 60
+AI_THROTTLE_BUCKETS = {
+    'ai_chat': {'capacity': 10, 'refill_per_minute': 6},
+    'drug_risk': {'capacity': 10, 'refill_per_minute': 10},
+    'symptom_analysis': {'capacity': 5, 'refill_per_minute': 5},
+}
+
+# Near-duplicate question cache for /api/health/chat/. Only questions asked
+# without user-specific context (allergies, medications) are cached.
+CHAT_SIMILARITY_CACHE = {
+    'ENABLED': os.getenv('CHAT_SIMILARITY_CACHE_ENABLED', 'true').lower() == 'true',
+    'THRESHOLD': float(os.getenv('CHAT_SIMILARITY_THRESHOLD', '0.8')),  # estimated Jaccard
+    'NUM_PERM': 64,
+    'BANDS': 16,
+    'SHINGLE_SIZE': 4,
+    'MAX_ENTRIES': 2048,
+    'TTL_SECONDS': 24 * 60 * 60,
+}
+
+# Local symptom triage model, written by `python manage.py train_triage_model`
+SYMPTOM_TRIAGE_MODEL_PATH = Path(os.getenv('SYMPTOM_TRIAGE_MODEL_PATH', BASE_DIR / 'triage_model.json'))
+
+# Thread pool for work moved off the request path (e.g. detailed AI write-ups)
+HEALTH_BACKGROUND_WORKERS = int(os.getenv('HEALTH_BACKGROUND_WORKERS', '4'))
+
+# Idempotency-Key on the AI POST endpoints: stored responses are replayed for
+# TTL seconds; a duplicate of an in-flight request waits up to WAIT_TIMEOUT,
+# and a pending key older than PENDING_TIMEOUT is considered abandoned.
+IDEMPOTENCY = {
+    'TTL': int(os.getenv('IDEMPOTENCY_TTL', str(24 * 60 * 60))),
+    'WAIT_TIMEOUT': float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', '30')),
+    'POLL_INTERVAL': 0.1,
+    'PENDING_TIMEOUT': int(os.getenv('IDEMPOTENCY_PENDING_TIMEOUT', '120')),
+}
+
+# Write-behind persistence for AI result records (SQLite only): rows get their
+# id immediately, are spooled to SPOOL_DIR and inserted in batches by a
+# background flusher. FSYNC=True also survives power loss, at ~1 fsync per record.
+HEALTH_WRITE_BEHIND = {
+    'ENABLED': os.getenv('HEALTH_WRITE_BEHIND_ENABLED', 'true').lower() == 'true',
+    'SPOOL_DIR': Path(os.getenv('HEALTH_WRITE_BEHIND_SPOOL_DIR', BASE_DIR / 'spool')),
+    'FLUSH_INTERVAL': float(os.getenv('HEALTH_WRITE_BEHIND_FLUSH_INTERVAL', '0.2')),  # seconds
+    'MAX_BATCH': int(os.getenv('HEALTH_WRITE_BEHIND_MAX_BATCH', '200')),
+    'ID_BLOCK': int(os.getenv('HEALTH_WRITE_BEHIND_ID_BLOCK', '50')),
+    'FSYNC': os.getenv('HEALTH_WRITE_BEHIND_FSYNC', 'false').lower() == 'true',
+}
+
+# Daily rollups of risk checks and symptom analyses behind the admin analytics
+# API; increments are added every FLUSH_INTERVAL seconds, MAX_DAYS caps ?days=
+HEALTH_ANALYTICS = {
+    'ENABLED': os.getenv('HEALTH_ANALYTICS_ENABLED', 'true').lower() == 'true',
+    'FLUSH_INTERVAL': float(os.getenv('HEALTH_ANALYTICS_FLUSH_INTERVAL', '5')),  # seconds
+    'MAX_DAYS': int(os.getenv('HEALTH_ANALYTICS_MAX_DAYS', '366')),
+}
+
+# Ledger of Gemini calls (tokens, latency, outcome, cache status) for the
+# admin rollup report; rows are inserted in batches every FLUSH_INTERVAL seconds
+LLM_LEDGER = {
+    'ENABLED': os.getenv('LLM_LEDGER_ENABLED', 'true').lower() == 'true',
+    'FLUSH_INTERVAL': float(os.getenv('LLM_LEDGER_FLUSH_INTERVAL', '2')),  # seconds
+    'MAX_BATCH': int(os.getenv('LLM_LEDGER_MAX_BATCH', '500')),
+    'RETENTION_DAYS': int(os.getenv('LLM_LEDGER_RETENTION_DAYS', '90')),
+}
+
+# Record sanitized AI endpoint exchanges for `replay_ai_requests` (off by
+# default); SAMPLE_RATE is the fraction of requests recorded
+AI_REPLAY_RECORDER = {
+    'ENABLED': os.getenv('AI_REPLAY_RECORDER_ENABLED', 'false').lower() == 'true',
+    'DIR': Path(os.getenv('AI_REPLAY_RECORDER_DIR', BASE_DIR / 'recordings')),
+    'SAMPLE_RATE': float(os.getenv('AI_REPLAY_RECORDER_SAMPLE_RATE', '1.0')),
+}
+
+# Shared cache for the health summary and login warm-up results; file-based
+# so every worker process on the host sees the same entries
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'health': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('HEALTH_CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('HEALTH_CACHE_MAX_ENTRIES', '20000'))},
+    },
+}
+
+# Login/register warm-up: build the user's summary and resolve drug risk for
+# their active medications in the background (RESOLVE_DRUG_RISK makes AI calls)
+HEALTH_WARMUP = {
+    'ENABLED': os.getenv('HEALTH_WARMUP_ENABLED', 'true').lower() == 'true',
+    'CACHE_ALIAS': 'health',
+    'SUMMARY_TTL': int(os.getenv('HEALTH_SUMMARY_CACHE_TTL', '600')),  # seconds
+    'RESOLVE_DRUG_RISK': os.getenv('HEALTH_WARMUP_DRUG_RISK', 'true').lower() == 'true',
+    'MAX_MEDICATIONS': int(os.getenv('HEALTH_WARMUP_MAX_MEDICATIONS', '10')),
+    'DRUG_RISK_TTL': int(os.getenv('HEALTH_WARMUP_DRUG_RISK_TTL', str(6 * 60 * 60))),
+}
+
+# Health history retention: rows older than this move to the compressed archive
+# (run `python manage.py archive_health_history`)
+HEALTH_ARCHIVE_AFTER_DAYS = int(os.getenv('HEALTH_ARCHIVE_AFTER_DAYS', '180'))
+HEALTH_ARCHIVE_BATCH_SIZE = int(os.getenv('HEALTH_ARCHIVE_BATCH_SIZE', '500'))
+
+# Delta sync (/api/health/sync/): re-send rows changed this many seconds before
+# the client's token, and keep delete tombstones this long (older tokens resync fully)
+HEALTH_SYNC_OVERLAP_SECONDS = 5
+HEALTH_SYNC_TOMBSTONE_DAYS = int(os.getenv('HEALTH_SYNC_TOMBSTONE_DAYS', '90'))
+
+# Population-level drug risk table, rebuilt nightly by
+# `python manage.py build_drug_risk_knowledge`. Observed verdicts are only
+# published for MIN_USERS+ distinct users and served when MIN_AGREEMENT of
+# them agree; TOP_DRUGS x ALLERGEN_SETS combinations are pre-warmed.
+DRUG_RISK_KNOWLEDGE = {
+    'ENABLED': os.getenv('DRUG_RISK_KNOWLEDGE_ENABLED', 'true').lower() == 'true',
+    'MIN_USERS': int(os.getenv('DRUG_RISK_KNOWLEDGE_MIN_USERS', '5')),
+    'MIN_AGREEMENT': float(os.getenv('DRUG_RISK_KNOWLEDGE_MIN_AGREEMENT', '0.8')),
+    'TOP_DRUGS': int(os.getenv('DRUG_RISK_KNOWLEDGE_TOP_DRUGS', '50')),
+    'ALLERGEN_SETS': int(os.getenv('DRUG_RISK_KNOWLEDGE_ALLERGEN_SETS', '10')),
 }
 
 # CORS settings for React Native frontend
@@ -1,54 +1,289 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Max, Min, Q, QuerySet, prefetch_related_objects
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
+from .llm_ledger import daily_rollups
 from .models import (
-    UserProfile, Allergy, Medication, RiskCheckRecord, 
-    SymptomAnalysis, ChatMessage, HealthAlert
+    UserProfile, Allergy, Medication, RiskCheckRecord,
+    SymptomAnalysis, ChatMessage, HealthAlert, ArchivedRecord, DrugRiskKnowledge,
+    LLMCallRecord
 )
+from .sharding import fan_out, fan_out_list, sharding_enabled
+
+# Filtered changelists stop counting after this many rows
+ADMIN_COUNT_LIMIT = 10000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Avoids COUNT(*) over large tables: an unfiltered changelist is sized from
+    the primary key range, a filtered one is counted up to ADMIN_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            bounds = queryset.model._default_manager.aggregate(low=Min('pk'), high=Max('pk'))
+            if bounds['high'] is None:
+                return 0
+            return bounds['high'] - bounds['low'] + 1
+        return queryset.order_by()[:ADMIN_COUNT_LIMIT].count()
+
+
+class FanOutPaginator(EstimatedCountPaginator):
+    """
+    EstimatedCountPaginator over every shard of a sharded table: counts are
+    combined per shard, and a page is the newest rows of each shard merged by
+    primary key (ids are global, so -pk is still newest first).
+    """
+
+    @cached_property
+    def count(self):
+        if not sharding_enabled():
+            return super().count
+        queryset = self.object_list
+        if not queryset.query.where:
+            bounds = [b for b in fan_out(lambda alias: queryset.model._default_manager.using(alias)
+                                         .aggregate(low=Min('pk'), high=Max('pk')))
+                      if b['high'] is not None]
+            if not bounds:
+                return 0
+            return max(b['high'] for b in bounds) - min(b['low'] for b in bounds) + 1
+        counts = fan_out(lambda alias: queryset.using(alias).order_by()[:ADMIN_COUNT_LIMIT].count())
+        return min(sum(counts), ADMIN_COUNT_LIMIT)
+
+    def page(self, number):
+        if not sharding_enabled():
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        rows = sorted(fan_out_list(self.object_list[:top]), key=lambda row: row.pk, reverse=True)
+        rows = rows[bottom:top]
+        # auth_user is not on the shards, so users come from the primary
+        prefetch_related_objects(rows, 'user')
+        return self._get_page(rows, number, self)
+
+
+class FanOutChangeList(ChangeList):
+
+    def get_results(self, request):
+        super().get_results(request)
+        if sharding_enabled() and isinstance(self.result_list, QuerySet):
+            # A single page is listed straight from the queryset, i.e. the primary
+            self.result_list = self.paginator.page(1).object_list
+
+
+class UsernameFilter(admin.SimpleListFilter):
+    """Text box for an exact username instead of a link per user"""
+    title = 'user'
+    parameter_name = 'username'
+    template = 'admin/health/username_filter.html'
+
+    def lookups(self, request, model_admin):
+        # The filter renders its own input; a placeholder keeps it visible
+        return [('', '')]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            # Resolved up front: sharded history tables cannot join auth_user
+            user_id = User.objects.filter(username=self.value()).values_list('pk', flat=True).first()
+            return queryset.filter(user_id=user_id)
+        return queryset
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value(),
+            'query_parts': [(k, v) for k, v in changelist.params.items() if k != self.parameter_name],
+            'clear_query_string': changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+
+def _prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables with millions of rows: users joined in the
+    same query, no full counts, newest-first by primary key, user picked by
+    autocomplete or exact username, and search limited to index-backed
+    lookups. ``^field`` is a case-sensitive prefix match done as an index
+    range (SQLite's LIKE cannot use an ordinary index); ``=field`` is exact.
+    """
+    list_select_related = ['user']
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    ordering = ['-id']
+    sortable_by = []
+    autocomplete_fields = ['user']
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        search_fields = self.get_search_fields(request)
+        if not search_term or not search_fields:
+            return queryset, False
+        condition = Q()
+        for field in search_fields:
+            condition |= self.search_condition(field, search_term)
+        return queryset.filter(condition), False
+
+    def search_condition(self, field, search_term):
+        if field.startswith('^'):
+            return Q(**{f'{field[1:]}__gte': search_term,
+                        f'{field[1:]}__lt': _prefix_upper_bound(search_term)})
+        if field.startswith('='):
+            return Q(**{field[1:]: search_term})
+        raise ValueError(f"{type(self).__name__}: search field {field!r} must be '^' or '='")
+
+
+class ShardedTableAdmin(LargeTableAdmin):
+    """
+    LargeTableAdmin for the sharded history tables. With sharding on, the
+    changelist and change form query every shard, users are prefetched from
+    the primary instead of joined, and user searches resolve ids first.
+    Bulk delete is off, since its queryset would only reach the primary.
+    """
+    paginator = FanOutPaginator
+    list_max_show_all = 0
+
+    def get_changelist(self, request, **kwargs):
+        return FanOutChangeList
+
+    def get_list_select_related(self, request):
+        if sharding_enabled():
+            # Not False: the changelist would then join the list_display FKs
+            return ()
+        return super().get_list_select_related(request)
+
+    def search_condition(self, field, search_term):
+        if sharding_enabled() and field[1:].startswith('user__'):
+            users = User.objects.filter(super().search_condition(field[0] + field[7:], search_term))
+            return Q(user_id__in=list(users.values_list('pk', flat=True)[:ADMIN_COUNT_LIMIT]))
+        return super().search_condition(field, search_term)
+
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding_enabled():
+            return super().get_object(request, object_id, from_field)
+        queryset = self.get_queryset(request)
+        field = self.model._meta.pk if from_field is None else self.model._meta.get_field(from_field)
+        try:
+            object_id = field.to_python(object_id)
+        except ValidationError:
+            return None
+        found = fan_out(lambda alias: queryset.using(alias).filter(**{field.name: object_id}).first())
+        return next((obj for obj in found if obj is not None), None)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if sharding_enabled():
+            actions.pop('delete_selected', None)
+        return actions
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ['user', 'gender', 'blood_type', 'created_at']
-    list_filter = ['gender', 'blood_type', 'created_at']
-    search_fields = ['user__username', 'user__email']
+    list_filter = ['gender', 'blood_type']
+    search_fields = ['^user__username']
 
 
 @admin.register(Allergy)
-class AllergyAdmin(admin.ModelAdmin):
+class AllergyAdmin(LargeTableAdmin):
     list_display = ['user', 'name', 'severity', 'created_at']
-    list_filter = ['severity', 'created_at']
-    search_fields = ['user__username', 'name']
+    list_filter = ['severity', UsernameFilter]
+    search_fields = ['^user__username']
 
 
 @admin.register(Medication)
-class MedicationAdmin(admin.ModelAdmin):
+class MedicationAdmin(LargeTableAdmin):
     list_display = ['user', 'name', 'dosage', 'is_active', 'start_date']
-    list_filter = ['is_active', 'start_date', 'created_at']
-    search_fields = ['user__username', 'name']
+    list_filter = ['is_active', UsernameFilter]
+    search_fields = ['^user__username']
 
 
 @admin.register(RiskCheckRecord)
-class RiskCheckRecordAdmin(admin.ModelAdmin):
-    list_display = ['user', 'drug_name', 'risk_level', 'checked_at']
-    list_filter = ['risk_level', 'checked_at']
-    search_fields = ['user__username', 'drug_name']
+class RiskCheckRecordAdmin(ShardedTableAdmin):
+    list_display = ['user', 'drug_name', 'risk_level', 'source', 'checked_at']
+    list_filter = ['risk_level', 'source', UsernameFilter]
+    search_fields = ['^user__username', '^drug_name']
 
 
 @admin.register(SymptomAnalysis)
-class SymptomAnalysisAdmin(admin.ModelAdmin):
-    list_display = ['user', 'classification', 'confidence_score', 'analyzed_at']
-    list_filter = ['classification', 'analyzed_at']
-    search_fields = ['user__username', 'symptoms']
+class SymptomAnalysisAdmin(ShardedTableAdmin):
+    list_display = ['user', 'classification', 'llm_classification', 'confidence_score', 'analyzed_at']
+    list_filter = ['classification', 'llm_classification', UsernameFilter]
+    search_fields = ['^user__username']
 
 
 @admin.register(ChatMessage)
-class ChatMessageAdmin(admin.ModelAdmin):
+class ChatMessageAdmin(ShardedTableAdmin):
     list_display = ['user', 'message_type', 'created_at']
-    list_filter = ['message_type', 'created_at']
-    search_fields = ['user__username', 'message']
+    list_filter = ['message_type', UsernameFilter]
+    search_fields = ['^user__username']
 
 
 @admin.register(HealthAlert)
-class HealthAlertAdmin(admin.ModelAdmin):
+class HealthAlertAdmin(LargeTableAdmin):
     list_display = ['user', 'title', 'alert_type', 'is_read', 'created_at']
-    list_filter = ['alert_type', 'is_read', 'created_at']
-    search_fields = ['user__username', 'title']
+    list_filter = ['alert_type', 'is_read', UsernameFilter]
+    search_fields = ['^user__username']
+
+
+@admin.register(ArchivedRecord)
+class ArchivedRecordAdmin(LargeTableAdmin):
+    list_display = ['user', 'record_type', 'original_id', 'created_at', 'archived_at']
+    list_filter = ['record_type', UsernameFilter]
+    search_fields = ['^user__username']
+    exclude = ['payload']
+    readonly_fields = ['record_type', 'original_id', 'user', 'created_at', 'archived_at']
+    autocomplete_fields = []
+
+
+@admin.register(DrugRiskKnowledge)
+class DrugRiskKnowledgeAdmin(admin.ModelAdmin):
+    list_display = ['drug', 'allergen_key', 'risk_level', 'user_count', 'agreement', 'source', 'updated_at']
+    list_filter = ['risk_level', 'source']
+    search_fields = ['drug', 'allergen_key']
+
+
+@admin.register(LLMCallRecord)
+class LLMCallRecordAdmin(LargeTableAdmin):
+    list_display = ['created_at', 'operation', 'model_name', 'user', 'prompt_tokens',
+                    'response_tokens', 'latency_ms', 'outcome', 'cache_status']
+    list_filter = ['operation', 'outcome', 'cache_status', UsernameFilter]
+    search_fields = ['^user__username']
+    change_list_template = 'admin/health/llmcallrecord/change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('rollups/', self.admin_site.admin_view(self.rollup_view), name='health_llmcallrecord_rollups'),
+        ] + super().get_urls()
+
+    def rollup_view(self, request):
+        """p95 latency, tokens and cache hits per operation per day"""
+        try:
+            days = min(max(int(request.GET.get('days', 14)), 1), 365)
+        except ValueError:
+            days = 14
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': f'LLM calls per operation per day (last {days} days)',
+            'days': days,
+            'rollups': daily_rollups(days),
+        }
+        return TemplateResponse(request, 'admin/health/llmcallrecord/rollups.html', context)
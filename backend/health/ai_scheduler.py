@@ -0,0 +1,208 @@
+"""
+Priority-aware admission control in front of GeminiAIService.
+
+Every AI call takes a slot before reaching the model. At most
+``MAX_CONCURRENCY`` calls run upstream at once, plus ``EMERGENCY_RESERVE``
+slots only emergency chat may use, so emergencies still start immediately
+when the normal slots are saturated. Waiting calls are granted strictly by
+priority class and round-robin between users within a class, so one busy
+client cannot starve the others.
+
+The limit is shared by every worker process on the host: a granted call
+also has to lock one of the slot files in ``LOCK_DIR`` (``flock``, so a
+worker that dies gives its slots back). Priority and fairness apply within
+a process; across processes the emergency reserve still holds.
+"""
+import fcntl
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PRIORITY_EMERGENCY = 0
+PRIORITY_SYMPTOMS = 1
+PRIORITY_DRUG_RISK = 2
+PRIORITY_CHAT = 3
+# Background work (login warm-up) only gets slots nobody else is waiting for
+PRIORITY_WARMUP = 4
+
+
+class SchedulerBusy(Exception):
+    """Raised when a call waited longer than the queue timeout for a slot"""
+
+
+class SharedSlots:
+    """Host-wide concurrency slots: ``slot-<n>.lock`` files held with flock"""
+
+    def __init__(self, lock_dir, max_concurrency, emergency_reserve):
+        self.lock_dir = lock_dir
+        self.max_concurrency = max_concurrency
+        self.emergency_reserve = emergency_reserve
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def try_acquire(self, priority):
+        """A locked file descriptor for a free slot, or None when all are taken"""
+        count = self.max_concurrency
+        if priority == PRIORITY_EMERGENCY:
+            count += self.emergency_reserve
+        for index in range(count):
+            # Each attempt opens its own descriptor, so threads of one process
+            # compete for slots like separate processes do
+            fd = os.open(os.path.join(self.lock_dir, f'slot-{index}.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def release(self, fd):
+        os.close(fd)
+
+
+class _Ticket:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AIRequestScheduler:
+
+    def __init__(self, max_concurrency=4, emergency_reserve=1, queue_timeout=30.0,
+                 shared=None, poll_interval=0.05):
+        self.max_concurrency = max_concurrency
+        self.emergency_reserve = emergency_reserve
+        self.queue_timeout = queue_timeout
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._active = 0
+        # priority -> OrderedDict(user_key -> deque of tickets); dict order is the round-robin order
+        self._waiting = {}
+
+    def _limit(self, priority):
+        if priority == PRIORITY_EMERGENCY:
+            return self.max_concurrency + self.emergency_reserve
+        return self.max_concurrency
+
+    def _has_waiters_at_or_above(self, priority):
+        return any(queues for p, queues in self._waiting.items() if p <= priority)
+
+    def _dispatch(self):
+        while self._waiting:
+            priority = min(p for p, queues in self._waiting.items() if queues)
+            if self._active >= self._limit(priority):
+                return
+            queues = self._waiting[priority]
+            user_key, tickets = next(iter(queues.items()))
+            ticket = tickets.popleft()
+            # Move the user to the back of the line for the next grant
+            del queues[user_key]
+            if tickets:
+                queues[user_key] = tickets
+            if not queues:
+                del self._waiting[priority]
+            ticket.granted = True
+            self._active += 1
+            ticket.event.set()
+
+    def acquire(self, priority, user_key):
+        with self._lock:
+            if self._active < self._limit(priority) and not self._has_waiters_at_or_above(priority):
+                self._active += 1
+                return
+            ticket = _Ticket()
+            self._waiting.setdefault(priority, OrderedDict()).setdefault(user_key, deque()).append(ticket)
+
+        ticket.event.wait(self.queue_timeout)
+        with self._lock:
+            if ticket.granted:
+                return
+            queues = self._waiting.get(priority, {})
+            tickets = queues.get(user_key)
+            if tickets is not None:
+                tickets.remove(ticket)
+                if not tickets:
+                    del queues[user_key]
+                if not queues:
+                    self._waiting.pop(priority, None)
+        raise SchedulerBusy(f"No AI capacity within {self.queue_timeout}s")
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    def _acquire_shared(self, priority, deadline):
+        while True:
+            fd = self.shared.try_acquire(priority)
+            if fd is not None:
+                return fd
+            if time.monotonic() >= deadline:
+                raise SchedulerBusy(f"No AI capacity within {self.queue_timeout}s")
+            time.sleep(self.poll_interval)
+
+    @contextmanager
+    def slot(self, priority, user_key):
+        deadline = time.monotonic() + self.queue_timeout
+        self.acquire(priority, user_key)
+        fd = None
+        try:
+            if self.shared is not None:
+                # Other workers may hold the host-wide slots
+                fd = self._acquire_shared(priority, deadline)
+            yield
+        finally:
+            if fd is not None:
+                self.shared.release(fd)
+            self.release()
+
+    def run(self, priority, user_key, func, *args, **kwargs):
+        with self.slot(priority, user_key):
+            return func(*args, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self._active,
+                'waiting': {
+                    p: sum(len(t) for t in queues.values()) for p, queues in self._waiting.items()
+                },
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                config = settings.AI_SCHEDULER
+                max_concurrency = config.get('MAX_CONCURRENCY', 4)
+                emergency_reserve = config.get('EMERGENCY_RESERVE', 1)
+                shared = None
+                if config.get('LOCK_DIR'):
+                    shared = SharedSlots(config['LOCK_DIR'], max_concurrency, emergency_reserve)
+                _scheduler = AIRequestScheduler(
+                    max_concurrency=max_concurrency,
+                    emergency_reserve=emergency_reserve,
+                    queue_timeout=config.get('QUEUE_TIMEOUT', 30.0),
+                    shared=shared,
+                )
+    return _scheduler
+
+
+def client_key(request):
+    """Fair-queuing key: the user id, or the client address for anonymous chat"""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
@@ -0,0 +1,241 @@
+"""
+Daily analytics rollups over risk checks and symptom analyses.
+
+``DrugCheckRollup`` counts risk checks per (day, canonical drug, risk level)
+and ``SymptomRollup`` counts symptom analyses per (day, classification).
+New rows are counted as they are written (``post_save``, the write-behind
+flush, the synthetic generator), buffered in memory and added to the
+rollups with one upsert per key every ``FLUSH_INTERVAL`` seconds. The
+analytics API reads only the rollups, so its cost depends on the window
+and the number of distinct drugs, not on the size of the history tables.
+
+Rollups count checks as they happened: later edits, deletes and archival do
+not change them. A crash can lose the last unflushed increments;
+``python manage.py rebuild_analytics_rollups`` recounts from the history
+tables and the archive. Other processes' buffered increments would land on
+top of a recount, so it stops at yesterday unless told that nothing else is
+writing.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .archive import ARCHIVED_MODELS, restore_record
+from .db import write_with_retry
+from .knowledge import RISK_LEVELS, canonical_drug
+from .models import ArchivedRecord, DrugCheckRollup, RiskCheckRecord, SymptomAnalysis, SymptomRollup
+from .sharding import fan_out
+
+logger = logging.getLogger(__name__)
+
+CLASSIFICATIONS = [value for value, _ in SymptomAnalysis._meta.get_field('classification').choices]
+
+
+def get_config():
+    return settings.HEALTH_ANALYTICS
+
+
+def _drug_check_key(row):
+    return (timezone.localdate(row.checked_at), canonical_drug(row.drug_name)[:100], row.risk_level)
+
+
+def _symptom_key(row):
+    return (timezone.localdate(row.analyzed_at), row.classification)
+
+
+# source model -> (rollup model, key columns, source fields (timestamp first), key of a row)
+ROLLUPS = {
+    RiskCheckRecord: (DrugCheckRollup, ('day', 'drug', 'risk_level'),
+                      ('checked_at', 'drug_name', 'risk_level'), _drug_check_key),
+    SymptomAnalysis: (SymptomRollup, ('day', 'classification'),
+                      ('analyzed_at', 'classification'), _symptom_key),
+}
+
+RECORD_TYPE_BY_MODEL = {model: name for name, (model, _) in ARCHIVED_MODELS.items()}
+
+
+def add_counts(rollup, columns, counts):
+    """Add ``counts`` ({key tuple: n}) to the rollup rows, creating missing ones"""
+    connection = connections['default']
+    quote = connection.ops.quote_name
+    table = quote(rollup._meta.db_table)
+    key_columns = ', '.join(quote(column) for column in columns)
+    placeholders = ', '.join(['%s'] * (len(columns) + 1))
+    count = quote('count')
+    sql = (f"INSERT INTO {table} ({key_columns}, {count}) VALUES ({placeholders}) "
+           f"ON CONFLICT ({key_columns}) DO UPDATE SET {count} = {table}.{count} + excluded.{count}")
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(*key, n) for key, n in counts.items()])
+
+
+class RollupBuffer:
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Held while writing, so flush_rollups() waits for a batch the thread already took
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # source model -> Counter of keys
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='health-analytics', daemon=True)
+        self._thread.start()
+
+    def add(self, rows):
+        keyed = [(type(row), ROLLUPS[type(row)][3](row)) for row in rows if type(row) in ROLLUPS]
+        with self._lock:
+            for model, key in keyed:
+                self._pending.setdefault(model, Counter())[key] += 1
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            def write():
+                for model, counts in batch.items():
+                    rollup, columns, _, _ = ROLLUPS[model]
+                    add_counts(rollup, columns, counts)
+
+            write_with_retry(write)
+            return sum(sum(counts.values()) for counts in batch.values())
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Analytics rollup flush failed; increments dropped")
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_rollup_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = RollupBuffer(get_config()['FLUSH_INTERVAL'])
+                atexit.register(_flush_at_exit)
+    return _buffer
+
+
+def _flush_at_exit():
+    try:
+        _buffer.flush()
+    except Exception as exc:
+        # e.g. the database is already gone; rebuild_analytics_rollups recounts
+        logger.warning("Analytics rollup flush at exit failed; increments dropped: %s", exc)
+
+
+def record_rows(rows):
+    """Count newly written RiskCheckRecord / SymptomAnalysis rows"""
+    if get_config()['ENABLED'] and rows:
+        get_rollup_buffer().add(rows)
+
+
+def flush_rollups():
+    if _buffer is not None:
+        _buffer.flush()
+
+
+def window_start(days):
+    """First day of a window of ``days`` days ending today"""
+    return timezone.localdate() - timedelta(days=days - 1)
+
+
+def _window_filter(field, since_day, until_day):
+    """Filter kwargs for ``field`` from the start of ``since_day`` up to ``until_day`` (each may be None)"""
+    window = {}
+    for lookup, day in ((f'{field}__gte', since_day), (f'{field}__lt', until_day)):
+        if day is not None:
+            window[lookup] = datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+    return window
+
+
+def rebuild_rollups(days=None, include_today=False):
+    """
+    Recount the rollups for the last ``days`` days (all history when None)
+    from the history tables on every shard and the archive. Returns the
+    number of rows counted.
+
+    Web workers may hold increments for today that this process cannot
+    flush, and they would be added on top of the recount, so today is left
+    to the live counters. Pass ``include_today`` only when nothing else is
+    writing.
+    """
+    flush_rollups()
+    since_day = window_start(days) if days else None
+    until_day = None if include_today else timezone.localdate()
+    counted = 0
+    for model, (rollup, columns, fields, key) in ROLLUPS.items():
+        def count_shard(alias, model=model, fields=fields, key=key):
+            queryset = (model.objects.using(alias).only(*fields)
+                        .filter(**_window_filter(fields[0], since_day, until_day)))
+            return Counter(key(row) for row in queryset.iterator())
+
+        counts = sum(fan_out(count_shard), Counter())
+        archived = ArchivedRecord.objects.filter(
+            record_type=RECORD_TYPE_BY_MODEL[model], **_window_filter('created_at', since_day, until_day),
+        )
+        counts.update(key(restore_record(row)) for row in archived.iterator())
+
+        with transaction.atomic():
+            stale = rollup.objects.all()
+            if since_day is not None:
+                stale = stale.filter(day__gte=since_day)
+            if until_day is not None:
+                stale = stale.filter(day__lt=until_day)
+            stale.delete()
+            rollup.objects.bulk_create(
+                [rollup(**dict(zip(columns, k)), count=n) for k, n in counts.items()], batch_size=1000,
+            )
+        counted += sum(counts.values())
+    return counted
+
+
+def top_drugs(days, limit):
+    rows = (DrugCheckRollup.objects
+            .filter(day__gte=window_start(days))
+            .values('drug')
+            .annotate(checks=Sum('count'))
+            .order_by('-checks', 'drug')[:limit])
+    return [{'drug': row['drug'], 'checks': row['checks']} for row in rows]
+
+
+def _daily_series(rollup, column, values, days):
+    """One entry per day in the window with a count per ``column`` value (zeros included)"""
+    start = window_start(days)
+    series = {start + timedelta(days=offset): Counter() for offset in range(days)}
+    rows = (rollup.objects
+            .filter(day__gte=start)
+            .values_list('day', column)
+            .annotate(total=Sum('count'))
+            .order_by())
+    for day, value, total in rows:
+        if day in series:
+            series[day][value] += total
+    return [
+        {'day': day.isoformat(), **{value: counts[value] for value in values}, 'total': sum(counts.values())}
+        for day, counts in series.items()
+    ]
+
+
+def risk_distribution(days):
+    return _daily_series(DrugCheckRollup, 'risk_level', RISK_LEVELS, days)
+
+
+def symptom_trends(days):
+    return _daily_series(SymptomRollup, 'classification', CLASSIFICATIONS, days)
@@ -0,0 +1,142 @@
+"""
+Hot/cold archival of old history rows.
+
+Rows older than the retention age are moved out of the hot tables into
+ArchivedRecord, with everything except the user and timestamp packed into a
+zlib-compressed JSON payload. List endpoints only read the archive when the
+client asks for older data with ``?include_archived=true``.
+"""
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedRecord, ChatMessage, RiskCheckRecord, SymptomAnalysis
+from .sharding import shard_aliases
+from .sync import suppress_tombstones
+
+# record_type -> (model, timestamp field)
+ARCHIVED_MODELS = {
+    'chat_message': (ChatMessage, 'created_at'),
+    'risk_check': (RiskCheckRecord, 'checked_at'),
+    'symptom_analysis': (SymptomAnalysis, 'analyzed_at'),
+}
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.HEALTH_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def _payload_fields(model, timestamp_field):
+    skip = {'id', 'user', timestamp_field}
+    return [f for f in model._meta.concrete_fields if f.name not in skip]
+
+
+def encode_payload(instance, timestamp_field):
+    data = {
+        f.attname: f.value_from_object(instance)
+        for f in _payload_fields(type(instance), timestamp_field)
+    }
+    raw = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return zlib.compress(raw.encode('utf-8'), 9)
+
+
+def restore_record(archived):
+    """Rebuild an unsaved model instance from an ArchivedRecord"""
+    model, timestamp_field = ARCHIVED_MODELS[archived.record_type]
+    data = json.loads(zlib.decompress(bytes(archived.payload)).decode('utf-8'))
+    values = {
+        f.attname: f.to_python(data[f.attname])
+        for f in _payload_fields(model, timestamp_field)
+        if f.attname in data
+    }
+    values[timestamp_field] = archived.created_at
+    return model(id=archived.original_id, user_id=archived.user_id, **values)
+
+
+def archive_records(record_type, cutoff, batch_size=None):
+    """
+    Move rows of one type older than ``cutoff`` into the archive in batches.
+    Each batch is copied and deleted in its own transaction, so an
+    interrupted run can simply be restarted.
+    """
+    model, timestamp_field = ARCHIVED_MODELS[record_type]
+    batch_size = batch_size or settings.HEALTH_ARCHIVE_BATCH_SIZE
+    total = 0
+    for alias in shard_aliases():
+        while True:
+            with transaction.atomic(using=alias):
+                batch = list(
+                    model.objects.using(alias)
+                    .filter(**{f'{timestamp_field}__lt': cutoff})
+                    .order_by('pk')[:batch_size]
+                )
+                if not batch:
+                    break
+                # The archive lives on the primary. For other shards it commits
+                # first; a rerun after a failed delete skips the duplicates.
+                ArchivedRecord.objects.bulk_create([
+                    ArchivedRecord(
+                        record_type=record_type,
+                        original_id=row.pk,
+                        user_id=row.user_id,
+                        created_at=getattr(row, timestamp_field),
+                        payload=encode_payload(row, timestamp_field),
+                    )
+                    for row in batch
+                ], ignore_conflicts=True)
+                # Archived rows are still the user's history, so no sync tombstones
+                with suppress_tombstones():
+                    model.objects.using(alias).filter(pk__in=[row.pk for row in batch]).delete()
+            total += len(batch)
+    return total
+
+
+class ArchivedHistory:
+    """
+    Paginator-compatible sequence of hot rows followed by archived rows.
+
+    Archived rows are always older than hot rows, so with both sides ordered
+    newest first the concatenation is a single timeline.
+    """
+
+    def __init__(self, queryset, archived_queryset):
+        self.queryset = queryset
+        self.archived_queryset = archived_queryset
+        self._hot_count = None
+
+    def hot_count(self):
+        if self._hot_count is None:
+            self._hot_count = self.queryset.count()
+        return self._hot_count
+
+    def count(self):
+        return self.hot_count() + self.archived_queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        yield from self.queryset
+        for archived in self.archived_queryset.iterator():
+            yield restore_record(archived)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return list(self[index:index + 1])[0]
+        start = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        hot = self.hot_count()
+        rows = []
+        if start < hot:
+            rows.extend(self.queryset[start:min(stop, hot)])
+        if stop > hot:
+            archived = self.archived_queryset[max(start - hot, 0):stop - hot]
+            rows.extend(restore_record(a) for a in archived)
+        return rows
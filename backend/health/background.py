@@ -0,0 +1,38 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.HEALTH_BACKGROUND_WORKERS,
+                    thread_name_prefix='health-background',
+                )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        # Worker threads keep their own connections; don't leak them
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run ``func`` on the shared background pool, off the request thread"""
+    return _get_executor().submit(_run, func, args, kwargs)
@@ -0,0 +1,55 @@
+"""
+Conditional GET for the health resources.
+
+Validators come from a cheap aggregate over the (user, updated_at) index:
+for each queryset behind a response, its row count and latest
+``updated_at``. Every write bumps ``updated_at`` and every delete or
+archival changes the count, so the pair changes whenever the rendered body
+would. ``If-None-Match`` is checked against the ETag before anything is
+serialized.
+
+No ``Last-Modified`` is sent: the latest ``updated_at`` does not move when
+an older row is deleted or archived, or when the user's own fields change,
+so ``If-Modified-Since`` could get a stale 304.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+
+
+def collection_version(queryset):
+    """(row count, latest updated_at) for a queryset"""
+    version = queryset.order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+    return version['count'], version['latest']
+
+
+def build_etag(request, versions, extra=()):
+    """
+    ETag for a response built from ``versions``.
+
+    It also covers the user, the query string (``?fields=``, paging,
+    ``?include_archived=``) and any ``extra`` values the body depends on.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    parts = [request.user.pk, request.get_full_path(), *extra]
+    for count, latest in versions:
+        parts.extend([count, latest.isoformat() if latest else ''])
+    digest.update('|'.join(str(part) for part in parts).encode('utf-8'))
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified(request, etag):
+    """A 304 response if the client's copy is current, else None"""
+    return get_conditional_response(request, etag=etag)
+
+
+def set_etag(response, etag):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+    return response
+
+
+def user_fingerprint(user):
+    """Nested user fields rendered with the profile; User has no updated_at"""
+    return (user.username, user.email, user.first_name, user.last_name)
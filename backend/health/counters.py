@@ -0,0 +1,47 @@
+from django.db.models import F
+
+from .db import write_with_retry
+from .models import HealthAlert, UnreadAlertCounter
+
+
+def get_unread_alert_count(user):
+    """Return the user's unread alert count from the denormalized counter"""
+    count = (UnreadAlertCounter.objects
+             .filter(user=user)
+             .values_list('unread_count', flat=True)
+             .first())
+    if count is None:
+        # First read for this user: seed the counter with a one-off count
+        count = rebuild_unread_alert_count(user)
+    return count
+
+
+def rebuild_unread_alert_count(user):
+    """Recount unread alerts for a user and store the result in the counter"""
+    user_id = getattr(user, 'pk', user)
+
+    def recount():
+        # Create and lock the row before counting, so an adjustment made
+        # meanwhile waits and applies on top instead of being overwritten
+        counter, _ = UnreadAlertCounter.objects.select_for_update().get_or_create(user_id=user_id)
+        counter.unread_count = HealthAlert.objects.filter(user_id=user_id, is_read=False).count()
+        counter.save(update_fields=['unread_count', 'updated_at'])
+        return counter.unread_count
+
+    return write_with_retry(recount)
+
+
+def adjust_unread_alert_count(user_id, delta):
+    """Apply a delta to the counter, seeding it with a recount if it is missing"""
+    if delta:
+        updated = UnreadAlertCounter.objects.filter(user_id=user_id).update(
+            unread_count=F('unread_count') + delta
+        )
+        if not updated:
+            # The alert change is already visible to this transaction, so the
+            # recount includes it
+            rebuild_unread_alert_count(user_id)
+
+
+def reset_unread_alert_count(user_id):
+    UnreadAlertCounter.objects.filter(user_id=user_id).update(unread_count=0)
@@ -0,0 +1,81 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections, router, transaction
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def write_with_retry(func, using='default', retries=None, backoff=None):
+    """
+    Run ``func`` in its own transaction, retrying with jittered exponential
+    backoff when SQLite reports a locked database. With the production
+    SQLite settings the transaction is BEGIN IMMEDIATE, so a retry never
+    repeats a partially applied write.
+
+    Inside an outer atomic block the error is raised unchanged, since the
+    outer transaction cannot be replayed from here.
+    """
+    if retries is None:
+        retries = settings.SQLITE_WRITE_RETRIES
+    if backoff is None:
+        backoff = settings.SQLITE_WRITE_RETRY_BACKOFF
+
+    attempt = 0
+    while True:
+        try:
+            with transaction.atomic(using=using):
+                return func()
+        except OperationalError as exc:
+            if (not is_lock_error(exc) or attempt >= retries
+                    or connections[using].in_atomic_block):
+                raise
+            time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+            attempt += 1
+
+
+def create_record(model, **fields):
+    """``model.objects.create(**fields)`` on the retrying immediate-write path"""
+    instance = model(**fields)
+    # Routed with the instance, so history rows land on their user's shard
+    using = router.db_for_write(model, instance=instance)
+
+    def insert():
+        instance.save(force_insert=True, using=using)
+        return instance
+
+    return write_with_retry(insert, using=using)
+
+
+def reserve_ids(model, size):
+    """
+    Reserve ``size`` primary keys for ``model`` from the primary's
+    ``sqlite_sequence``; returns the first one. Write-behind rows and rows on
+    every history shard take their ids from here, so ids are unique across
+    shards and still roughly follow insertion order.
+    """
+    connection = connections['default']
+    table = model._meta.db_table
+    quoted = connection.ops.quote_name(table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+
+    def bump():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT COALESCE(MAX({pk_column}), 0) FROM {quoted})) + %s "
+                "WHERE name = %s",
+                [size, table],
+            )
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    f"INSERT INTO sqlite_sequence (name, seq) SELECT %s, COALESCE(MAX({pk_column}), 0) + %s FROM {quoted}",
+                    [table, size],
+                )
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = %s", [table])
+            return cursor.fetchone()[0] - size + 1
+
+    return write_with_retry(bump)
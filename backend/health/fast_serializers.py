@@ -0,0 +1,94 @@
+"""
+Values-based fast path for read-only listings.
+
+``ValuesSerializer`` introspects a ModelSerializer once, then renders rows
+straight from ``QuerySet.values()`` using the same field ``to_representation``
+methods, so the output is identical to ``Serializer(queryset, many=True).data``
+without instantiating a model or a field per row.
+"""
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+
+from .serializers import select_field_names
+
+
+class ValuesSerializer:
+
+    def __init__(self, serializer_class, prefix=''):
+        self.serializer_class = serializer_class
+        self.prefix = prefix
+        # (output name, values() lookup, to_representation or None, nested ValuesSerializer)
+        self.columns = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            lookup = prefix + field.source.replace('.', '__')
+            if isinstance(field, serializers.BaseSerializer):
+                if getattr(field, 'many', False):
+                    raise TypeError(f"{serializer_class.__name__}.{name}: nested lists are not supported")
+                self.columns.append((name, None, None, ValuesSerializer(type(field), prefix=lookup + '__')))
+            elif isinstance(field, PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise TypeError(f"{serializer_class.__name__}.{name}: pk_field is not supported")
+                # values() already yields the related primary key
+                self.columns.append((name, lookup, None, None))
+            elif isinstance(field, serializers.RelatedField) or field.source == '*':
+                raise TypeError(f"{serializer_class.__name__}.{name}: unsupported field type")
+            else:
+                self.columns.append((name, lookup, field.to_representation, None))
+
+    def narrowed(self, fields=None, omit=None):
+        """Copy limited to the requested output fields (``?fields=`` / ``?omit=``)"""
+        if not fields and not omit:
+            return self
+        key = (frozenset(fields or ()), frozenset(omit or ()))
+        cache = self.__dict__.setdefault('_narrowed', {})
+        if key not in cache:
+            keep = set(select_field_names([c[0] for c in self.columns], fields, omit))
+            narrowed = object.__new__(type(self))
+            narrowed.__dict__.update(self.__dict__, _narrowed={})
+            narrowed.columns = [c for c in self.columns if c[0] in keep]
+            cache[key] = narrowed
+        return cache[key]
+
+    def value_names(self):
+        names = []
+        for _, lookup, _, nested in self.columns:
+            names.extend(nested.value_names() if nested else [lookup])
+        return names
+
+    def to_representation(self, row):
+        data = {}
+        for name, lookup, to_representation, nested in self.columns:
+            if nested is not None:
+                data[name] = nested.to_representation(row)
+                continue
+            value = row[lookup]
+            if value is None or to_representation is None:
+                data[name] = value
+            else:
+                data[name] = to_representation(value)
+        return data
+
+    def render(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+    def values(self, queryset):
+        return queryset.values(*self.value_names())
+
+
+_fast_serializers = {}
+
+
+def get_values_serializer(serializer_class):
+    """Cached ValuesSerializer for a serializer class"""
+    fast = _fast_serializers.get(serializer_class)
+    if fast is None:
+        fast = _fast_serializers[serializer_class] = ValuesSerializer(serializer_class)
+    return fast
+
+
+def render_values(serializer_class, queryset):
+    """Fast-path equivalent of ``serializer_class(queryset, many=True).data``"""
+    fast = get_values_serializer(serializer_class)
+    return fast.render(fast.values(queryset))
@@ -1,12 +1,69 @@
 import os
-import google.generativeai as genai
+import threading
+import time
 from django.conf import settings
 
+from .llm_ledger import record_call
+
+CHAT_UNAVAILABLE_MESSAGE = "I'm sorry, I'm temporarily unable to provide assistance. Please consult with a healthcare professional for your medical questions."
+
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+
+# google.generativeai pulls in gRPC and protobuf (close to a second of import
+# time), so it is only imported on the first AI call or by preload()
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Shared GenerativeModel, importing and configuring the SDK on first use"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv('GOOGLE_GEMINI_API_KEY'))
+                _model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+    return _model
+
+
+def preload():
+    """Import the SDK and build the client ahead of the first AI request"""
+    get_model()
+
+
 class GeminiAIService:
-    def __init__(self):
-        # Configure the Gemini API
-        genai.configure(api_key=os.getenv('GOOGLE_GEMINI_API_KEY'))
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+    def __init__(self, user_id=None, operation=None, model=None):
+        # Attribution for the LLM call ledger; ``operation`` overrides the
+        # per-method default (e.g. 'prewarm' for knowledge table warm-up)
+        self.user_id = user_id
+        self.operation = operation
+        # A stand-in model (e.g. the replay stub); its calls are not ledgered
+        self._model = model
+
+    @property
+    def model(self):
+        return self._model or get_model()
+
+    def _generate(self, operation, prompt):
+        """generate_content, recorded in the LLM call ledger"""
+        started = time.perf_counter()
+        outcome = 'error'
+        usage = None
+        try:
+            response = self.model.generate_content(prompt)
+            usage = getattr(response, 'usage_metadata', None)
+            outcome = 'ok'
+            return response
+        finally:
+            if self._model is None:
+                record_call(
+                    self.operation or operation, GEMINI_MODEL_NAME,
+                    latency_ms=(time.perf_counter() - started) * 1000,
+                    outcome=outcome, user_id=self.user_id,
+                    prompt_tokens=getattr(usage, 'prompt_token_count', None),
+                    response_tokens=getattr(usage, 'candidates_token_count', None),
+                )
         
     def analyze_drug_risk(self, drug_name: str, user_allergies: list) -> dict:
         """Analyze drug risk against user allergies using Gemini AI"""
@@ -31,7 +88,7 @@ class GeminiAIService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate('drug_risk', prompt)
             # Parse the AI response and return structured data
             ai_text = response.text.strip()
             
@@ -41,7 +98,8 @@ class GeminiAIService:
                     "risk_level": "medium",
                     "potential_reactions": ["Consult healthcare provider"],
                     "recommendations": ["Professional medical evaluation recommended"],
-                    "ai_analysis": ai_text
+                    "ai_analysis": ai_text,
+                    "fallback": True
                 }
             
             # Try to parse JSON response
@@ -55,7 +113,8 @@ class GeminiAIService:
                     "risk_level": "medium", 
                     "potential_reactions": ["Unable to analyze - consult doctor"],
                     "recommendations": ["Seek professional medical advice"],
-                    "ai_analysis": ai_text
+                    "ai_analysis": ai_text,
+                    "fallback": True
                 }
                 
         except Exception as e:
@@ -63,7 +122,8 @@ class GeminiAIService:
                 "risk_level": "high",
                 "potential_reactions": ["AI analysis unavailable"],
                 "recommendations": ["Consult healthcare provider immediately"],
-                "error": str(e)
+                "error": str(e),
+                "fallback": True
             }
     
     def analyze_symptoms(self, symptoms: str, current_medications: list = None) -> dict:
@@ -87,7 +147,7 @@ class GeminiAIService:
         """
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate('symptoms', prompt)
             ai_text = response.text.strip()
             
             if not ai_text.startswith('{'):
@@ -119,7 +179,8 @@ class GeminiAIService:
                 "error": str(e)
             }
     
-    def chat_health_assistant(self, message: str, message_type: str = 'general') -> str:
+    def chat_health_assistant(self, message: str, user_allergies: list = None,
+                              user_medications: list = None, message_type: str = 'general') -> str:
         """AI health chat assistant using Gemini"""
         context = """
         You are DrugShield AI, a helpful medical information assistant. 
@@ -132,13 +193,16 @@ class GeminiAIService:
         - Focus on general health information and safety
         """
         
-        prompt = f"{context}\n\nUser question: {message}\n\nProvide a helpful, safe response:"
+        user_context = ""
+        if user_allergies:
+            user_context += f"\nUser's known allergies: {', '.join(user_allergies)}"
+        if user_medications:
+            user_context += f"\nUser's current medications: {', '.join(user_medications)}"
+        
+        prompt = f"{context}{user_context}\n\nQuestion type: {message_type}\nUser question: {message}\n\nProvide a helpful, safe response:"
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate('chat', prompt)
             return response.text.strip()
         except Exception as e:
-            return "I'm sorry, I'm temporarily unable to provide assistance. Please consult with a healthcare professional for your medical questions."
-
-# Initialize the service
-gemini_service = GeminiAIService()
\ No newline at end of file
+            return CHAT_UNAVAILABLE_MESSAGE
@@ -0,0 +1,153 @@
+"""
+Idempotency-Key support for the AI POST endpoints.
+
+The first request with a given key claims it by inserting a pending
+IdempotencyRecord (the unique constraint arbitrates concurrent duplicates),
+runs the view, and stores the response. A retry with the same key gets the
+stored response without another model call; a duplicate that arrives while
+the original is still running waits for it. Keys expire after
+``IDEMPOTENCY['TTL']`` seconds. Throttles run before the view, so they ask
+``stored_response`` first and let such a retry through without spending
+quota.
+"""
+import hashlib
+import json
+import math
+import time
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .ai_scheduler import client_key
+from .db import write_with_retry
+from .models import IdempotencyRecord
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_config():
+    return settings.IDEMPOTENCY
+
+
+def request_fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def stored_response(request, endpoint):
+    """The completed record a retry of this request would be answered from, or None"""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return None
+    return IdempotencyRecord.objects.filter(
+        owner=client_key(request), endpoint=endpoint, key=key, status='complete',
+        request_hash=request_fingerprint(request), expires_at__gt=timezone.now(),
+    ).first()
+
+
+def _claim(owner, endpoint, key, fingerprint):
+    """Insert a pending record; returns None if another request holds the key"""
+    now = timezone.now()
+    try:
+        return write_with_retry(lambda: IdempotencyRecord.objects.create(
+            owner=owner, endpoint=endpoint, key=key, request_hash=fingerprint,
+            expires_at=now + timedelta(seconds=get_config()['TTL']),
+        ))
+    except IntegrityError:
+        return None
+
+
+def _replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _wait_for(record_filter):
+    """Poll until the original request completes or gives up the key; False on timeout"""
+    config = get_config()
+    deadline = time.monotonic() + config['WAIT_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(config['POLL_INTERVAL'])
+        if not IdempotencyRecord.objects.filter(**record_filter, status='pending').exists():
+            return True
+    return False
+
+
+def idempotent(endpoint):
+    """
+    Honour an ``Idempotency-Key`` header on a function-based API view.
+    Place it directly above the view function, below ``@api_view``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            owner = client_key(request)
+            fingerprint = request_fingerprint(request)
+            record_filter = {'owner': owner, 'endpoint': endpoint, 'key': key}
+            record = _claim(owner, endpoint, key, fingerprint)
+
+            while record is None:
+                existing = IdempotencyRecord.objects.filter(**record_filter).first()
+                stale_before = timezone.now() - timedelta(seconds=get_config()['PENDING_TIMEOUT'])
+                if existing is not None and (existing.expires_at <= timezone.now()
+                                             or (existing.status == 'pending'
+                                                 and existing.created_at < stale_before)):
+                    # Expired key, or the original request died: start over
+                    IdempotencyRecord.objects.filter(pk=existing.pk).delete()
+                    existing = None
+                if existing is None:
+                    record = _claim(owner, endpoint, key, fingerprint)
+                    continue
+                if existing.request_hash != fingerprint:
+                    return Response(
+                        {'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if existing.status == 'complete':
+                    return _replay(existing)
+                if not _wait_for(record_filter):
+                    response = Response(
+                        {'error': 'The original request with this key is still in progress'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                    response['Retry-After'] = str(max(1, math.ceil(get_config()['WAIT_TIMEOUT'])))
+                    return response
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                IdempotencyRecord.objects.filter(pk=record.pk).delete()
+                raise
+            if response.status_code >= 500:
+                # Not an outcome worth replaying; let the client retry for real
+                IdempotencyRecord.objects.filter(pk=record.pk).delete()
+                return response
+            write_with_retry(lambda: IdempotencyRecord.objects.filter(pk=record.pk).update(
+                status='complete', response_status=response.status_code,
+                response_body=json.loads(json.dumps(response.data, cls=DjangoJSONEncoder)),
+            ))
+            return response
+        return wrapper
+    return decorator
+
+
+def prune_idempotency_records():
+    deleted, _ = IdempotencyRecord.objects.filter(expires_at__lt=timezone.now()).delete()
+    return deleted
@@ -0,0 +1,287 @@
+"""
+Population-level drug risk knowledge.
+
+Live drug risk checks record the canonical allergen classes they were run
+against. A nightly job (``build_drug_risk_knowledge``) aggregates those AI
+verdicts per (canonical drug, allergen key) without user identifiers, and
+pre-warms the most checked drugs against the most common allergen sets.
+``lookup`` answers a live check from the table when the verdict is backed by
+enough users and agreement.
+"""
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Allergy, DrugRiskKnowledge, RiskCheckRecord
+from .sharding import fan_out, fan_out_list
+
+RISK_LEVELS = ('low', 'medium', 'high')
+ALLERGEN_KEY_MAX_LENGTH = 255
+
+# Brand and regional names -> generic name
+DRUG_SYNONYMS = {
+    'tylenol': 'acetaminophen',
+    'paracetamol': 'acetaminophen',
+    'panadol': 'acetaminophen',
+    'advil': 'ibuprofen',
+    'motrin': 'ibuprofen',
+    'nurofen': 'ibuprofen',
+    'aleve': 'naproxen',
+    'bayer': 'aspirin',
+    'acetylsalicylic acid': 'aspirin',
+    'amoxil': 'amoxicillin',
+    'augmentin': 'amoxicillin clavulanate',
+    'keflex': 'cephalexin',
+    'bactrim': 'sulfamethoxazole trimethoprim',
+    'septra': 'sulfamethoxazole trimethoprim',
+    'zithromax': 'azithromycin',
+    'cipro': 'ciprofloxacin',
+    'lipitor': 'atorvastatin',
+    'glucophage': 'metformin',
+}
+
+# Dose, unit and form words that do not change the drug
+_DOSE_PATTERN = re.compile(r'(?<![a-z])\d+(\.\d+)?\s*(mg|mcg|g|ml|iu|%)?(?![a-z])')
+_FORM_WORDS = {
+    'tablet', 'tablets', 'tab', 'tabs', 'capsule', 'capsules', 'cap', 'caps',
+    'oral', 'suspension', 'syrup', 'injection', 'cream', 'extended', 'release',
+    'er', 'xr', 'sr', 'ds', 'hcl', 'sodium', 'potassium',
+}
+
+# Allergy name terms -> allergen class. A term matches whole words, optionally
+# pluralised ('eggs' is an egg allergy, 'eggplant' is not)
+ALLERGEN_CLASSES = [
+    ('penicillins', ('penicillin', 'amoxicillin', 'ampicillin', 'augmentin', 'dicloxacillin')),
+    ('cephalosporins', ('cephalosporin', 'cephalexin', 'cefazolin', 'ceftriaxone', 'cefuroxime', 'keflex')),
+    ('sulfonamides', ('sulfa', 'sulfonamide', 'sulfamethoxazole', 'bactrim', 'septra')),
+    ('nsaids', ('nsaid', 'aspirin', 'ibuprofen', 'naproxen', 'diclofenac', 'advil', 'motrin', 'aleve')),
+    ('macrolides', ('macrolide', 'erythromycin', 'azithromycin', 'clarithromycin')),
+    ('fluoroquinolones', ('quinolone', 'fluoroquinolone', 'ciprofloxacin', 'levofloxacin', 'moxifloxacin')),
+    ('opioids', ('opioid', 'opiate', 'codeine', 'morphine', 'hydrocodone', 'oxycodone', 'tramadol')),
+    ('tetracyclines', ('tetracycline', 'doxycycline', 'minocycline')),
+    ('anticonvulsants', ('carbamazepine', 'phenytoin', 'lamotrigine')),
+    ('contrast_media', ('contrast', 'iodine', 'iodinated')),
+    ('local_anesthetics', ('lidocaine', 'novocaine', 'procaine', 'anesthetic')),
+    ('latex', ('latex',)),
+    ('eggs', ('egg',)),
+    ('shellfish', ('shellfish', 'shrimp', 'crab', 'lobster')),
+    ('peanuts', ('peanut',)),
+    ('tree_nuts', ('tree nut', 'almond', 'walnut', 'cashew', 'pecan', 'hazelnut')),
+    ('soy', ('soy', 'soybean')),
+    ('gelatin', ('gelatin',)),
+]
+
+_ALLERGEN_PATTERNS = [
+    (allergen, re.compile(r'\b(?:%s)(?:e?s)?\b' % '|'.join(re.escape(term) for term in terms)))
+    for allergen, terms in ALLERGEN_CLASSES
+]
+
+
+def _normalize(text):
+    return ' '.join(re.sub(r'[^a-z0-9%.\s]', ' ', text.lower()).split())
+
+
+def canonical_drug(name):
+    """Generic, dose-free drug name: 'Advil 200mg tablets' -> 'ibuprofen'"""
+    text = _normalize(name)
+    if text in DRUG_SYNONYMS:
+        return DRUG_SYNONYMS[text]
+    text = _DOSE_PATTERN.sub(' ', text)
+    words = [w for w in text.split() if w not in _FORM_WORDS]
+    text = ' '.join(DRUG_SYNONYMS.get(w, w) for w in words)
+    return DRUG_SYNONYMS.get(text, text)
+
+
+def allergen_class(name):
+    text = _normalize(name)
+    for allergen, pattern in _ALLERGEN_PATTERNS:
+        if pattern.search(text):
+            return allergen
+    return text
+
+
+def allergen_key(allergies):
+    """
+    Sorted, de-duplicated allergen classes joined with commas ('' for none),
+    or None when the set is too long to store and must not be shared.
+    """
+    classes = {allergen_class(name) for name in allergies if name and name.strip()}
+    key = ','.join(sorted(c for c in classes if c))
+    return key if len(key) <= ALLERGEN_KEY_MAX_LENGTH else None
+
+
+def get_config():
+    return settings.DRUG_RISK_KNOWLEDGE
+
+
+def is_trusted(entry, config):
+    """Pre-warmed verdicts are used as is; observed ones need enough users agreeing"""
+    if entry.source == 'prewarmed':
+        return True
+    return entry.user_count >= config['MIN_USERS'] and entry.agreement >= config['MIN_AGREEMENT']
+
+
+def lookup(drug_name, allergies):
+    """Knowledge table verdict for a live check, or None if it is not trusted"""
+    config = get_config()
+    if not config['ENABLED']:
+        return None
+    key = allergen_key(allergies)
+    if key is None:
+        return None
+    entry = DrugRiskKnowledge.objects.filter(drug=canonical_drug(drug_name), allergen_key=key).first()
+    if entry is None or not is_trusted(entry, config):
+        return None
+    return {
+        'risk_level': entry.risk_level,
+        'potential_reactions': entry.potential_reactions,
+        'recommendations': entry.recommendations,
+    }
+
+
+def _majority_level(levels):
+    """Most common verdict; ties go to the more cautious level"""
+    counts = Counter(levels)
+    return max(counts, key=lambda level: (counts[level], RISK_LEVELS.index(level)))
+
+
+def _most_common(items, limit):
+    return [item for item, _ in Counter(items).most_common(limit)]
+
+
+def aggregate_verdicts():
+    """
+    Rebuild the observed rows of the knowledge table from AI risk checks.
+    Returns the number of (drug, allergen key) groups written.
+    """
+    groups = defaultdict(list)
+    verdicts = fan_out_list(
+        RiskCheckRecord.objects
+        .filter(source='ai', allergen_key__isnull=False, risk_level__in=RISK_LEVELS)
+        .values_list('user_id', 'drug_name', 'allergen_key', 'risk_level',
+                     'potential_reactions', 'recommendations')
+    )
+    for user_id, drug_name, key, risk_level, reactions, recommendations in verdicts:
+        groups[(canonical_drug(drug_name), key)].append((user_id, risk_level, reactions, recommendations))
+
+    config = get_config()
+    prewarmed = set(DrugRiskKnowledge.objects.filter(source='prewarmed').values_list('drug', 'allergen_key'))
+    entries = []
+    for (drug, key), rows in groups.items():
+        user_count = len({row[0] for row in rows})
+        if user_count < config['MIN_USERS']:
+            # Too few users to publish without identifying anyone
+            continue
+        level = _majority_level([row[1] for row in rows])
+        agreeing = [row for row in rows if row[1] == level]
+        reactions = [r for row in agreeing for r in (row[2] or []) if isinstance(r, str)]
+        recommendations = [line.strip() for row in agreeing for line in row[3].splitlines() if line.strip()]
+        entry = DrugRiskKnowledge(
+            drug=drug[:100],
+            allergen_key=key,
+            risk_level=level,
+            potential_reactions=_most_common(reactions, 5),
+            recommendations=_most_common(recommendations, 5),
+            sample_count=len(rows),
+            user_count=user_count,
+            agreement=len(agreeing) / len(rows),
+            source='observed',
+        )
+        # Observed verdicts replace pre-warmed ones once they can be trusted
+        if (entry.drug, key) in prewarmed and not is_trusted(entry, config):
+            continue
+        entries.append(entry)
+
+    with transaction.atomic():
+        DrugRiskKnowledge.objects.filter(source='observed').delete()
+        DrugRiskKnowledge.objects.bulk_create(
+            entries, batch_size=500, update_conflicts=True,
+            unique_fields=['drug', 'allergen_key'],
+            update_fields=['risk_level', 'potential_reactions', 'recommendations',
+                           'sample_count', 'user_count', 'agreement', 'source', 'updated_at'],
+        )
+    return len(entries)
+
+
+def prewarm_candidates(top_drugs, allergen_sets):
+    """
+    (drug, allergen key) pairs for the most checked drugs against the most
+    common allergen sets that the table does not cover yet. Drugs and sets
+    seen from fewer than MIN_USERS users are left out.
+    """
+    min_users = get_config()['MIN_USERS']
+    drug_users = defaultdict(set)
+    key_users = defaultdict(set)
+    checks = fan_out_list(
+        RiskCheckRecord.objects
+        .filter(allergen_key__isnull=False)
+        .values_list('user_id', 'drug_name', 'allergen_key')
+    )
+    for user_id, drug_name, key in checks:
+        drug_users[canonical_drug(drug_name)].add(user_id)
+        key_users[key].add(user_id)
+
+    def most_common(users_by_value, limit):
+        values = [value for value, users in users_by_value.items() if len(users) >= min_users]
+        return sorted(values, key=lambda value: -len(users_by_value[value]))[:limit]
+
+    keys = most_common(key_users, allergen_sets)
+    if '' not in keys:
+        keys.append('')
+    known = set(DrugRiskKnowledge.objects.values_list('drug', 'allergen_key'))
+    return [
+        (drug, key)
+        for drug in most_common(drug_users, top_drugs)
+        for key in keys
+        if (drug, key) not in known
+    ]
+
+
+def prewarm(candidates, analyze):
+    """
+    Fill the table for ``candidates`` with ``analyze(drug, allergen classes)``
+    (GeminiAIService.analyze_drug_risk). Placeholder results are skipped.
+    """
+    written = 0
+    for drug, key in candidates:
+        result = analyze(drug, key.split(',') if key else [])
+        if not result or result.get('fallback') or result.get('risk_level') not in RISK_LEVELS:
+            continue
+        DrugRiskKnowledge.objects.update_or_create(
+            drug=drug, allergen_key=key,
+            defaults={
+                'risk_level': result['risk_level'],
+                'potential_reactions': list(result.get('potential_reactions') or []),
+                'recommendations': list(result.get('recommendations') or []),
+                'sample_count': 1,
+                'user_count': 0,
+                'agreement': 1.0,
+                'source': 'prewarmed',
+            },
+        )
+        written += 1
+    return written
+
+
+def backfill_allergen_keys():
+    """
+    Give older AI checks an allergen key from the user's current allergies.
+    Best effort: allergies may have changed since the check.
+    """
+    allergies = defaultdict(list)
+    for user_id, name in Allergy.objects.values_list('user_id', 'name').iterator():
+        allergies[user_id].append(name)
+
+    def backfill(alias):
+        pending = RiskCheckRecord.objects.using(alias).filter(source='ai', allergen_key__isnull=True)
+        updated = 0
+        for user_id in pending.values_list('user_id', flat=True).distinct():
+            updated += pending.filter(user_id=user_id).update(
+                allergen_key=allergen_key(allergies[user_id]), updated_at=timezone.now()
+            )
+        return updated
+
+    return sum(fan_out(backfill))
@@ -0,0 +1,238 @@
+"""
+Ledger of Gemini calls for spend and latency accounting.
+
+GeminiAIService records every call (operation, model, token counts from
+``usage_metadata``, latency, outcome) and the views record answers served
+from the chat similarity cache or the drug risk knowledge table. Rows are
+queued in memory and bulk-inserted by a background thread every
+``FLUSH_INTERVAL`` seconds; the ledger is accounting data, so a crash may
+lose the last few rows.
+
+The admin report shows calls per operation per day, including p95 latency.
+``persist_rollups`` (run by ``archive_health_history``, and before raw rows
+are pruned) stores those figures in ``LLMCallRollup`` once a day is over, so
+``daily_rollups`` reads closed days from that table and only aggregates raw
+rows for the days not persisted yet (normally just today).
+"""
+import atexit
+import logging
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .db import write_with_retry
+from .models import LLMCallRecord, LLMCallRollup
+
+logger = logging.getLogger(__name__)
+
+# Rows sit in the in-memory queue for up to FLUSH_INTERVAL seconds, so a day
+# is only persisted once it has been over for a while
+CLOSED_DAY_GRACE = timedelta(minutes=10)
+
+ROLLUP_FIELDS = ['calls', 'cache_hits', 'errors', 'prompt_tokens', 'response_tokens',
+                 'mean_latency_ms', 'p95_latency_ms']
+
+
+def get_config():
+    return settings.LLM_LEDGER
+
+
+class CallLedger:
+
+    def __init__(self, flush_interval, max_batch):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._thread = threading.Thread(target=self._run, name='health-llm-ledger', daemon=True)
+        self._thread.start()
+
+    def add(self, **fields):
+        with self._lock:
+            self._pending.append(LLMCallRecord(**fields))
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            write_with_retry(lambda: LLMCallRecord.objects.bulk_create(batch))
+        return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("LLM ledger flush failed; rows dropped")
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                config = get_config()
+                _ledger = CallLedger(config['FLUSH_INTERVAL'], config['MAX_BATCH'])
+                atexit.register(_flush_at_exit)
+    return _ledger
+
+
+def _flush_at_exit():
+    try:
+        _ledger.flush()
+    except Exception as exc:
+        # e.g. the database is already gone at interpreter shutdown
+        logger.warning("LLM ledger flush at exit failed; rows dropped: %s", exc)
+
+
+def record_call(operation, model_name, latency_ms, outcome='ok', user_id=None,
+                prompt_tokens=None, response_tokens=None, cache_status='miss'):
+    if not get_config()['ENABLED']:
+        return
+    get_ledger().add(
+        operation=operation, model_name=model_name, user_id=user_id,
+        prompt_tokens=prompt_tokens, response_tokens=response_tokens,
+        latency_ms=max(0, int(round(latency_ms))), outcome=outcome,
+        cache_status=cache_status, created_at=timezone.now(),
+    )
+
+
+def record_cache_hit(operation, cache_status, user_id=None):
+    """An answer served without a model call"""
+    record_call(operation, model_name='', latency_ms=0, user_id=user_id, cache_status=cache_status)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min, tzinfo=timezone.get_current_timezone())
+
+
+def _aggregate(since_day, until_day=None):
+    """
+    {(day, operation): figures} from the raw ledger rows of
+    ``since_day <= day < until_day``. SQLite has no percentile function, so
+    latencies are streamed once and ranked in Python.
+    """
+    groups = defaultdict(lambda: {
+        'calls': 0, 'cache_hits': 0, 'errors': 0,
+        'prompt_tokens': 0, 'response_tokens': 0, 'latencies': [],
+    })
+    rows = LLMCallRecord.objects.filter(created_at__gte=_day_start(since_day))
+    if until_day is not None:
+        rows = rows.filter(created_at__lt=_day_start(until_day))
+    rows = (rows.annotate(day=TruncDate('created_at'))
+            .values_list('day', 'operation', 'cache_status', 'outcome',
+                         'latency_ms', 'prompt_tokens', 'response_tokens')
+            .iterator())
+    for day, operation, cache_status, outcome, latency, prompt_tokens, response_tokens in rows:
+        group = groups[(day, operation)]
+        if cache_status != 'miss':
+            group['cache_hits'] += 1
+            continue
+        group['calls'] += 1
+        group['errors'] += outcome != 'ok'
+        group['prompt_tokens'] += prompt_tokens or 0
+        group['response_tokens'] += response_tokens or 0
+        group['latencies'].append(latency)
+
+    figures = {}
+    for key, group in groups.items():
+        latencies = sorted(group.pop('latencies'))
+        figures[key] = {
+            **group,
+            'mean_latency_ms': sum(latencies) / len(latencies) if latencies else None,
+            'p95_latency_ms': percentile(latencies, 0.95),
+        }
+    return figures
+
+
+def _last_persisted_day():
+    return LLMCallRollup.objects.order_by('-day').values_list('day', flat=True).first()
+
+
+def first_open_day():
+    return timezone.localdate(timezone.now() - CLOSED_DAY_GRACE)
+
+
+def persist_rollups():
+    """
+    Store the figures of every closed day after the last persisted one.
+    Returns the number of (day, operation) rows written.
+    """
+    last = _last_persisted_day()
+    if last is not None:
+        since_day = last + timedelta(days=1)
+    else:
+        first = LLMCallRecord.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            return 0
+        since_day = timezone.localdate(first)
+    until_day = first_open_day()
+    if since_day >= until_day:
+        return 0
+    rollups = [
+        LLMCallRollup(day=day, operation=operation, **{field: figures[field] for field in ROLLUP_FIELDS})
+        for (day, operation), figures in _aggregate(since_day, until_day).items()
+    ]
+    write_with_retry(lambda: LLMCallRollup.objects.bulk_create(
+        rollups, batch_size=500, update_conflicts=True,
+        unique_fields=['day', 'operation'], update_fields=ROLLUP_FIELDS,
+    ))
+    return len(rollups)
+
+
+def daily_rollups(days=14):
+    """
+    Per (day, operation) for the last ``days`` days: calls, cache hits,
+    errors, token totals, mean and p95 latency of real model calls.
+    Persisted days come from LLMCallRollup; later ones are aggregated live.
+    """
+    since_day = timezone.localdate() - timedelta(days=days - 1)
+    figures = {
+        (row['day'], row['operation']): {field: row[field] for field in ROLLUP_FIELDS}
+        for row in LLMCallRollup.objects.filter(day__gte=since_day).values('day', 'operation', *ROLLUP_FIELDS)
+    }
+    last = _last_persisted_day()
+    live_since = since_day if last is None else max(since_day, last + timedelta(days=1))
+    figures.update(_aggregate(live_since))
+
+    rollups = []
+    for (day, operation), group in sorted(figures.items(), reverse=True):
+        requests = group['calls'] + group['cache_hits']
+        rollups.append({
+            'day': day,
+            'operation': operation,
+            **group,
+            'cache_hit_rate': group['cache_hits'] / requests if requests else 0.0,
+        })
+    return rollups
+
+
+def prune_ledger(days=None):
+    if days is None:
+        days = get_config()['RETENTION_DAYS']
+    # Closed days keep their figures after the raw rows are gone
+    persist_rollups()
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = LLMCallRecord.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from health.archive import ARCHIVED_MODELS, archive_cutoff, archive_records
+from health.idempotency import prune_idempotency_records
+from health.llm_ledger import persist_rollups, prune_ledger
+from health.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Move old chat messages and analysis records into the compressed archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.HEALTH_ARCHIVE_AFTER_DAYS,
+            help='Archive rows older than this many days'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.HEALTH_ARCHIVE_BATCH_SIZE,
+            help='Rows moved per transaction'
+        )
+        parser.add_argument(
+            '--type', dest='record_types', action='append', choices=sorted(ARCHIVED_MODELS),
+            help='Only archive this record type (may be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        for record_type in options['record_types'] or ARCHIVED_MODELS:
+            moved = archive_records(record_type, cutoff, options['batch_size'])
+            self.stdout.write(f"{record_type}: archived {moved} rows older than {cutoff:%Y-%m-%d}")
+
+        pruned = prune_tombstones()
+        self.stdout.write(f"sync tombstones: pruned {pruned} older than {settings.HEALTH_SYNC_TOMBSTONE_DAYS} days")
+        self.stdout.write(f"idempotency keys: pruned {prune_idempotency_records()} expired")
+        self.stdout.write(f"LLM call ledger: rolled up {persist_rollups()} (day, operation) rows")
+        self.stdout.write(
+            f"LLM call ledger: pruned {prune_ledger()} older than {settings.LLM_LEDGER['RETENTION_DAYS']} days"
+        )
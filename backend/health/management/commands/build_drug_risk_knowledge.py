@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from health.gemini_service import GeminiAIService
+from health.knowledge import aggregate_verdicts, backfill_allergen_keys, prewarm, prewarm_candidates
+
+
+class Command(BaseCommand):
+    help = 'Aggregate drug risk verdicts into the population-level knowledge table (run nightly)'
+
+    def add_arguments(self, parser):
+        config = settings.DRUG_RISK_KNOWLEDGE
+        parser.add_argument('--top-drugs', type=int, default=config['TOP_DRUGS'],
+                            help='Pre-warm this many of the most checked drugs')
+        parser.add_argument('--allergen-sets', type=int, default=config['ALLERGEN_SETS'],
+                            help='Pre-warm against this many of the most common allergen sets')
+        parser.add_argument('--no-prewarm', action='store_true',
+                            help='Only aggregate stored verdicts, make no AI calls')
+        parser.add_argument('--backfill', action='store_true',
+                            help="Key older checks by the user's current allergies first")
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f"Backfilled allergen keys on {backfill_allergen_keys()} risk checks")
+
+        self.stdout.write(f"Aggregated {aggregate_verdicts()} drug/allergen combinations")
+
+        if options['no_prewarm']:
+            return
+        candidates = prewarm_candidates(options['top_drugs'], options['allergen_sets'])
+        written = prewarm(candidates, GeminiAIService(operation='prewarm').analyze_drug_risk)
+        self.stdout.write(f"Pre-warmed {written} of {len(candidates)} uncovered combinations")
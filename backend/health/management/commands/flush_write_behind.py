@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from health.write_behind import recover_spools
+
+
+class Command(BaseCommand):
+    help = 'Replay write-behind spool files left by worker processes that are no longer running'
+
+    def handle(self, *args, **options):
+        spool_dir = settings.HEALTH_WRITE_BEHIND['SPOOL_DIR']
+        replayed = recover_spools(spool_dir)
+        self.stdout.write(f"Replayed {replayed} spooled records from {spool_dir}")
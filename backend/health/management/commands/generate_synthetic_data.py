@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from health.synthetic import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users and long health histories with bulk inserts (local/staging only)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--history', type=int, default=20,
+                            help='Mean rows per user for each history table (long-tailed)')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many days')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix')
+        parser.add_argument('--force', action='store_true', help='Allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusing to write synthetic data with DEBUG off; pass --force')
+
+        # Continue numbering after earlier runs with the same prefix
+        offset = User.objects.filter(username__startswith=options['prefix']).count()
+        generator = SyntheticDataGenerator(
+            seed=options['seed'] + offset, days=options['days'],
+            batch_size=options['batch_size'], username_prefix=options['prefix'],
+        )
+        started = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} users", ending='\r')
+            self.stdout.flush()
+
+        counts = generator.generate(options['users'], options['history'], offset=offset, progress=progress)
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        self.stdout.write('')
+        for model, count in counts.items():
+            self.stdout.write(f"{model:<18}{count:>12,}")
+        self.stdout.write(f"Inserted {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
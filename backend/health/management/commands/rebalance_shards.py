@@ -0,0 +1,67 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models.constants import OnConflict
+
+from health.db import write_with_retry
+from health.sharding import PRIMARY, shard_aliases, shard_for_user, sharded_models
+from health.sync import suppress_tombstones
+
+
+class Command(BaseCommand):
+    help = 'Create the history tables on every shard and move rows that belong on another shard'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would move')
+
+    def handle(self, *args, **options):
+        aliases = shard_aliases()
+        if not options['dry_run']:
+            for alias in aliases:
+                if alias != PRIMARY:
+                    call_command('migrate', 'health', database=alias, verbosity=0)
+
+        total = 0
+        for model in sharded_models():
+            for alias in aliases:
+                if model._meta.db_table not in connections[alias].introspection.table_names():
+                    # A new shard in a dry run; nothing lives there yet
+                    continue
+                user_ids = (model.objects.using(alias).order_by()
+                            .values_list('user_id', flat=True).distinct())
+                misplaced = {}
+                for user_id in user_ids:
+                    target = shard_for_user(user_id, aliases)
+                    if target != alias:
+                        misplaced.setdefault(target, []).append(user_id)
+                for target, users in misplaced.items():
+                    rows = model.objects.using(alias).filter(user_id__in=users)
+                    if options['dry_run']:
+                        moved = rows.count()
+                    else:
+                        moved = self.move(model, rows, alias, target, options['batch_size'])
+                    total += moved
+                    self.stdout.write(
+                        f"{model.__name__}: {moved} rows of {len(users)} users {alias} -> {target}"
+                    )
+
+        verb = 'Would move' if options['dry_run'] else 'Moved'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total} rows"))
+
+    def move(self, model, rows, source, target, batch_size):
+        fields = model._meta.concrete_fields
+        moved = 0
+        while True:
+            batch = list(rows.order_by('pk')[:batch_size])
+            if not batch:
+                return moved
+            # Copy with ids and timestamps intact; a rerun skips rows already copied
+            write_with_retry(lambda: model._base_manager._insert(
+                batch, fields=fields, raw=True, on_conflict=OnConflict.IGNORE, using=target,
+            ), using=target)
+            # The rows still exist for the user, so sync sees no deletes
+            with suppress_tombstones():
+                write_with_retry(lambda: model.objects.using(source)
+                                 .filter(pk__in=[row.pk for row in batch]).delete(), using=source)
+            moved += len(batch)
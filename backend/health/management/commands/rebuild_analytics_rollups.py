@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from health.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recount the daily analytics rollups from the history tables and the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Only rebuild the last this many days (default: all history)'
+        )
+        parser.add_argument(
+            '--include-today', action='store_true',
+            help="Also recount today; only safe when no web workers are running"
+        )
+
+    def handle(self, *args, **options):
+        counted = rebuild_rollups(options['days'], include_today=options['include_today'])
+        window = f"last {options['days']} days" if options['days'] else 'all history'
+        if not options['include_today']:
+            window += ' before today'
+        self.stdout.write(f"Rebuilt analytics rollups for {window} from {counted} rows")
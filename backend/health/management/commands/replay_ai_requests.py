@@ -0,0 +1,72 @@
+import glob
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from health.replay import (
+    BACKENDS, RESPONSE_FIELDS, VERDICT_FIELDS, StubBackend, get_config, load_exchanges, replay
+)
+
+
+class Command(BaseCommand):
+    help = 'Replay recorded AI endpoint exchanges against a backend; report latency and verdict agreement'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Recording files (default: every file in AI_REPLAY_RECORDER DIR)')
+        parser.add_argument('--backend', choices=sorted(BACKENDS), default='stub')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--endpoint', dest='endpoints', action='append', choices=sorted(RESPONSE_FIELDS),
+                            help='Only replay this endpoint (may be repeated)')
+        parser.add_argument('--limit', type=int, help='Replay at most this many exchanges')
+        parser.add_argument('--stub-delay', type=float, default=0.0,
+                            help='Milliseconds the stub model waits before answering')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or sorted(glob.glob(os.path.join(get_config()['DIR'], '*.jsonl')))
+        if not paths:
+            raise CommandError('No recordings found; enable AI_REPLAY_RECORDER or pass files')
+        exchanges = load_exchanges(paths, options['endpoints'], options['limit'])
+        if not exchanges:
+            raise CommandError('The recordings contain no matching exchanges')
+
+        if options['backend'] == 'stub':
+            backend = StubBackend(delay=options['stub_delay'] / 1000)
+        else:
+            backend = BACKENDS[options['backend']]()
+        started = time.perf_counter()
+        report = replay(exchanges, backend, concurrency=max(1, options['concurrency']))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Replayed {len(exchanges)} exchanges against '{options['backend']}' "
+            f"in {elapsed:.1f}s ({len(exchanges) / elapsed:.1f}/s, concurrency {options['concurrency']})"
+        )
+
+        for endpoint in sorted(report.outcomes):
+            outcomes = report.outcomes[endpoint]
+            self.stdout.write(f"\n{endpoint}: " + ', '.join(f"{name} {count}" for name, count in sorted(outcomes.items())))
+            self.write_latency('replayed', report.latency_summary(endpoint))
+            self.write_latency('recorded', report.latency_summary(endpoint, recorded=True))
+            if endpoint in VERDICT_FIELDS:
+                self.write_matrix(endpoint, report)
+
+    def write_latency(self, label, summary):
+        if summary is None:
+            return
+        self.stdout.write(
+            f"  {label:<9} ms  n={summary['count']:<6} mean {summary['mean']:>8.1f}  p50 {summary['p50']:>8.1f}  "
+            f"p90 {summary['p90']:>8.1f}  p95 {summary['p95']:>8.1f}  p99 {summary['p99']:>8.1f}  max {summary['max']:>8.1f}"
+        )
+
+    def write_matrix(self, endpoint, report):
+        matrix = report.matrices[endpoint]
+        agreement = report.agreement(endpoint)
+        if agreement is None:
+            return
+        recorded = sorted({r for r, _ in matrix}, key=str)
+        replayed = sorted({r for _, r in matrix}, key=str)
+        width = max(len(str(v)) for v in recorded + replayed + ['recorded']) + 2
+        self.stdout.write(f"  {VERDICT_FIELDS[endpoint]} agreement {agreement:.1%} (rows: recorded, columns: replayed)")
+        self.stdout.write('  ' + ' ' * width + ''.join(f"{str(v):>{width}}" for v in replayed))
+        for r in recorded:
+            self.stdout.write('  ' + f"{str(r):<{width}}" + ''.join(f"{matrix[(r, c)]:>{width}}" for c in replayed))
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def copy_database(source_path, target_path):
+    """Consistent online copy of a SQLite database, swapped into place atomically"""
+    temp_path = f'{target_path}.sync-{os.getpid()}'
+    source = sqlite3.connect(source_path)
+    try:
+        target = sqlite3.connect(temp_path)
+        try:
+            source.backup(target)
+            # WAL on the copy too, so readers never block the next swap
+            target.execute('PRAGMA journal_mode=WAL')
+        finally:
+            target.close()
+    finally:
+        source.close()
+    os.replace(temp_path, target_path)
+    for suffix in ('-wal', '-shm'):
+        try:
+            os.unlink(f'{target_path}{suffix}')
+        except FileNotFoundError:
+            pass
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the file-based read replicas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Keep syncing every this many seconds (simulates replication lag)')
+
+    def handle(self, *args, **options):
+        aliases = settings.READ_REPLICAS['ALIASES']
+        if not aliases:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS')
+        primary = str(settings.DATABASES['default']['NAME'])
+
+        while True:
+            started = time.perf_counter()
+            for alias in aliases:
+                connections[alias].close()
+                copy_database(primary, str(settings.DATABASES[alias]['NAME']))
+            self.stdout.write(f"Synced {len(aliases)} replicas in {(time.perf_counter() - started) * 1000:.0f} ms")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from health.models import SymptomAnalysis
+from health.sharding import fan_out_list
+from health.triage import LinearTriageModel, reset_model
+
+
+class Command(BaseCommand):
+    help = "Train the local symptom triage model on the LLM's stored classifications"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50000, help='Most recent rows to train on')
+        parser.add_argument('--epochs', type=int, default=15)
+        parser.add_argument('--min-confidence', type=float, default=0.6,
+                            help='Skip rows the LLM was unsure about')
+        parser.add_argument('--output', default=str(settings.SYMPTOM_TRIAGE_MODEL_PATH))
+
+    def handle(self, *args, **options):
+        # Labels are the LLM's verdicts, never triage's own (that would only
+        # teach the model its past predictions)
+        rows = (SymptomAnalysis.objects
+                .filter(llm_confidence_score__gte=options['min_confidence'])
+                .exclude(llm_classification__in=['', 'unknown'])
+                .order_by('-analyzed_at')
+                .values_list('analyzed_at', 'symptoms', 'llm_classification')[:options['limit']])
+        # The most recent rows of each shard, merged
+        merged = sorted(fan_out_list(rows), key=lambda row: row[0], reverse=True)
+        samples = [(symptoms, label) for _, symptoms, label in merged[:options['limit']]]
+        if not samples:
+            raise CommandError('No labelled SymptomAnalysis rows to train on')
+
+        model = LinearTriageModel.train(samples, epochs=options['epochs'])
+        correct = sum(
+            max(probs := model.predict_proba(text), key=probs.get) == label
+            for text, label in samples
+        )
+        with open(options['output'], 'w') as fh:
+            json.dump(model.to_dict(), fh)
+        reset_model()
+
+        self.stdout.write(
+            f"Trained on {len(samples)} rows, training accuracy {correct / len(samples):.1%}, "
+            f"saved to {options['output']}"
+        )
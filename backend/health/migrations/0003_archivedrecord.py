@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0002_unreadalertcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_type', models.CharField(choices=[('chat_message', 'Chat Message'), ('risk_check', 'Risk Check'), ('symptom_analysis', 'Symptom Analysis')], max_length=20)),
+                ('original_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('payload', models.BinaryField(help_text='zlib-compressed JSON of the remaining fields')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'record_type', '-created_at'], name='archived_user_type_idx')],
+                'constraints': [models.UniqueConstraint(fields=('record_type', 'original_id'), name='unique_archived_record')],
+            },
+        ),
+    ]
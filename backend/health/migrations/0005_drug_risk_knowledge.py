@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:24
+
+from django.db import migrations, models
+
+# Recommendations written by the placeholder results used when Gemini failed
+FALLBACK_RECOMMENDATIONS = [
+    'Please consult with a healthcare professional before taking this medication',
+    'Professional medical evaluation recommended',
+    'Seek professional medical advice',
+    'Consult healthcare provider immediately',
+]
+
+
+def mark_fallback_checks(apps, schema_editor):
+    RiskCheckRecord = apps.get_model('health', 'RiskCheckRecord')
+    RiskCheckRecord.objects.filter(recommendations__in=FALLBACK_RECOMMENDATIONS).update(source='fallback')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0004_sync_updated_at_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='riskcheckrecord',
+            name='allergen_key',
+            field=models.CharField(blank=True, help_text='Canonical allergen classes checked against', max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='riskcheckrecord',
+            name='source',
+            field=models.CharField(choices=[('ai', 'AI Analysis'), ('fallback', 'Fallback'), ('knowledge', 'Knowledge Base'), ('manual', 'Entered by User')], default='ai', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DrugRiskKnowledge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drug', models.CharField(max_length=100)),
+                ('allergen_key', models.CharField(blank=True, max_length=255)),
+                ('risk_level', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=20)),
+                ('potential_reactions', models.JSONField(default=list)),
+                ('recommendations', models.JSONField(default=list)),
+                ('sample_count', models.PositiveIntegerField(default=0)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('agreement', models.FloatField(default=0.0, help_text='Share of verdicts matching risk_level')),
+                ('source', models.CharField(choices=[('observed', 'Observed'), ('prewarmed', 'Pre-warmed')], max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Drug risk knowledge',
+                'constraints': [models.UniqueConstraint(fields=('drug', 'allergen_key'), name='unique_drug_allergen_key')],
+            },
+        ),
+        migrations.RunPython(mark_fallback_checks, migrations.RunPython.noop),
+    ]
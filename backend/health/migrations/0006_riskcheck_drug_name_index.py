@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0005_drug_risk_knowledge'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='riskcheckrecord',
+            index=models.Index(fields=['drug_name'], name='riskcheck_drug_name_idx'),
+        ),
+    ]
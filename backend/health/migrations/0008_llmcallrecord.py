@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0007_idempotencyrecord'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.CharField(choices=[('drug_risk', 'Drug Risk'), ('symptoms', 'Symptom Analysis'), ('chat', 'Chat'), ('prewarm', 'Knowledge Pre-warm')], max_length=20)),
+                ('model_name', models.CharField(max_length=40)),
+                ('prompt_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('response_tokens', models.PositiveIntegerField(blank=True, null=True)),
+                ('latency_ms', models.PositiveIntegerField()),
+                ('outcome', models.CharField(choices=[('ok', 'OK'), ('error', 'Error')], max_length=10)),
+                ('cache_status', models.CharField(choices=[('miss', 'Miss'), ('hit', 'Similarity Cache Hit'), ('knowledge', 'Knowledge Base Hit')], default='miss', max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llm_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'LLM call',
+                'indexes': [models.Index(fields=['created_at', 'operation'], name='llmcall_created_op_idx')],
+            },
+        ),
+    ]
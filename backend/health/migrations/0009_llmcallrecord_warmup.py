@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0008_llmcallrecord'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='llmcallrecord',
+            name='cache_status',
+            field=models.CharField(choices=[('miss', 'Miss'), ('hit', 'Similarity Cache Hit'), ('knowledge', 'Knowledge Base Hit'), ('warm', 'Login Warm-up Hit')], default='miss', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='llmcallrecord',
+            name='operation',
+            field=models.CharField(choices=[('drug_risk', 'Drug Risk'), ('symptoms', 'Symptom Analysis'), ('chat', 'Chat'), ('prewarm', 'Knowledge Pre-warm'), ('warmup', 'Login Warm-up')], max_length=20),
+        ),
+    ]
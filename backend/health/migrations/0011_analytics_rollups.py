@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-19 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0010_sharded_history_user_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrugCheckRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('drug', models.CharField(max_length=100)),
+                ('risk_level', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'drug', 'risk_level'), name='unique_drug_check_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SymptomRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('classification', models.CharField(max_length=50)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'classification'), name='unique_symptom_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:15
+
+from django.db import migrations, models
+
+
+def copy_llm_labels(apps, schema_editor):
+    # Until now non-urgent analyses stored the LLM's verdict; urgent ones
+    # (triage-classified) start with the emergency guidance
+    SymptomAnalysis = apps.get_model('health', 'SymptomAnalysis')
+    (SymptomAnalysis.objects.using(schema_editor.connection.alias)
+     .exclude(recommendations__startswith='Call emergency services')
+     .update(llm_classification=models.F('classification'),
+             llm_confidence_score=models.F('confidence_score')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0011_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='symptomanalysis',
+            name='llm_classification',
+            field=models.CharField(blank=True, choices=[('allergic_reaction', 'Allergic Reaction'), ('side_effect', 'Side Effect'), ('unrelated', 'Unrelated'), ('unknown', 'Unknown')], default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='symptomanalysis',
+            name='llm_confidence_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_llm_labels, migrations.RunPython.noop,
+                             hints={'model_name': 'symptomanalysis'}),
+    ]
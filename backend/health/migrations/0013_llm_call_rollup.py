@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0012_symptom_llm_classification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('operation', models.CharField(max_length=20)),
+                ('calls', models.PositiveIntegerField(default=0)),
+                ('cache_hits', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveBigIntegerField(default=0)),
+                ('response_tokens', models.PositiveBigIntegerField(default=0)),
+                ('mean_latency_ms', models.FloatField(blank=True, null=True)),
+                ('p95_latency_ms', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'LLM call rollup',
+                'constraints': [models.UniqueConstraint(fields=('day', 'operation'), name='unique_llm_call_rollup')],
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .sharding import ShardedManager
 
 
 class UserProfile(models.Model):
@@ -22,6 +25,9 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'updated_at'], name='profile_user_updated_idx')]
+
 
 class Allergy(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='allergies')
@@ -34,12 +40,14 @@ class Allergy(models.Model):
     symptoms = models.TextField(null=True, blank=True)
     diagnosed_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.name}"
 
     class Meta:
         verbose_name_plural = "Allergies"
+        indexes = [models.Index(fields=['user', 'updated_at'], name='allergy_user_updated_idx')]
 
 
 class Medication(models.Model):
@@ -53,13 +61,17 @@ class Medication(models.Model):
     notes = models.TextField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.name}"
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'updated_at'], name='medication_user_updated_idx')]
+
 
 class RiskCheckRecord(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='risk_checks')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='risk_checks', db_constraint=False)
     drug_name = models.CharField(max_length=100)
     risk_level = models.CharField(max_length=20, choices=[
         ('low', 'Low'),
@@ -68,35 +80,63 @@ class RiskCheckRecord(models.Model):
     ])
     potential_reactions = models.JSONField(default=list)
     recommendations = models.TextField()
+    source = models.CharField(max_length=20, default='ai', choices=[
+        ('ai', 'AI Analysis'),
+        ('fallback', 'Fallback'),
+        ('knowledge', 'Knowledge Base'),
+        ('manual', 'Entered by User')
+    ])
+    allergen_key = models.CharField(max_length=255, null=True, blank=True,
+                                    help_text="Canonical allergen classes checked against")
     checked_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShardedManager()
 
     def __str__(self):
         return f"{self.user.username} - {self.drug_name} ({self.risk_level})"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='riskcheck_user_updated_idx'),
+            models.Index(fields=['drug_name'], name='riskcheck_drug_name_idx'),
+        ]
+
+
+SYMPTOM_CLASSIFICATIONS = [
+    ('allergic_reaction', 'Allergic Reaction'),
+    ('side_effect', 'Side Effect'),
+    ('unrelated', 'Unrelated'),
+    ('unknown', 'Unknown')
+]
+
 
 class SymptomAnalysis(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='symptom_analyses')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='symptom_analyses', db_constraint=False)
     symptoms = models.TextField()
-    classification = models.CharField(max_length=50, choices=[
-        ('allergic_reaction', 'Allergic Reaction'),
-        ('side_effect', 'Side Effect'),
-        ('unrelated', 'Unrelated'),
-        ('unknown', 'Unknown')
-    ])
+    # Local triage verdict, returned to the client
+    classification = models.CharField(max_length=50, choices=SYMPTOM_CLASSIFICATIONS)
     confidence_score = models.FloatField(default=0.0)
+    # The LLM's own verdict, kept as training labels for the triage model
+    llm_classification = models.CharField(max_length=50, choices=SYMPTOM_CLASSIFICATIONS, blank=True, default='')
+    llm_confidence_score = models.FloatField(null=True, blank=True)
     ai_analysis = models.TextField()
     recommendations = models.TextField()
     analyzed_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShardedManager()
 
     def __str__(self):
         return f"{self.user.username} - {self.classification}"
 
     class Meta:
         verbose_name_plural = "Symptom Analyses"
+        indexes = [models.Index(fields=['user', 'updated_at'], name='symptom_user_updated_idx')]
 
 
 class ChatMessage(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages', db_constraint=False)
     message = models.TextField()
     response = models.TextField()
     message_type = models.CharField(max_length=20, choices=[
@@ -106,12 +146,16 @@ class ChatMessage(models.Model):
         ('emergency', 'Emergency')
     ], default='general')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ShardedManager()
 
     def __str__(self):
         return f"{self.user.username} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', 'updated_at'], name='chat_user_updated_idx')]
 
 
 class HealthAlert(models.Model):
@@ -125,9 +169,216 @@ class HealthAlert(models.Model):
     ])
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        # The row and its unread counter adjustment (post_save) commit together
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored read state so saves can adjust the unread counter
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['user', 'updated_at'], name='alert_user_updated_idx')]
+
+
+class UnreadAlertCounter(models.Model):
+    """Denormalized per-user count of unread HealthAlert rows"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True,
+                                related_name='unread_alert_counter')
+    unread_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.unread_count} unread"
+
+
+class ArchivedRecord(models.Model):
+    """Compressed cold-storage copy of an old ChatMessage or analysis row"""
+    record_type = models.CharField(max_length=20, choices=[
+        ('chat_message', 'Chat Message'),
+        ('risk_check', 'Risk Check'),
+        ('symptom_analysis', 'Symptom Analysis')
+    ])
+    original_id = models.BigIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_records')
+    created_at = models.DateTimeField()
+    payload = models.BinaryField(help_text="zlib-compressed JSON of the remaining fields")
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.record_type} #{self.original_id}"
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['record_type', 'original_id'], name='unique_archived_record'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'record_type', '-created_at'], name='archived_user_type_idx'),
+        ]
+
+
+class DeletedRecord(models.Model):
+    """Tombstone for a deleted health row, so delta sync can report deletes"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deleted_records')
+    collection = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.collection} #{self.object_id}"
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'deleted_at'], name='deleted_user_deleted_idx')]
+
+
+class DrugRiskKnowledge(models.Model):
+    """Population-level drug risk verdict per (canonical drug, allergen classes)"""
+    drug = models.CharField(max_length=100)
+    allergen_key = models.CharField(max_length=255, blank=True)
+    risk_level = models.CharField(max_length=20, choices=[
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High')
+    ])
+    potential_reactions = models.JSONField(default=list)
+    recommendations = models.JSONField(default=list)
+    sample_count = models.PositiveIntegerField(default=0)
+    user_count = models.PositiveIntegerField(default=0)
+    agreement = models.FloatField(default=0.0, help_text="Share of verdicts matching risk_level")
+    source = models.CharField(max_length=20, choices=[
+        ('observed', 'Observed'),
+        ('prewarmed', 'Pre-warmed')
+    ])
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.drug} / {self.allergen_key or 'no allergies'} ({self.risk_level})"
+
+    class Meta:
+        verbose_name_plural = "Drug risk knowledge"
+        constraints = [
+            models.UniqueConstraint(fields=['drug', 'allergen_key'], name='unique_drug_allergen_key'),
+        ]
+
+
+class IdempotencyRecord(models.Model):
+    """Stored outcome of an AI POST made with an Idempotency-Key header"""
+    owner = models.CharField(max_length=64, help_text="user:<id>, or ip:<address> for anonymous chat")
+    endpoint = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, default='pending', choices=[
+        ('pending', 'Pending'),
+        ('complete', 'Complete')
+    ])
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.owner} {self.endpoint} {self.key} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'endpoint', 'key'], name='unique_idempotency_key'),
+        ]
+
+
+class LLMCallRecord(models.Model):
+    """One Gemini call, or one answer served from a cache instead of a call"""
+    operation = models.CharField(max_length=20, choices=[
+        ('drug_risk', 'Drug Risk'),
+        ('symptoms', 'Symptom Analysis'),
+        ('chat', 'Chat'),
+        ('prewarm', 'Knowledge Pre-warm'),
+        ('warmup', 'Login Warm-up')
+    ])
+    model_name = models.CharField(max_length=40)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                             related_name='llm_calls', db_constraint=False)
+    prompt_tokens = models.PositiveIntegerField(null=True, blank=True)
+    response_tokens = models.PositiveIntegerField(null=True, blank=True)
+    latency_ms = models.PositiveIntegerField()
+    outcome = models.CharField(max_length=10, choices=[
+        ('ok', 'OK'),
+        ('error', 'Error')
+    ])
+    cache_status = models.CharField(max_length=10, default='miss', choices=[
+        ('miss', 'Miss'),
+        ('hit', 'Similarity Cache Hit'),
+        ('knowledge', 'Knowledge Base Hit'),
+        ('warm', 'Login Warm-up Hit')
+    ])
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.operation} {self.outcome} {self.latency_ms}ms"
+
+    class Meta:
+        verbose_name = "LLM call"
+        indexes = [models.Index(fields=['created_at', 'operation'], name='llmcall_created_op_idx')]
+
+
+class LLMCallRollup(models.Model):
+    """LLM calls per closed day and operation, kept after the raw ledger rows are pruned"""
+    day = models.DateField()
+    operation = models.CharField(max_length=20)
+    calls = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    response_tokens = models.PositiveBigIntegerField(default=0)
+    mean_latency_ms = models.FloatField(null=True, blank=True)
+    p95_latency_ms = models.PositiveIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.day} {self.operation}: {self.calls} calls"
+
+    class Meta:
+        verbose_name = "LLM call rollup"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'operation'], name='unique_llm_call_rollup'),
+        ]
+
+
+class DrugCheckRollup(models.Model):
+    """Risk checks per day, canonical drug and risk level, for the analytics API"""
+    day = models.DateField()
+    drug = models.CharField(max_length=100)
+    risk_level = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.drug} ({self.risk_level}): {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'drug', 'risk_level'], name='unique_drug_check_rollup'),
+        ]
+
+
+class SymptomRollup(models.Model):
+    """Symptom analyses per day and classification, for the analytics API"""
+    day = models.DateField()
+    classification = models.CharField(max_length=50)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.classification}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'classification'], name='unique_symptom_rollup'),
+        ]
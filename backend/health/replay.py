@@ -0,0 +1,359 @@
+"""
+Record-and-replay harness for the AI endpoints.
+
+With ``AI_REPLAY_RECORDER['ENABLED']`` the ``@recorded`` views append a
+sanitized copy of each exchange to a per-process JSONL file: the model
+inputs the view resolved (drug, combined allergies, symptoms, chat context),
+the verdict fields of the response, the model's own verdict where the
+response shows another one (symptom analyses answer with the local triage
+classification; the LLM's label is kept next to it) and the endpoint
+latency. User ids,
+record ids and free-text identifiers (emails, phone numbers, URLs, long
+digit runs) are not kept.
+
+``python manage.py replay_ai_requests`` runs a recording against a backend
+and compares latency and verdicts with what was recorded:
+
+* ``live``: GeminiAIService against the real model.
+* ``stub``: GeminiAIService with a stub model that answers the recorded
+  verdict after a fixed delay, i.e. prompt building and parsing only.
+* ``cache``: the drug risk knowledge table, and a chat answer cache filled
+  from the recording as it is replayed; a miss counts as no answer.
+* ``local``: local engines only (symptom triage).
+"""
+import json
+import os
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from django.conf import settings
+from django.utils import timezone
+
+from .gemini_service import GeminiAIService
+from .knowledge import lookup
+from .llm_ledger import percentile
+from .similarity_cache import NearDuplicateCache
+from .triage import triage_symptoms
+
+ENDPOINT_DRUG_RISK = 'check-drug-risk'
+ENDPOINT_SYMPTOMS = 'analyze-symptoms'
+ENDPOINT_CHAT = 'chat'
+
+# Response fields worth comparing; ids and user-specific fields are dropped
+RESPONSE_FIELDS = {
+    ENDPOINT_DRUG_RISK: ['risk_level', 'potential_reactions', 'recommendations', 'source'],
+    ENDPOINT_SYMPTOMS: ['classification', 'confidence_score', 'recommendations', 'urgent'],
+    ENDPOINT_CHAT: ['response'],
+}
+# The verdict field compared in the agreement matrix
+VERDICT_FIELDS = {
+    ENDPOINT_DRUG_RISK: 'risk_level',
+    ENDPOINT_SYMPTOMS: 'classification',
+}
+# Endpoints whose response verdict is not the model's: agreement is measured
+# against the recorded model verdict, and exchanges without one are left out
+MODEL_VERDICT_ENDPOINTS = {ENDPOINT_SYMPTOMS}
+
+_SCRUB_PATTERNS = [
+    (re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+'), '<email>'),
+    (re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE), '<url>'),
+    (re.compile(r'\+?\d[\d\s().-]{7,}\d'), '<number>'),
+    (re.compile(r'\d{6,}'), '<number>'),
+]
+
+
+def get_config():
+    return settings.AI_REPLAY_RECORDER
+
+
+def scrub(value):
+    """Strip identifiers from free text, recursively through lists and dicts"""
+    if isinstance(value, str):
+        for pattern, replacement in _SCRUB_PATTERNS:
+            value = pattern.sub(replacement, value)
+        return value
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    if isinstance(value, dict):
+        return {key: scrub(item) for key, item in value.items()}
+    return value
+
+
+def note_inputs(request, **inputs):
+    """Record the model inputs a view resolved (e.g. allergies from the database)"""
+    request.replay_inputs = inputs
+
+
+def note_model_verdict(request, **verdict):
+    """Record the model's verdict when the response carries a different one"""
+    request.replay_model_verdict = verdict
+
+
+def reference_verdict(exchange, field):
+    """The recorded verdict a replayed answer is compared with, or None"""
+    if exchange['endpoint'] in MODEL_VERDICT_ENDPOINTS:
+        return (exchange.get('model_verdict') or {}).get(field)
+    return exchange['response'].get(field)
+
+
+class Recorder:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._fd = None
+        self._day = None
+
+    def _file(self):
+        day = timezone.now().strftime('%Y%m%d')
+        if self._fd is None or day != self._day:
+            if self._fd is not None:
+                os.close(self._fd)
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{day}-{os.getpid()}.jsonl')
+            self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+            self._day = day
+        return self._fd
+
+    def write(self, exchange):
+        line = (json.dumps(exchange, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            os.write(self._file(), line)
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = Recorder(get_config()['DIR'])
+    return _recorder
+
+
+def recorded(endpoint):
+    """
+    Record sanitized exchanges of an AI function view. Place it above
+    ``@idempotent`` so replayed idempotent responses are skipped.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            config = get_config()
+            if not config['ENABLED'] or random.random() >= config['SAMPLE_RATE']:
+                return view(request, *args, **kwargs)
+            started = time.perf_counter()
+            response = view(request, *args, **kwargs)
+            latency_ms = (time.perf_counter() - started) * 1000
+            if response.status_code != 200 or response.has_header('Idempotent-Replayed'):
+                return response
+            inputs = getattr(request, 'replay_inputs', None)
+            if inputs is None:
+                return response
+            exchange = {
+                'endpoint': endpoint,
+                'recorded_at': timezone.now().isoformat(),
+                'inputs': scrub(inputs),
+                'response': scrub({f: response.data[f] for f in RESPONSE_FIELDS[endpoint] if f in response.data}),
+                'latency_ms': round(latency_ms, 1),
+            }
+            model_verdict = getattr(request, 'replay_model_verdict', None)
+            if model_verdict:
+                exchange['model_verdict'] = model_verdict
+            try:
+                get_recorder().write(exchange)
+            except OSError:
+                pass  # Recording is best effort
+            return response
+        return wrapper
+    return decorator
+
+
+def load_exchanges(paths, endpoints=None, limit=None):
+    exchanges = []
+    for path in paths:
+        with open(path, encoding='utf-8') as fh:
+            for line in fh:
+                try:
+                    exchange = json.loads(line)
+                except ValueError:
+                    continue
+                if endpoints and exchange.get('endpoint') not in endpoints:
+                    continue
+                exchanges.append(exchange)
+                if limit and len(exchanges) >= limit:
+                    return exchanges
+    return exchanges
+
+
+class Unsupported(Exception):
+    """The backend cannot answer this endpoint"""
+
+
+class StubModel:
+    """Stands in for GenerativeModel: answers the recorded verdict after ``delay`` seconds"""
+    model_name = 'replay-stub'
+
+    def __init__(self, answer, delay):
+        self.answer = answer
+        self.delay = delay
+
+    def generate_content(self, prompt):
+        time.sleep(self.delay)
+        return StubResponse(self.answer)
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def _service_call(service, exchange):
+    inputs = exchange['inputs']
+    endpoint = exchange['endpoint']
+    if endpoint == ENDPOINT_DRUG_RISK:
+        return service.analyze_drug_risk(inputs['drug_name'], inputs.get('allergies', []))
+    if endpoint == ENDPOINT_SYMPTOMS:
+        return service.analyze_symptoms(inputs['symptoms'], inputs.get('medications', []))
+    return {'response': service.chat_health_assistant(
+        inputs['message'], inputs.get('allergies'), inputs.get('medications'),
+        inputs.get('message_type', 'general'),
+    )}
+
+
+class LiveBackend:
+    def answer(self, exchange):
+        return _service_call(GeminiAIService(), exchange)
+
+
+class StubBackend:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def answer(self, exchange):
+        # The stub answers what the model answered, not what the endpoint showed
+        recorded = {**exchange['response'], **exchange.get('model_verdict', {})}
+        text = recorded['response'] if exchange['endpoint'] == ENDPOINT_CHAT else json.dumps(recorded)
+        return _service_call(GeminiAIService(model=StubModel(text, self.delay)), exchange)
+
+
+class CacheBackend:
+    def __init__(self):
+        config = settings.CHAT_SIMILARITY_CACHE
+        self.chat_cache = NearDuplicateCache(
+            threshold=config.get('THRESHOLD', 0.8),
+            num_perm=config.get('NUM_PERM', 64),
+            bands=config.get('BANDS', 16),
+            shingle_size=config.get('SHINGLE_SIZE', 4),
+            max_entries=config.get('MAX_ENTRIES', 2048),
+            ttl_seconds=config.get('TTL_SECONDS', 86400),
+        )
+
+    def answer(self, exchange):
+        inputs = exchange['inputs']
+        endpoint = exchange['endpoint']
+        if endpoint == ENDPOINT_DRUG_RISK:
+            return lookup(inputs['drug_name'], inputs.get('allergies', []))
+        if endpoint == ENDPOINT_CHAT:
+            if inputs.get('allergies') or inputs.get('medications'):
+                return None  # Never served from the cache live either
+            message_type = inputs.get('message_type', 'general')
+            cached = self.chat_cache.get(message_type, inputs['message'])
+            if cached is None:
+                self.chat_cache.set(message_type, inputs['message'], exchange['response'].get('response', ''))
+                return None
+            return {'response': cached}
+        raise Unsupported(endpoint)
+
+
+class LocalBackend:
+    def answer(self, exchange):
+        if exchange['endpoint'] != ENDPOINT_SYMPTOMS:
+            raise Unsupported(exchange['endpoint'])
+        return triage_symptoms(exchange['inputs']['symptoms']).as_dict()
+
+
+BACKENDS = {
+    'live': LiveBackend,
+    'stub': StubBackend,
+    'cache': CacheBackend,
+    'local': LocalBackend,
+}
+
+
+class ReplayReport:
+
+    def __init__(self):
+        self.latencies = defaultdict(list)  # endpoint -> ms
+        self.recorded_latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)  # endpoint -> answered/miss/unsupported/error
+        self.matrices = defaultdict(Counter)  # endpoint -> (recorded, replayed) -> count
+
+    def add(self, exchange, outcome, latency_ms=None, result=None):
+        endpoint = exchange['endpoint']
+        self.outcomes[endpoint][outcome] += 1
+        if outcome != 'answered':
+            return
+        self.latencies[endpoint].append(latency_ms)
+        if exchange.get('latency_ms') is not None:
+            self.recorded_latencies[endpoint].append(exchange['latency_ms'])
+        field = VERDICT_FIELDS.get(endpoint)
+        if field:
+            reference = reference_verdict(exchange, field)
+            if reference is not None:
+                self.matrices[endpoint][(reference, result.get(field))] += 1
+
+    def latency_summary(self, endpoint, recorded=False):
+        values = sorted((self.recorded_latencies if recorded else self.latencies)[endpoint])
+        if not values:
+            return None
+        return {
+            'count': len(values),
+            'mean': statistics.fmean(values),
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99),
+            'max': values[-1],
+        }
+
+    def agreement(self, endpoint):
+        matrix = self.matrices[endpoint]
+        total = sum(matrix.values())
+        if not total:
+            return None
+        return sum(n for (recorded, replayed), n in matrix.items() if recorded == replayed) / total
+
+
+def replay(exchanges, backend, concurrency=4):
+    """Answer every exchange with ``backend`` using ``concurrency`` threads"""
+    report = ReplayReport()
+    lock = threading.Lock()
+
+    def run(exchange):
+        outcome, latency_ms, result = 'answered', None, None
+        started = time.perf_counter()
+        try:
+            result = backend.answer(exchange)
+            latency_ms = (time.perf_counter() - started) * 1000
+            if result is None:
+                outcome = 'miss'
+        except Unsupported:
+            outcome = 'unsupported'
+        except Exception:
+            outcome = 'error'
+        with lock:
+            report.add(exchange, outcome, latency_ms, result)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(run, exchanges))
+    return report
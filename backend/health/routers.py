@@ -0,0 +1,181 @@
+"""
+Read/write split across the primary database and read replicas.
+
+Writes always go to ``default``. Reads go to a replica only where a view
+opts in after authentication: read-only requests to the health viewsets and
+``health_summary``. Everything else (admin, auth, delta sync, background
+jobs, any read in a transaction) reads from the primary.
+
+Replicas lag behind the primary, so a user who just wrote is pinned to the
+primary for ``READ_REPLICAS['PIN_SECONDS']``. ``ReplicaPinningMiddleware``
+records the pin in the shared ``health`` cache after every successful unsafe
+request, so it holds across worker processes. A request that writes inside
+a replica block (e.g. the summary creating a missing profile) reads its own
+writes from the primary for the rest of the request.
+
+Replica aliases are configured from ``DATABASE_REPLICAS`` (comma-separated
+SQLite files). ``python manage.py sync_replicas`` copies the primary into
+them, which also makes lag easy to reproduce locally.
+
+``ShardRouter`` comes first and places the per-user history tables on their
+user's shard (see ``health.sharding``); sharded tables are not replicated.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.contrib.auth.models import User
+from django.db import connections
+
+from .sharding import is_sharded, shard_aliases, shard_for_user, sharding_enabled
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class _ReadState:
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.wrote = False
+
+
+_read_state = ContextVar('health_read_state', default=None)
+
+
+def get_config():
+    return settings.READ_REPLICAS
+
+
+def _pin_key(user_id):
+    return f'health:primary-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    config = get_config()
+    caches[config['CACHE_ALIAS']].set(_pin_key(user_id), time.time(), config['PIN_SECONDS'])
+
+
+def is_pinned(user_id):
+    config = get_config()
+    return caches[config['CACHE_ALIAS']].get(_pin_key(user_id)) is not None
+
+
+def choose_replica():
+    return random.choice(get_config()['ALIASES'])
+
+
+@contextmanager
+def replica_scope():
+    """Per-request routing state; reads stay on the primary until ``use_replica_for``"""
+    token = _read_state.set(_ReadState(None))
+    try:
+        yield
+    finally:
+        _read_state.reset(token)
+
+
+def use_replica_for(user):
+    """Route the current scope's reads to a replica, unless ``user`` is pinned to the primary"""
+    state = _read_state.get()
+    if state is None or not get_config()['ALIASES']:
+        return
+    if user is not None and user.is_authenticated and is_pinned(user.pk):
+        return
+    state.alias = choose_replica()
+
+
+@contextmanager
+def read_from_replica(user=None):
+    """Send reads in this block to one replica, unless ``user`` is pinned to the primary"""
+    with replica_scope():
+        use_replica_for(user)
+        yield
+
+
+def current_read_alias():
+    state = _read_state.get()
+    if state is None or state.alias is None or state.wrote or connections[PRIMARY].in_atomic_block:
+        return PRIMARY
+    return state.alias
+
+
+class ShardRouter:
+
+    def _shard(self, model, hints):
+        if not sharding_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, model):
+            return instance._state.db or shard_for_user(instance.user_id)
+        if isinstance(instance, User):
+            # Related manager access, e.g. user.chat_messages
+            return shard_for_user(instance.pk)
+        # Unscoped queries must say where they run (for_user, .using, fan_out)
+        return PRIMARY
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # _meta rather than type(): request.user is a SimpleLazyObject
+        if is_sharded(obj1._meta.model) or is_sharded(obj2._meta.model):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == PRIMARY or db not in shard_aliases():
+            return None
+        # Shard databases only hold the sharded tables. Migration hints carry
+        # historical models without custom managers, so look up the real one.
+        if model_name is None:
+            return False
+        try:
+            return is_sharded(apps.get_model(app_label, model_name))
+        except LookupError:
+            return False
+
+
+class ReadReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return current_read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _read_state.get()
+        if state is not None:
+            # Read-your-writes for the rest of the request
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated directly
+        return db == PRIMARY
+
+
+class ReplicaPinningMiddleware:
+    """Pin a user to the primary after a successful write request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (get_config()['ALIASES'] and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
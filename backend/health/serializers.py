@@ -6,6 +6,38 @@ from .models import (
 )
 
 
+def select_field_names(available, fields=None, omit=None):
+    """
+    Narrow ``available`` field names to those requested with ``fields`` and
+    not listed in ``omit``, keeping the declared order.
+    """
+    unknown = sorted((set(fields or ()) | set(omit or ())) - set(available))
+    if unknown:
+        raise serializers.ValidationError({
+            'fields': f"Unknown field(s): {', '.join(unknown)}. "
+                      f"Available: {', '.join(available)}"
+        })
+    return [
+        name for name in available
+        if (not fields or name in fields) and name not in (omit or ())
+    ]
+
+
+class SparseFieldsMixin:
+    """
+    Accepts ``fields`` and ``omit`` keyword arguments that drop the other
+    declared fields from the output (backs ``?fields=`` / ``?omit=``).
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields or omit:
+            keep = set(select_field_names(list(self.fields), fields, omit))
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -13,7 +45,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -22,42 +54,42 @@ class UserProfileSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
-class AllergySerializer(serializers.ModelSerializer):
+class AllergySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Allergy
         fields = '__all__'
         read_only_fields = ['id', 'user', 'created_at']
 
 
-class MedicationSerializer(serializers.ModelSerializer):
+class MedicationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Medication
         fields = '__all__'
         read_only_fields = ['id', 'user', 'created_at']
 
 
-class RiskCheckRecordSerializer(serializers.ModelSerializer):
+class RiskCheckRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = RiskCheckRecord
         fields = '__all__'
-        read_only_fields = ['id', 'user', 'checked_at']
+        read_only_fields = ['id', 'user', 'source', 'allergen_key', 'checked_at']
 
 
-class SymptomAnalysisSerializer(serializers.ModelSerializer):
+class SymptomAnalysisSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = SymptomAnalysis
-        fields = '__all__'
+        exclude = ['llm_classification', 'llm_confidence_score']
         read_only_fields = ['id', 'user', 'analyzed_at']
 
 
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
         fields = '__all__'
         read_only_fields = ['id', 'user', 'created_at']
 
 
-class HealthAlertSerializer(serializers.ModelSerializer):
+class HealthAlertSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = HealthAlert
         fields = '__all__'
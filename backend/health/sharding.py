@@ -0,0 +1,158 @@
+"""
+Per-user sharding of the health history tables.
+
+RiskCheckRecord, SymptomAnalysis and ChatMessage rows are only ever read per
+user, so each user's rows live on one shard: the primary (``default``) or
+one of the SQLite files in ``HEALTH_SHARD_FILES``. A user is mapped to a
+shard by jump consistent hashing of the user id. Adding a shard at the end
+of the list moves only ~1/N of the users, and ``python manage.py
+rebalance_shards`` copies their rows over.
+
+* Per-user queries go through ``Model.objects.for_user(user)``, and writes
+  of an instance are routed by its ``user_id`` (``ShardRouter``).
+* Primary keys come from the primary's ``sqlite_sequence``
+  (``reserve_ids``), so ids are unique across shards and a row keeps its id
+  when it moves.
+* Cross-user reporting and the admin run one query per shard in parallel
+  with ``fan_out``.
+
+With no extra shard files everything stays on ``default`` and none of this
+changes a query.
+"""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, models
+
+from .db import reserve_ids
+
+PRIMARY = 'default'
+
+
+def get_config():
+    return settings.HEALTH_SHARDING
+
+
+def shard_aliases():
+    return get_config()['ALIASES']
+
+
+def sharding_enabled():
+    return len(shard_aliases()) > 1
+
+
+def jump_hash(key, buckets):
+    """Jump consistent hash (Lamping & Veach): bucket for a 64-bit key"""
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def shard_for_user(user_id, aliases=None):
+    aliases = aliases or shard_aliases()
+    if len(aliases) == 1:
+        return aliases[0]
+    key = int.from_bytes(hashlib.blake2b(str(user_id).encode('ascii'), digest_size=8).digest(), 'big')
+    return aliases[jump_hash(key, len(aliases))]
+
+
+def is_sharded(model):
+    return isinstance(model._default_manager, ShardedManager)
+
+
+def sharded_models():
+    return [model for model in apps.get_app_config('health').get_models() if is_sharded(model)]
+
+
+class ShardedQuerySet(models.QuerySet):
+
+    def create(self, **kwargs):
+        # QuerySet.create() routes without the instance; let save() route by user_id
+        instance = self.model(**kwargs)
+        self._for_write = True
+        instance.save(force_insert=True, using=self._db)
+        return instance
+
+
+class ShardedManager(models.Manager.from_queryset(ShardedQuerySet)):
+
+    def for_user(self, user):
+        """The user's rows, on the user's shard"""
+        user_id = getattr(user, 'pk', user)
+        queryset = self.filter(user_id=user_id)
+        if sharding_enabled():
+            queryset = queryset.using(shard_for_user(user_id))
+        return queryset
+
+
+def for_user(model, user):
+    """``model``'s rows for ``user``, whether or not the model is sharded"""
+    if is_sharded(model):
+        return model._default_manager.for_user(user)
+    return model._default_manager.filter(user=user)
+
+
+def _run_on(func, alias):
+    try:
+        return func(alias)
+    finally:
+        # Worker threads open their own connections; don't leak them
+        connections[alias].close()
+
+
+def fan_out(func, aliases=None):
+    """``[func(alias) for alias in aliases]``, one thread per shard"""
+    aliases = aliases or shard_aliases()
+    if len(aliases) == 1:
+        return [func(aliases[0])]
+    with ThreadPoolExecutor(max_workers=len(aliases), thread_name_prefix='health-shard') as pool:
+        return list(pool.map(lambda alias: _run_on(func, alias), aliases))
+
+
+def fan_out_list(queryset):
+    """Evaluate ``queryset`` on every shard in parallel and concatenate the rows"""
+    return list(chain.from_iterable(fan_out(lambda alias: list(queryset.using(alias)))))
+
+
+class IdAllocator:
+    """Hands out globally unique ids for sharded rows from reserved blocks"""
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}  # model -> (next id, end of block)
+
+    def next_id(self, model):
+        with self._lock:
+            next_id, end = self._blocks.get(model, (0, 0))
+            if next_id >= end:
+                next_id = reserve_ids(model, self.block_size)
+                end = next_id + self.block_size
+            self._blocks[model] = (next_id + 1, end)
+            return next_id
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    if _allocator is None:
+        with _allocator_lock:
+            if _allocator is None:
+                _allocator = IdAllocator(get_config()['ID_BLOCK'])
+    return _allocator
+
+
+def assign_global_id(sender, instance, raw=False, **kwargs):
+    """pre_save: new sharded rows get their id from the primary's sequence"""
+    if instance.pk is None and sharding_enabled():
+        instance.pk = get_allocator().next_id(sender)
@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .analytics import ROLLUPS, record_rows
+from .counters import adjust_unread_alert_count, rebuild_unread_alert_count
+from .models import DeletedRecord, HealthAlert
+from .sharding import PRIMARY, assign_global_id, shard_for_user, sharded_models, sharding_enabled
+from .sync import COLLECTION_BY_MODEL, suppress_tombstones, tombstones_suppressed
+
+
+@receiver(post_save, sender=HealthAlert)
+def update_unread_counter_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        if not instance.is_read:
+            adjust_unread_alert_count(instance.user_id, 1)
+    else:
+        previous = getattr(instance, '_loaded_is_read', None)
+        if previous is None:
+            # Read state was not loaded from the database, so resync instead
+            rebuild_unread_alert_count(instance.user_id)
+        elif previous != instance.is_read:
+            adjust_unread_alert_count(instance.user_id, -1 if instance.is_read else 1)
+    instance._loaded_is_read = instance.is_read
+
+
+@receiver(post_delete, sender=HealthAlert)
+def update_unread_counter_on_delete(sender, instance, **kwargs):
+    was_read = getattr(instance, '_loaded_is_read', instance.is_read)
+    if not was_read:
+        adjust_unread_alert_count(instance.user_id, -1)
+
+
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # Deleting the user removes everything, tombstones included
+    if tombstones_suppressed() or isinstance(origin, User) or getattr(origin, 'model', None) is User:
+        return
+    DeletedRecord.objects.create(
+        user_id=instance.user_id,
+        collection=COLLECTION_BY_MODEL[sender],
+        object_id=instance.pk,
+    )
+
+
+for _model in COLLECTION_BY_MODEL:
+    post_delete.connect(record_tombstone, sender=_model, dispatch_uid=f'tombstone_{_model.__name__}')
+
+
+for _model in sharded_models():
+    pre_save.connect(assign_global_id, sender=_model, dispatch_uid=f'global_id_{_model.__name__}')
+
+
+@receiver(pre_delete, sender=User)
+def delete_sharded_history(sender, instance, **kwargs):
+    # The cascade only reaches rows in the user's own database
+    if not sharding_enabled() or shard_for_user(instance.pk) == PRIMARY:
+        return
+    with suppress_tombstones():
+        for model in sharded_models():
+            model.objects.for_user(instance).delete()
+
+
+def count_for_analytics(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        record_rows([instance])
+
+
+for _model in ROLLUPS:
+    post_save.connect(count_for_analytics, sender=_model, dispatch_uid=f'analytics_{_model.__name__}')
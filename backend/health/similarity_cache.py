@@ -0,0 +1,171 @@
+"""
+Near-duplicate question cache for the AI chat.
+
+Questions are normalized, split into character shingles and summarized with
+a MinHash signature. Locality-sensitive hashing over bands of the signature
+finds candidate questions in constant time, and a candidate is a hit when
+the estimated Jaccard similarity reaches the configured threshold. Entries
+are namespaced (by ``message_type`` for chat), expire after a TTL and are
+evicted least-recently-used beyond ``max_entries``.
+"""
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+
+from django.conf import settings
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Filler words that rarely change the meaning of a health question. Negations
+# and quantities are deliberately kept.
+STOPWORDS = frozenset("""
+    a an the is are am be can could would should will shall do does did i me my
+    we you your it its to of for on in at with and or if please hi hello hey
+    tell know about what whats ok okay safe fine
+""".split())
+
+_NUMBER_RE = re.compile(r'\d+(?:\.\d+)?')
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = re.sub(r"[^\w\s.]", ' ', text)
+    words = [w.strip('.') for w in text.split()]
+    return ' '.join(w for w in words if w and w not in STOPWORDS)
+
+
+def shingles(text, size):
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NearDuplicateCache:
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=4,
+                 max_entries=2048, ttl_seconds=86400):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        # Fixed seeds keep signatures stable across processes and restarts
+        state = 0x5EED
+        self._perms = []
+        for _ in range(num_perm):
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            a = (state >> 3) % _MERSENNE_PRIME or 1
+            state = (state * 6364136223846793005 + 1442695040888963407) % (1 << 64)
+            b = (state >> 3) % _MERSENNE_PRIME
+            self._perms.append((a, b))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (namespace, signature, numbers, value, stored_at)
+        self._buckets = {}  # (namespace, band, band_hash) -> set of keys
+        self._next_key = 0
+
+    def signature(self, normalized):
+        hashes = [zlib.crc32(s.encode('utf-8')) for s in shingles(normalized, self.shingle_size)]
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._perms
+        )
+
+    def _bands(self, namespace, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            yield (namespace, band, hash(chunk))
+
+    def _prepare(self, text):
+        normalized = normalize_text(text)
+        if not normalized:
+            return None, None
+        # Questions that differ in any quantity ("200mg" vs "800mg") never match
+        return self.signature(normalized), frozenset(_NUMBER_RE.findall(normalized))
+
+    def get(self, namespace, text):
+        signature, numbers = self._prepare(text)
+        if signature is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            candidates = set()
+            for bucket in self._bands(namespace, signature):
+                candidates.update(self._buckets.get(bucket, ()))
+
+            best_key, best_score = None, 0.0
+            for key in candidates:
+                _, cached_signature, cached_numbers, _, stored_at = self._entries[key]
+                if now - stored_at > self.ttl_seconds or cached_numbers != numbers:
+                    continue
+                score = sum(x == y for x, y in zip(signature, cached_signature)) / self.num_perm
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][3]
+
+    def set(self, namespace, text, value):
+        signature, numbers = self._prepare(text)
+        if signature is None:
+            return
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = (namespace, signature, numbers, value, time.monotonic())
+            for bucket in self._bands(namespace, signature):
+                self._buckets.setdefault(bucket, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        key, (namespace, signature, _, _, _) = self._entries.popitem(last=False)
+        for bucket in self._bands(namespace, signature):
+            keys = self._buckets.get(bucket)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._buckets[bucket]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_chat_cache = None
+_chat_cache_lock = threading.Lock()
+
+
+def get_chat_cache():
+    """Process-wide cache configured from settings.CHAT_SIMILARITY_CACHE, or None when disabled"""
+    global _chat_cache
+    config = settings.CHAT_SIMILARITY_CACHE
+    if not config.get('ENABLED', True):
+        return None
+    if _chat_cache is None:
+        with _chat_cache_lock:
+            if _chat_cache is None:
+                _chat_cache = NearDuplicateCache(
+                    threshold=config.get('THRESHOLD', 0.8),
+                    num_perm=config.get('NUM_PERM', 64),
+                    bands=config.get('BANDS', 16),
+                    shingle_size=config.get('SHINGLE_SIZE', 4),
+                    max_entries=config.get('MAX_ENTRIES', 2048),
+                    ttl_seconds=config.get('TTL_SECONDS', 86400),
+                )
+    return _chat_cache
@@ -0,0 +1,92 @@
+"""
+Health summary assembly and its shared cache.
+
+The summary is cached under a key derived from the same per-table versions
+(row count, latest ``updated_at``) that drive its ETag, so any write to the
+underlying rows moves it to a new key and a stale body is never served.
+The cache alias is shared by all workers (file-based by default), which lets
+the login warm-up build the body in the background for whichever worker
+serves the first home-screen request.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .conditional import collection_version, user_fingerprint
+from .fast_serializers import get_values_serializer, render_values
+from .models import Allergy, HealthAlert, Medication, RiskCheckRecord, SymptomAnalysis, UserProfile
+from .serializers import (
+    AllergySerializer, HealthAlertSerializer, MedicationSerializer, RiskCheckRecordSerializer,
+    SymptomAnalysisSerializer, UserProfileSerializer
+)
+
+
+def get_config():
+    return settings.HEALTH_WARMUP
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def summary_versions(user):
+    return [
+        collection_version(queryset) for queryset in (
+            UserProfile.objects.filter(user=user),
+            Allergy.objects.filter(user=user),
+            Medication.objects.filter(user=user),
+            RiskCheckRecord.objects.for_user(user),
+            SymptomAnalysis.objects.for_user(user),
+            HealthAlert.objects.filter(user=user),
+        )
+    ]
+
+
+def summary_cache_key(user, versions):
+    digest = hashlib.blake2b(digest_size=16)
+    parts = [user.pk, *user_fingerprint(user)]
+    for count, latest in versions:
+        parts.extend([count, latest.isoformat() if latest else ''])
+    digest.update('|'.join(str(part) for part in parts).encode('utf-8'))
+    return f'health:summary:{user.pk}:{digest.hexdigest()}'
+
+
+def build_summary(user):
+    """
+    Summary body, rendered by the values fast path (same output as the
+    ModelSerializers). Returns (data, profile_created).
+    """
+    profile_fields = get_values_serializer(UserProfileSerializer)
+    profile_rows = list(profile_fields.values(UserProfile.objects.filter(user=user)))
+    profile_created = not profile_rows
+    if profile_created:
+        UserProfile.objects.create(user=user)
+        profile_rows = list(profile_fields.values(UserProfile.objects.filter(user=user)))
+
+    allergies = Allergy.objects.filter(user=user)
+    medications = Medication.objects.filter(user=user, is_active=True)
+    recent_risk_checks = RiskCheckRecord.objects.for_user(user)[:5]
+    recent_symptom_analyses = SymptomAnalysis.objects.for_user(user)[:5]
+    unread_alerts = HealthAlert.objects.filter(user=user, is_read=False)
+
+    data = {
+        'user_profile': profile_fields.to_representation(profile_rows[0]),
+        'allergies': render_values(AllergySerializer, allergies),
+        'medications': render_values(MedicationSerializer, medications),
+        'recent_risk_checks': render_values(RiskCheckRecordSerializer, recent_risk_checks),
+        'recent_symptom_analyses': render_values(SymptomAnalysisSerializer, recent_symptom_analyses),
+        'unread_alerts': render_values(HealthAlertSerializer, unread_alerts),
+    }
+    return data, profile_created
+
+
+def cached_summary(user, versions):
+    if not get_config()['ENABLED']:
+        return None
+    return get_cache().get(summary_cache_key(user, versions))
+
+
+def store_summary(user, versions, data):
+    if get_config()['ENABLED']:
+        get_cache().set(summary_cache_key(user, versions), data, get_config()['SUMMARY_TTL'])
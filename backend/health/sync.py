@@ -0,0 +1,115 @@
+"""
+Delta sync for the mobile app.
+
+A sync token encodes the server time a sync started. ``changes_since``
+returns every row whose ``updated_at`` is at or after the previous token
+(minus a small overlap for writes still committing at the time) plus the
+tombstones recorded for deletes, all through the (user, updated_at) and
+(user, deleted_at) indexes. Clients apply changes as idempotent upserts.
+"""
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+
+from .fast_serializers import render_values
+from .models import (
+    Allergy, ChatMessage, DeletedRecord, HealthAlert, Medication, RiskCheckRecord,
+    SymptomAnalysis, UserProfile
+)
+from .serializers import (
+    AllergySerializer, ChatMessageSerializer, HealthAlertSerializer, MedicationSerializer,
+    RiskCheckRecordSerializer, SymptomAnalysisSerializer, UserProfileSerializer
+)
+from .sharding import for_user
+
+# collection name -> (model, serializer)
+SYNC_COLLECTIONS = {
+    'profiles': (UserProfile, UserProfileSerializer),
+    'allergies': (Allergy, AllergySerializer),
+    'medications': (Medication, MedicationSerializer),
+    'risk_checks': (RiskCheckRecord, RiskCheckRecordSerializer),
+    'symptom_analyses': (SymptomAnalysis, SymptomAnalysisSerializer),
+    'chat_messages': (ChatMessage, ChatMessageSerializer),
+    'alerts': (HealthAlert, HealthAlertSerializer),
+}
+
+COLLECTION_BY_MODEL = {model: name for name, (model, _) in SYNC_COLLECTIONS.items()}
+
+_tombstones_suppressed = contextvars.ContextVar('tombstones_suppressed', default=False)
+
+
+@contextmanager
+def suppress_tombstones():
+    """Deletes inside this block are not reported to sync (e.g. archival)"""
+    token = _tombstones_suppressed.set(True)
+    try:
+        yield
+    finally:
+        _tombstones_suppressed.reset(token)
+
+
+def tombstones_suppressed():
+    return _tombstones_suppressed.get()
+
+
+class InvalidSyncToken(ValueError):
+    pass
+
+
+def encode_token(moment):
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_token(token):
+    try:
+        return datetime.fromtimestamp(int(token) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        # Not a number, or a timestamp outside the datetime range
+        raise InvalidSyncToken(f"Invalid sync token: {token!r}")
+
+
+def changes_since(user, since=None):
+    """All of the user's rows changed and deleted since ``since`` (None means everything)"""
+    started = timezone.now()
+    changes = {}
+    deleted = {name: [] for name in SYNC_COLLECTIONS}
+
+    # Tombstones are pruned after a while; older tokens get a full resync
+    if since is not None and since < started - timedelta(days=settings.HEALTH_SYNC_TOMBSTONE_DAYS):
+        since = None
+
+    cutoff = None
+    if since is not None:
+        cutoff = since - timedelta(seconds=settings.HEALTH_SYNC_OVERLAP_SECONDS)
+
+    for name, (model, serializer_class) in SYNC_COLLECTIONS.items():
+        queryset = for_user(model, user)
+        if cutoff is not None:
+            queryset = queryset.filter(updated_at__gte=cutoff)
+        changes[name] = render_values(serializer_class, queryset.order_by('updated_at', 'pk'))
+
+    if cutoff is not None:
+        tombstones = (DeletedRecord.objects
+                      .filter(user=user, deleted_at__gte=cutoff)
+                      .values_list('collection', 'object_id'))
+        for collection, object_id in tombstones:
+            if collection in deleted:
+                deleted[collection].append(object_id)
+
+    return {
+        'sync_token': encode_token(started),
+        'full': since is None,
+        'changes': changes,
+        'deleted': deleted,
+    }
+
+
+def prune_tombstones(days=None):
+    if days is None:
+        days = settings.HEALTH_SYNC_TOMBSTONE_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = DeletedRecord.objects.filter(deleted_at__lt=cutoff).delete()
+    return deleted
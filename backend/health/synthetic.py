@@ -0,0 +1,244 @@
+"""
+Synthetic health data at production-like volume.
+
+Users get a profile, a few allergies and medications, and histories of risk
+checks, symptom analyses, chat messages and alerts whose lengths follow a
+long-tailed distribution. Everything is written with ``bulk_create`` in
+batches, with ``auto_now``/``auto_now_add`` switched off so timestamps are
+spread over the requested period. Signals do not fire for bulk inserts, so
+the unread alert counters are rebuilt at the end and the analytics rollups
+are fed directly.
+"""
+import random
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .analytics import flush_rollups, record_rows
+from .db import reserve_ids
+from .knowledge import allergen_key
+from .models import (
+    Allergy, ChatMessage, HealthAlert, Medication, RiskCheckRecord, SymptomAnalysis,
+    UnreadAlertCounter, UserProfile
+)
+from .sharding import is_sharded, shard_for_user, sharding_enabled
+
+ALLERGENS = [
+    ('Penicillin', 'Hives, swelling'), ('Amoxicillin', 'Rash'), ('Sulfa drugs', 'Skin rash'),
+    ('Aspirin', 'Wheezing'), ('Ibuprofen', 'Stomach pain, hives'), ('Codeine', 'Itching, nausea'),
+    ('Latex', 'Contact dermatitis'), ('Peanuts', 'Throat tightness'), ('Shellfish', 'Anaphylaxis'),
+    ('Eggs', 'Hives'), ('Cephalexin', 'Rash'), ('Iodine contrast', 'Flushing'),
+]
+MEDICATIONS = [
+    ('Metformin', '500mg', 'Twice daily'), ('Lisinopril', '10mg', 'Once daily'),
+    ('Atorvastatin', '20mg', 'Once daily at night'), ('Levothyroxine', '50mcg', 'Once daily'),
+    ('Amlodipine', '5mg', 'Once daily'), ('Omeprazole', '20mg', 'Before breakfast'),
+    ('Sertraline', '50mg', 'Once daily'), ('Albuterol', '90mcg', 'As needed'),
+    ('Ibuprofen', '400mg', 'Every 6 hours as needed'), ('Cetirizine', '10mg', 'Once daily'),
+]
+CHECKED_DRUGS = [
+    'Amoxicillin', 'Ibuprofen', 'Acetaminophen', 'Aspirin', 'Azithromycin', 'Cephalexin',
+    'Ciprofloxacin', 'Bactrim', 'Naproxen', 'Codeine', 'Doxycycline', 'Tramadol',
+    'Prednisone', 'Metronidazole', 'Clindamycin', 'Advil 200mg', 'Tylenol',
+]
+REACTIONS = ['Hives', 'Rash', 'Anaphylaxis', 'Swelling', 'Nausea', 'Itching', 'Wheezing', 'Dizziness']
+SYMPTOMS = [
+    'Itchy rash on arms after starting new antibiotic',
+    'Mild headache and nausea since this morning',
+    'Swollen lips and tingling tongue after lunch',
+    'Stomach cramps after taking ibuprofen',
+    'Hives on chest and back, no breathing trouble',
+    'Dry cough and runny nose for three days',
+    'Dizziness when standing up after new blood pressure pill',
+    'Red itchy eyes and sneezing outdoors',
+]
+CLASSIFICATIONS = ['allergic_reaction', 'side_effect', 'unrelated', 'unknown']
+CHAT_QUESTIONS = [
+    ('general', 'How much water should I drink per day?'),
+    ('allergy', 'Can I take amoxicillin if I am allergic to penicillin?'),
+    ('medication', 'Is it safe to take ibuprofen with lisinopril?'),
+    ('medication', 'What should I do if I miss a dose of metformin?'),
+    ('general', 'How can I tell a cold from seasonal allergies?'),
+    ('allergy', 'What are the signs of a severe allergic reaction?'),
+    ('emergency', 'My throat feels tight after eating shrimp, what do I do?'),
+]
+ALERTS = [
+    ('info', 'Medication reminder', 'Time to refill your prescription.'),
+    ('warning', 'Possible interaction', 'A recently checked drug may interact with your medications.'),
+    ('critical', 'Allergy risk', 'A drug you checked is high risk for your allergy profile.'),
+]
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """Let bulk_create keep the timestamps we set on auto_now/auto_now_add fields"""
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            for attr in ('auto_now', 'auto_now_add'):
+                if getattr(field, attr, False):
+                    setattr(field, attr, False)
+                    changed.append((field, attr))
+    try:
+        yield
+    finally:
+        for field, attr in changed:
+            setattr(field, attr, True)
+
+
+def history_length(rng, mean):
+    """Long-tailed history size with the given mean (most users short, a few very long)"""
+    if mean <= 0:
+        return 0
+    # Pareto with alpha 2 has mean 2 * scale
+    return min(int(rng.paretovariate(2.0) * mean / 2), mean * 50)
+
+
+class SyntheticDataGenerator:
+
+    def __init__(self, seed=0, days=365, batch_size=5000, username_prefix='synthetic'):
+        self.rng = random.Random(seed)
+        self.days = days
+        self.batch_size = batch_size
+        self.username_prefix = username_prefix
+        self.now = timezone.now()
+        self.password = make_password('synthetic-password')
+        self.counts = {}
+
+    def random_time(self, start=None):
+        start = start or self.now - timedelta(days=self.days)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def _write(self, model, rows):
+        if not rows:
+            return
+        if is_sharded(model) and sharding_enabled():
+            # One id block for the batch, then each user's rows on their shard
+            first_id = reserve_ids(model, len(rows))
+            by_shard = {}
+            for pk, row in enumerate(rows, first_id):
+                row.pk = pk
+                by_shard.setdefault(shard_for_user(row.user_id), []).append(row)
+            for alias, shard_rows in by_shard.items():
+                model.objects.using(alias).bulk_create(shard_rows, batch_size=self.batch_size)
+        else:
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+        record_rows(rows)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(rows)
+
+    def create_users(self, count, offset):
+        users = []
+        for i in range(offset, offset + count):
+            joined = self.random_time()
+            users.append(User(
+                username=f'{self.username_prefix}{i}', email=f'{self.username_prefix}{i}@example.com',
+                first_name='Synthetic', last_name=f'User{i}', password=self.password,
+                date_joined=joined, is_active=True,
+            ))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        self.counts['User'] = self.counts.get('User', 0) + len(users)
+        return users
+
+    def populate(self, users, history):
+        rng = self.rng
+        rows = {model: [] for model in (UserProfile, Allergy, Medication, RiskCheckRecord,
+                                        SymptomAnalysis, ChatMessage, HealthAlert)}
+        for user in users:
+            joined = user.date_joined
+            stamp = self.random_time(joined)
+            rows[UserProfile].append(UserProfile(
+                user=user, gender=rng.choice(['male', 'female', 'other', None]),
+                blood_type=rng.choice(['A+', 'A-', 'B+', 'O+', 'O-', 'AB+', None]),
+                date_of_birth=date(rng.randint(1940, 2005), rng.randint(1, 12), rng.randint(1, 28)),
+                height=round(rng.gauss(170, 10), 1), weight=round(rng.gauss(75, 15), 1),
+                created_at=joined, updated_at=stamp,
+            ))
+
+            allergies = rng.sample(ALLERGENS, k=min(len(ALLERGENS), int(rng.expovariate(0.8))))
+            for name, symptoms in allergies:
+                created = self.random_time(joined)
+                rows[Allergy].append(Allergy(
+                    user=user, name=name, severity=rng.choice(['mild', 'moderate', 'severe']),
+                    symptoms=symptoms, created_at=created, updated_at=created,
+                ))
+            key = allergen_key([name for name, _ in allergies])
+
+            for name, dosage, frequency in rng.sample(MEDICATIONS, k=rng.randint(0, 4)):
+                created = self.random_time(joined)
+                rows[Medication].append(Medication(
+                    user=user, name=name, dosage=dosage, frequency=frequency,
+                    start_date=created.date(), is_active=rng.random() < 0.8,
+                    created_at=created, updated_at=created,
+                ))
+
+            for _ in range(history_length(rng, history)):
+                checked = self.random_time(joined)
+                level = rng.choices(['low', 'medium', 'high'], weights=[5, 3, 2])[0]
+                rows[RiskCheckRecord].append(RiskCheckRecord(
+                    user=user, drug_name=rng.choice(CHECKED_DRUGS), risk_level=level,
+                    potential_reactions=rng.sample(REACTIONS, k=rng.randint(1, 3)),
+                    recommendations='Consult your doctor\nMonitor for reactions',
+                    source='ai', allergen_key=key, checked_at=checked, updated_at=checked,
+                ))
+            for _ in range(history_length(rng, history)):
+                analyzed = self.random_time(joined)
+                classification, confidence = rng.choice(CLASSIFICATIONS), round(rng.uniform(0.4, 0.95), 2)
+                rows[SymptomAnalysis].append(SymptomAnalysis(
+                    user=user, symptoms=rng.choice(SYMPTOMS), classification=classification,
+                    confidence_score=confidence, llm_classification=classification,
+                    llm_confidence_score=confidence,
+                    ai_analysis='Symptoms are consistent with a mild reaction.',
+                    recommendations='Stop the new medication and contact your doctor.',
+                    analyzed_at=analyzed, updated_at=analyzed,
+                ))
+            for _ in range(history_length(rng, history * 2)):
+                created = self.random_time(joined)
+                message_type, question = rng.choice(CHAT_QUESTIONS)
+                rows[ChatMessage].append(ChatMessage(
+                    user=user, message=question, message_type=message_type,
+                    response='Please check with your healthcare provider about your situation.',
+                    created_at=created, updated_at=created,
+                ))
+            for _ in range(history_length(rng, history // 2)):
+                created = self.random_time(joined)
+                alert_type, title, message = rng.choice(ALERTS)
+                rows[HealthAlert].append(HealthAlert(
+                    user=user, title=title, message=message, alert_type=alert_type,
+                    is_read=rng.random() < 0.7, created_at=created, updated_at=created,
+                ))
+
+        for model, model_rows in rows.items():
+            self._write(model, model_rows)
+
+    def generate(self, users, history, offset=0, progress=None):
+        """Create ``users`` users with histories averaging ``history`` rows per type"""
+        chunk = max(1, self.batch_size // max(1, history * 4))
+        with manual_timestamps(User, UserProfile, Allergy, Medication, RiskCheckRecord,
+                               SymptomAnalysis, ChatMessage, HealthAlert):
+            for start in range(0, users, chunk):
+                with transaction.atomic():
+                    batch = self.create_users(min(chunk, users - start), offset + start)
+                    self.populate(batch, history)
+                if progress:
+                    progress(start + len(batch), users)
+        rebuild_unread_counters()
+        flush_rollups()
+        return self.counts
+
+
+def rebuild_unread_counters():
+    """Recount every user's unread alerts in one pass (bulk inserts skip the signals)"""
+    counts = (HealthAlert.objects.filter(is_read=False)
+              .values('user_id').annotate(unread=Count('pk')).order_by())
+    with transaction.atomic():
+        UnreadAlertCounter.objects.all().delete()
+        UnreadAlertCounter.objects.bulk_create(
+            [UnreadAlertCounter(user_id=row['user_id'], unread_count=row['unread']) for row in counts.iterator()],
+            batch_size=5000,
+        )
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from health.ai_scheduler import (
+    PRIORITY_CHAT, PRIORITY_EMERGENCY, PRIORITY_SYMPTOMS, AIRequestScheduler, SchedulerBusy, SharedSlots
+)
+
+
+class AIRequestSchedulerTests(SimpleTestCase):
+
+    def wait_for_waiters(self, scheduler, count):
+        deadline = time.monotonic() + 5
+        while sum(scheduler.stats()['waiting'].values()) < count:
+            self.assertLess(time.monotonic(), deadline, 'waiters never queued')
+            time.sleep(0.005)
+
+    def queue(self, scheduler, priority, user_key, order):
+        def call():
+            with scheduler.slot(priority, user_key):
+                order.append(user_key)
+        thread = threading.Thread(target=call)
+        thread.start()
+        return thread
+
+    def test_waiters_are_granted_by_priority_then_round_robin(self):
+        scheduler = AIRequestScheduler(max_concurrency=1, emergency_reserve=0, queue_timeout=5)
+        order = []
+        scheduler.acquire(PRIORITY_CHAT, 'holder')
+        threads = []
+        for priority, user_key in [(PRIORITY_CHAT, 'chat-a'), (PRIORITY_SYMPTOMS, 'busy'),
+                                   (PRIORITY_SYMPTOMS, 'busy'), (PRIORITY_SYMPTOMS, 'other')]:
+            threads.append(self.queue(scheduler, priority, user_key, order))
+            self.wait_for_waiters(scheduler, len(threads))
+        scheduler.release()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ['busy', 'other', 'busy', 'chat-a'])
+
+    def test_emergency_uses_the_reserve_when_saturated(self):
+        scheduler = AIRequestScheduler(max_concurrency=1, emergency_reserve=1, queue_timeout=0.1)
+        scheduler.acquire(PRIORITY_CHAT, 'holder')
+        with self.assertRaises(SchedulerBusy):
+            scheduler.acquire(PRIORITY_SYMPTOMS, 'someone')
+        scheduler.acquire(PRIORITY_EMERGENCY, 'patient')
+        self.assertEqual(scheduler.stats()['active'], 2)
+
+    def test_timed_out_waiter_leaves_the_queue(self):
+        scheduler = AIRequestScheduler(max_concurrency=1, emergency_reserve=0, queue_timeout=0.05)
+        scheduler.acquire(PRIORITY_CHAT, 'holder')
+        with self.assertRaises(SchedulerBusy):
+            scheduler.acquire(PRIORITY_CHAT, 'late')
+        self.assertEqual(scheduler.stats()['waiting'], {})
+        scheduler.release()
+        self.assertEqual(scheduler.stats()['active'], 0)
+
+
+class SharedSlotsTests(SimpleTestCase):
+    """Two schedulers on one lock directory stand in for two worker processes"""
+
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+
+    def make_scheduler(self, timeout=0.2):
+        return AIRequestScheduler(max_concurrency=1, emergency_reserve=1, queue_timeout=timeout,
+                                  shared=SharedSlots(self.lock_dir, 1, 1), poll_interval=0.01)
+
+    def test_limit_is_shared_between_workers(self):
+        first, second = self.make_scheduler(), self.make_scheduler()
+        with first.slot(PRIORITY_CHAT, 'a'):
+            with self.assertRaises(SchedulerBusy):
+                with second.slot(PRIORITY_CHAT, 'b'):
+                    pass
+            # The failed attempt gave back its local slot
+            self.assertEqual(second.stats()['active'], 0)
+            with second.slot(PRIORITY_EMERGENCY, 'patient'):
+                pass
+        with second.slot(PRIORITY_CHAT, 'b'):
+            pass
+
+    def test_waiting_worker_proceeds_once_a_slot_frees(self):
+        first, second = self.make_scheduler(), self.make_scheduler(timeout=5)
+        ran = threading.Event()
+        with first.slot(PRIORITY_CHAT, 'a'):
+            thread = threading.Thread(target=lambda: second.run(PRIORITY_CHAT, 'b', ran.set))
+            thread.start()
+            time.sleep(0.05)
+            self.assertFalse(ran.is_set())
+        thread.join(5)
+        self.assertTrue(ran.is_set())
+
+    def test_slots_of_a_dead_process_are_released(self):
+        slots = SharedSlots(self.lock_dir, 1, 0)
+        pid = os.fork()
+        if pid == 0:
+            slots.try_acquire(PRIORITY_CHAT)
+            os._exit(0)  # dies holding the slot
+        os.waitpid(pid, 0)
+        fd = slots.try_acquire(PRIORITY_CHAT)
+        self.assertIsNotNone(fd)
+        slots.release(fd)
@@ -0,0 +1,112 @@
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from health import analytics, write_behind
+from health.analytics import RollupBuffer, rebuild_rollups
+from health.models import DrugCheckRollup, RiskCheckRecord
+from health.write_behind import WriteBehindBuffer
+
+ANALYTICS_OFF = {'ENABLED': False, 'FLUSH_INTERVAL': 5, 'MAX_DAYS': 366}
+
+
+def risk_check(user, drug='Advil', **fields):
+    return RiskCheckRecord(user=user, drug_name=drug, risk_level='low', potential_reactions=[],
+                           recommendations='', **fields)
+
+
+class WriteBehindCountingTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.buffer = WriteBehindBuffer(tmp.name, flush_interval=3600, max_batch=1000, id_block=10)
+        self.addCleanup(self.stop_buffer)
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        patcher = mock.patch('health.write_behind.record_rows')
+        self.record_rows = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def stop_buffer(self):
+        self.buffer._stopped = True
+        self.buffer._wake.set()
+        self.buffer._thread.join(5)
+
+    def counted(self):
+        return sum(len(call.args[0]) for call in self.record_rows.call_args_list)
+
+    def test_rows_are_counted_once_when_a_later_shard_fails(self):
+        for user in (self.alice, self.bob):
+            self.buffer.add(RiskCheckRecord, user=user, drug_name='Advil', risk_level='low',
+                            potential_reactions=[], recommendations='')
+        real_write = write_behind.write_with_retry
+
+        def write(func, using='default'):
+            if using == 'shard1':
+                raise OperationalError('database is locked')
+            return real_write(func, using=using)
+
+        def route(model, instance=None, **hints):
+            return 'default' if instance.user_id == self.alice.pk else 'shard1'
+
+        with mock.patch('health.write_behind.write_with_retry', side_effect=write), \
+                mock.patch('health.write_behind.router.db_for_write', side_effect=route):
+            with self.assertRaises(OperationalError):
+                self.buffer.flush()
+        # Alice's shard committed, but nothing was counted and the batch is queued again
+        self.assertEqual(RiskCheckRecord.objects.filter(user=self.alice).count(), 1)
+        self.assertEqual(self.counted(), 0)
+        self.assertEqual(self.buffer.stats()['pending'], 2)
+
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(RiskCheckRecord.objects.count(), 2)
+        self.assertEqual(self.counted(), 2)
+
+
+@override_settings(HEALTH_ANALYTICS=ANALYTICS_OFF)
+class RollupCountingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cam')
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def test_buffer_counts_each_row_once(self):
+        rollups = RollupBuffer(flush_interval=3600)
+        rollups.add([risk_check(self.user, checked_at=timezone.now()) for _ in range(3)])
+        self.assertEqual(rollups.flush(), 3)
+        self.assertEqual(rollups.flush(), 0)
+        rollups.add([risk_check(self.user, checked_at=timezone.now())])
+        rollups.flush()
+        self.assertEqual(DrugCheckRollup.objects.get(day=self.today, drug='ibuprofen').count, 4)
+
+    def test_rebuild_leaves_today_to_the_live_counters(self):
+        for _ in range(2):
+            record = risk_check(self.user)
+            record.save()
+            RiskCheckRecord.objects.filter(pk=record.pk).update(checked_at=timezone.now() - timedelta(days=1))
+        risk_check(self.user).save()
+        DrugCheckRollup.objects.create(day=self.yesterday, drug='ibuprofen', risk_level='low', count=7)
+        # Includes increments other workers have not flushed to the history tables yet
+        DrugCheckRollup.objects.create(day=self.today, drug='ibuprofen', risk_level='low', count=5)
+
+        self.assertEqual(rebuild_rollups(), 2)
+        counts = dict(DrugCheckRollup.objects.values_list('day', 'count'))
+        self.assertEqual(counts, {self.yesterday: 2, self.today: 5})
+
+        self.assertEqual(rebuild_rollups(include_today=True), 3)
+        counts = dict(DrugCheckRollup.objects.values_list('day', 'count'))
+        self.assertEqual(counts, {self.yesterday: 2, self.today: 1})
+
+    def test_failed_exit_flush_is_logged(self):
+        broken = mock.Mock(**{'flush.side_effect': OperationalError('no such table')})
+        with mock.patch.object(analytics, '_buffer', broken), \
+                self.assertLogs('health.analytics', 'WARNING') as logs:
+            analytics._flush_at_exit()
+        self.assertIn('no such table', logs.output[0])
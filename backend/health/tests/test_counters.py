@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from health.counters import get_unread_alert_count, rebuild_unread_alert_count
+from health.models import HealthAlert, UnreadAlertCounter
+
+
+def make_alert(user, **fields):
+    return HealthAlert.objects.create(user=user, title='Check', message='New interaction',
+                                      alert_type='info', **fields)
+
+
+class UnreadAlertCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+
+    def stored_count(self):
+        return UnreadAlertCounter.objects.get(user=self.user).unread_count
+
+    def test_create_read_and_delete_adjust_the_counter(self):
+        self.assertEqual(get_unread_alert_count(self.user), 0)
+        first, second = make_alert(self.user), make_alert(self.user)
+        self.assertEqual(self.stored_count(), 2)
+        first.is_read = True
+        first.save()
+        self.assertEqual(self.stored_count(), 1)
+        second.delete()
+        self.assertEqual(self.stored_count(), 0)
+
+    def test_change_without_a_counter_row_seeds_it(self):
+        make_alert(self.user)
+        UnreadAlertCounter.objects.all().delete()
+        # Previously a no-op until someone rebuilt the counter by hand
+        make_alert(self.user)
+        self.assertEqual(self.stored_count(), 2)
+
+    def test_rebuild_repairs_a_stale_counter(self):
+        make_alert(self.user)
+        make_alert(self.user, is_read=True)
+        UnreadAlertCounter.objects.filter(user=self.user).update(unread_count=7)
+        self.assertEqual(rebuild_unread_alert_count(self.user), 1)
+        self.assertEqual(self.stored_count(), 1)
+
+    def test_mark_all_read_resets_the_counter(self):
+        make_alert(self.user)
+        make_alert(self.user)
+        self.client.force_login(self.user)
+        response = self.client.post('/api/health/alerts/mark_all_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stored_count(), 0)
@@ -0,0 +1,90 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from health import throttling
+from health.models import IdempotencyRecord, RiskCheckRecord
+from health.throttling import TokenBucketStore
+
+VERDICT = {
+    'risk_level': 'medium',
+    'potential_reactions': ['Rash'],
+    'recommendations': ['Ask your pharmacist'],
+    'analysis': 'Cross-reactivity is possible.',
+}
+
+
+@override_settings(AI_THROTTLE_BUCKETS={'drug_risk': {'capacity': 1, 'refill_per_minute': 1}})
+class IdempotentDrugRiskTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(throttling, '_store', TokenBucketStore(os.path.join(tmp.name, 'b.sqlite3')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('health.gemini_service.GeminiAIService.analyze_drug_risk', return_value=VERDICT)
+        self.analyze = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('ari')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def check(self, key=None, drug='Naproxen'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return self.client.post('/api/health/check-drug-risk/', {'drug_name': drug}, format='json', **headers)
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.check('key-1')
+        retry = self.check('key-1')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        self.assertEqual(self.analyze.call_count, 1)
+        self.assertEqual(RiskCheckRecord.objects.count(), 1)
+
+    def test_replay_is_not_throttled(self):
+        self.assertEqual(self.check('key-1').status_code, 200)
+        # The single token is spent: new work is throttled, the retry is not
+        self.assertEqual(self.check('key-2', drug='Aspirin').status_code, 429)
+        self.assertEqual(self.check('key-1').status_code, 200)
+
+    @override_settings(AI_THROTTLE_BUCKETS={})
+    def test_different_body_with_the_same_key_is_rejected(self):
+        self.check('key-1')
+        response = self.check('key-1', drug='Aspirin')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.analyze.call_count, 1)
+
+    def test_reused_key_with_a_different_body_is_still_throttled(self):
+        self.check('key-1')
+        self.assertEqual(self.check('key-1', drug='Aspirin').status_code, 429)
+
+    def test_expired_key_runs_again(self):
+        self.check('key-1')
+        IdempotencyRecord.objects.update(expires_at='2000-01-01T00:00:00Z')
+        with override_settings(AI_THROTTLE_BUCKETS={}):
+            response = self.check('key-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.analyze.call_count, 2)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.check('key-1')
+        other = User.objects.create_user('bo')
+        self.client.force_authenticate(other)
+        response = self.check('key-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.analyze.call_count, 2)
+
+    def test_requests_without_a_key_always_run(self):
+        with override_settings(AI_THROTTLE_BUCKETS={}):
+            self.check()
+            self.check()
+        self.assertEqual(self.analyze.call_count, 2)
+        self.assertFalse(IdempotencyRecord.objects.exists())
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from health import throttling
+from health.knowledge import allergen_class, allergen_key, canonical_drug
+from health.models import Allergy, DrugRiskKnowledge, RiskCheckRecord
+from health.throttling import TokenBucketStore
+
+
+class AllergenClassTests(SimpleTestCase):
+
+    def test_terms_match_whole_words(self):
+        self.assertEqual(allergen_class('Sulfa drugs'), 'sulfonamides')
+        self.assertEqual(allergen_class('Eggs'), 'eggs')
+        self.assertEqual(allergen_class('egg whites'), 'eggs')
+        self.assertEqual(allergen_class('Amoxicillin-clavulanate'), 'penicillins')
+        self.assertEqual(allergen_class('tree nuts'), 'tree_nuts')
+
+    def test_plurals_match(self):
+        self.assertEqual(allergen_class('Penicillins'), 'penicillins')
+        self.assertEqual(allergen_class('NSAIDs'), 'nsaids')
+        self.assertEqual(allergen_class('local anesthetics'), 'local_anesthetics')
+
+    def test_words_containing_a_term_do_not_match(self):
+        self.assertEqual(allergen_class('Sulfates'), 'sulfates')
+        self.assertEqual(allergen_class('Eggplant'), 'eggplant')
+        self.assertEqual(allergen_class('Crabapple'), 'crabapple')
+
+    def test_allergen_key_is_sorted_and_deduplicated(self):
+        self.assertEqual(allergen_key(['Advil', 'aspirin', 'Eggs', ' ']), 'eggs,nsaids')
+        self.assertEqual(allergen_key([]), '')
+
+    def test_canonical_drug(self):
+        self.assertEqual(canonical_drug('Advil 200mg tablets'), 'ibuprofen')
+        self.assertEqual(canonical_drug('Tylenol'), 'acetaminophen')
+
+
+class KnowledgeHitTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = mock.patch.object(throttling, '_store', TokenBucketStore(os.path.join(tmp.name, 'b.sqlite3')))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('kim')
+        Allergy.objects.create(user=self.user, name='Penicillins', severity='severe')
+        DrugRiskKnowledge.objects.create(
+            drug='ibuprofen', allergen_key='penicillins', risk_level='low',
+            potential_reactions=['Upset stomach'], recommendations=['Take with food'],
+            source='prewarmed',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_response_and_record_share_the_source(self):
+        with mock.patch('health.gemini_service.GeminiAIService.analyze_drug_risk') as analyze:
+            response = self.client.post('/api/health/check-drug-risk/', {'drug_name': 'Advil'}, format='json')
+        analyze.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['source'], 'knowledge')
+        record = RiskCheckRecord.objects.get(pk=response.data['record_id'])
+        self.assertEqual(record.source, response.data['source'])
+        self.assertEqual(record.allergen_key, 'penicillins')
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+
+from health import llm_ledger
+from health.llm_ledger import daily_rollups, persist_rollups, prune_ledger
+from health.models import LLMCallRecord, LLMCallRollup
+
+NOW = datetime(2024, 6, 15, 12, 0, tzinfo=dt_timezone.utc)
+TODAY = NOW.date()
+
+
+def call(when, operation='chat', latency=100, outcome='ok', cache_status='miss', tokens=(10, 20)):
+    return LLMCallRecord.objects.create(
+        operation=operation, model_name='' if cache_status != 'miss' else 'gemini', latency_ms=latency,
+        outcome=outcome, cache_status=cache_status,
+        prompt_tokens=tokens[0], response_tokens=tokens[1], created_at=when,
+    )
+
+
+@mock.patch('django.utils.timezone.now', return_value=NOW)
+class LLMCallRollupTests(TestCase):
+
+    def setUp(self):
+        yesterday = NOW - timedelta(days=1)
+        for latency in range(10, 210, 10):  # 20 calls, 10..200 ms
+            call(yesterday, latency=latency)
+        call(yesterday, outcome='error', latency=500)
+        call(yesterday, cache_status='hit', latency=0, tokens=(None, None))
+        call(yesterday, operation='drug_risk', latency=50)
+        call(NOW - timedelta(hours=1), latency=70)
+
+    def test_persists_closed_days_only(self, now):
+        self.assertEqual(persist_rollups(), 2)
+        chat = LLMCallRollup.objects.get(day=TODAY - timedelta(days=1), operation='chat')
+        self.assertEqual((chat.calls, chat.cache_hits, chat.errors), (21, 1, 1))
+        self.assertEqual((chat.prompt_tokens, chat.response_tokens), (210, 420))
+        self.assertEqual(chat.p95_latency_ms, 200)
+        self.assertAlmostEqual(chat.mean_latency_ms, (2100 + 500) / 21)
+        self.assertFalse(LLMCallRollup.objects.filter(day=TODAY).exists())
+        self.assertEqual(persist_rollups(), 0)
+
+    def test_report_reads_persisted_days_and_aggregates_today_live(self, now):
+        live = daily_rollups(7)
+        persist_rollups()
+        LLMCallRecord.objects.filter(created_at__lt=NOW - timedelta(hours=12)).delete()
+        self.assertEqual(daily_rollups(7), live)
+        self.assertEqual([(row['day'], row['operation']) for row in live], [
+            (TODAY, 'chat'), (TODAY - timedelta(days=1), 'drug_risk'), (TODAY - timedelta(days=1), 'chat'),
+        ])
+        self.assertAlmostEqual(live[2]['cache_hit_rate'], 1 / 22)
+
+        call(NOW, latency=90)
+        today = daily_rollups(7)[0]
+        self.assertEqual((today['calls'], today['p95_latency_ms']), (2, 90))
+
+    def test_window_excludes_older_days(self, now):
+        call(NOW - timedelta(days=10))
+        persist_rollups()
+        self.assertEqual({row['day'] for row in daily_rollups(7)}, {TODAY, TODAY - timedelta(days=1)})
+        self.assertIn(TODAY - timedelta(days=10), {row['day'] for row in daily_rollups(14)})
+
+    def test_day_is_not_persisted_until_late_rows_are_in(self, now):
+        now.return_value = datetime(2024, 6, 15, 0, 5, tzinfo=dt_timezone.utc)
+        persist_rollups()
+        self.assertFalse(LLMCallRollup.objects.exists())
+        # A row queued just before midnight still counts towards its day
+        call(datetime(2024, 6, 14, 23, 59, tzinfo=dt_timezone.utc), operation='symptoms')
+        now.return_value = NOW
+        persist_rollups()
+        self.assertTrue(LLMCallRollup.objects.filter(day=TODAY - timedelta(days=1), operation='symptoms').exists())
+
+    @override_settings(LLM_LEDGER={'ENABLED': True, 'FLUSH_INTERVAL': 2, 'MAX_BATCH': 500, 'RETENTION_DAYS': 0})
+    def test_pruned_days_keep_their_figures(self, now):
+        self.assertEqual(prune_ledger(), 24)
+        self.assertEqual(LLMCallRollup.objects.get(operation='drug_risk').calls, 1)
+        self.assertEqual([row['operation'] for row in daily_rollups(7)], ['drug_risk', 'chat'])
+
+    def test_archive_command_rolls_up_the_ledger(self, now):
+        out = StringIO()
+        with mock.patch('health.management.commands.archive_health_history.archive_records', return_value=0):
+            call_command('archive_health_history', stdout=out)
+        self.assertIn('rolled up 2 (day, operation) rows', out.getvalue())
+
+
+class ExitFlushTests(TestCase):
+
+    def test_failed_exit_flush_is_logged(self):
+        broken = mock.Mock(**{'flush.side_effect': OperationalError('no such table')})
+        with mock.patch.object(llm_ledger, '_ledger', broken), \
+                self.assertLogs('health.llm_ledger', 'WARNING') as logs:
+            llm_ledger._flush_at_exit()
+        self.assertIn('no such table', logs.output[0])
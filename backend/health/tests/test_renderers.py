@@ -0,0 +1,55 @@
+import datetime
+import decimal
+import json
+import uuid
+from io import BytesIO
+from unittest import mock
+
+from django.test import SimpleTestCase
+from rest_framework.renderers import JSONRenderer
+
+from drugsheild_api import renderers
+from drugsheild_api.renderers import ORJSONParser, ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    payload = {
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'created_at': datetime.datetime(2024, 1, 2, 3, 4, 5, 123456, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2024, 1, 2),
+        'dose': decimal.Decimal('2.50'),
+        'name': 'Ibuprofène   200mg',
+        'risk_score': 0.1,
+        'ratio': 1 / 3,
+        'counts': {1: 2, 3: 4},
+        'tags': ('a', 'b'),
+        'big': 2 ** 70,
+        'missing': None,
+        'flags': [True, False],
+    }
+
+    def test_matches_drf_byte_for_byte_without_exponents(self):
+        self.assertEqual(ORJSONRenderer().render(self.payload), JSONRenderer().render(self.payload))
+
+    def test_exponent_floats_decode_to_the_same_values(self):
+        data = {'tiny': 1.5e-7, 'huge': 1e16, 'nested': [1e300, -2.5e-12]}
+        fast, stock = ORJSONRenderer().render(data), JSONRenderer().render(data)
+        self.assertEqual(fast, b'{"tiny":1.5e-7,"huge":1e16,"nested":[1e300,-2.5e-12]}')
+        self.assertEqual(stock, b'{"tiny":1.5e-07,"huge":1e+16,"nested":[1e+300,-2.5e-12]}')
+        self.assertEqual(json.loads(fast), json.loads(stock))
+
+    def test_indented_output_defers_to_drf(self):
+        context = {'indent': 2}
+        self.assertEqual(
+            ORJSONRenderer().render(self.payload, 'application/json', context),
+            JSONRenderer().render(self.payload, 'application/json', context),
+        )
+
+    def test_without_orjson_output_is_drf(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(ORJSONRenderer().render({'huge': 1e16}), b'{"huge":1e+16}')
+
+    def test_parser_round_trip(self):
+        body = JSONRenderer().render(self.payload)
+        self.assertEqual(ORJSONParser().parse(BytesIO(body)), json.loads(body))
@@ -0,0 +1,87 @@
+import glob
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from health import replay, throttling
+from health.replay import ENDPOINT_DRUG_RISK, ENDPOINT_SYMPTOMS, LocalBackend, StubBackend
+from health.throttling import TokenBucketStore
+from health.triage import reset_model, triage_symptoms
+
+
+@override_settings(SYMPTOM_TRIAGE_MODEL_PATH='/nonexistent/triage_model.json')
+class RecorderTests(TestCase):
+
+    def setUp(self):
+        reset_model()
+        self.addCleanup(reset_model)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.directory = tmp.name
+        for patcher in (mock.patch.object(replay, '_recorder', None),
+                        mock.patch.object(throttling, '_store', TokenBucketStore(os.path.join(tmp.name, 'b.sqlite3')))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        settings = override_settings(AI_REPLAY_RECORDER={'ENABLED': True, 'DIR': tmp.name, 'SAMPLE_RATE': 1.0})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('rae'))
+
+    def exchanges(self):
+        paths = glob.glob(os.path.join(self.directory, '*.jsonl'))
+        return replay.load_exchanges(paths)
+
+    def test_symptom_exchange_keeps_the_llm_label(self):
+        llm = {'classification': 'allergic_reaction', 'confidence_score': 0.9,
+               'ai_analysis': 'A reaction.', 'recommendations': ['Stop the drug']}
+        with mock.patch('health.gemini_service.GeminiAIService.analyze_symptoms', return_value=llm):
+            self.client.post('/api/health/analyze-symptoms/', {'symptoms': 'Mild headache and nausea'}, format='json')
+        [exchange] = self.exchanges()
+        self.assertEqual(exchange['response']['classification'], triage_symptoms('Mild headache and nausea').classification)
+        self.assertEqual(exchange['model_verdict'], {'classification': 'allergic_reaction', 'confidence_score': 0.9})
+
+    def test_urgent_exchange_has_no_model_verdict(self):
+        with mock.patch('health.views.run_in_background'):
+            self.client.post('/api/health/analyze-symptoms/', {'symptoms': "I can't breathe"}, format='json')
+        [exchange] = self.exchanges()
+        self.assertTrue(exchange['response']['urgent'])
+        self.assertNotIn('model_verdict', exchange)
+
+
+class ReplayReportTests(SimpleTestCase):
+
+    def symptoms(self, text, shown, llm=None):
+        exchange = {'endpoint': ENDPOINT_SYMPTOMS, 'inputs': {'symptoms': text},
+                    'response': {'classification': shown}, 'latency_ms': 5}
+        if llm:
+            exchange['model_verdict'] = {'classification': llm, 'confidence_score': 0.9}
+        return exchange
+
+    def test_local_backend_is_compared_with_the_llm_label(self):
+        text = 'Mild headache and nausea'
+        local = triage_symptoms(text).classification
+        other = next(c for c in ('allergic_reaction', 'side_effect') if c != local)
+        exchanges = [
+            self.symptoms(text, shown=local, llm=other),
+            self.symptoms(text, shown=local, llm=local),
+            self.symptoms(text, shown=local),  # urgent or fallback: no LLM label
+        ]
+        report = replay.replay(exchanges, LocalBackend(), concurrency=1)
+        self.assertEqual(report.outcomes[ENDPOINT_SYMPTOMS]['answered'], 3)
+        self.assertEqual(dict(report.matrices[ENDPOINT_SYMPTOMS]), {(other, local): 1, (local, local): 1})
+        self.assertEqual(report.agreement(ENDPOINT_SYMPTOMS), 0.5)
+
+    def test_drug_risk_is_compared_with_the_response(self):
+        exchange = {'endpoint': ENDPOINT_DRUG_RISK, 'inputs': {}, 'response': {'risk_level': 'high'}}
+        self.assertEqual(replay.reference_verdict(exchange, 'risk_level'), 'high')
+
+    def test_stub_answers_with_the_llm_label(self):
+        exchange = self.symptoms('hives', shown='side_effect', llm='allergic_reaction')
+        exchange['response'].update({'confidence_score': 0.5, 'recommendations': ['Rest'], 'urgent': False})
+        result = StubBackend().answer(exchange)
+        self.assertEqual(result['classification'], 'allergic_reaction')
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from health.models import Allergy
+from health.routers import (
+    PRIMARY, ReadReplicaRouter, ReplicaPinningMiddleware, current_read_alias, is_pinned, pin_to_primary,
+    read_from_replica, replica_scope, use_replica_for,
+)
+
+
+@override_settings(READ_REPLICAS={'ALIASES': ['replica1'], 'PIN_SECONDS': 5, 'CACHE_ALIAS': 'default'})
+class ReadReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.router = ReadReplicaRouter()
+        self.user = User(pk=7, username='jo')
+        # SimpleTestCase runs outside a transaction, as requests do
+        self.assertFalse(connections[PRIMARY].in_atomic_block)
+
+    def test_reads_use_the_primary_unless_a_view_opts_in(self):
+        self.assertEqual(self.router.db_for_read(Allergy), PRIMARY)
+        with replica_scope():
+            self.assertEqual(self.router.db_for_read(Allergy), PRIMARY)
+            use_replica_for(self.user)
+            self.assertEqual(self.router.db_for_read(Allergy), 'replica1')
+        self.assertEqual(current_read_alias(), PRIMARY)
+
+    def test_writes_go_to_the_primary_and_pin_the_rest_of_the_request(self):
+        with read_from_replica(self.user):
+            self.assertEqual(self.router.db_for_write(Allergy), PRIMARY)
+            self.assertEqual(self.router.db_for_read(Allergy), PRIMARY)
+
+    def test_pinned_users_read_from_the_primary(self):
+        pin_to_primary(self.user.pk)
+        with read_from_replica(self.user):
+            self.assertEqual(self.router.db_for_read(Allergy), PRIMARY)
+        with read_from_replica(User(pk=8)):
+            self.assertEqual(self.router.db_for_read(Allergy), 'replica1')
+
+    @override_settings(READ_REPLICAS={'ALIASES': [], 'PIN_SECONDS': 5, 'CACHE_ALIAS': 'default'})
+    def test_no_replicas_configured(self):
+        with read_from_replica(self.user):
+            self.assertEqual(self.router.db_for_read(Allergy), PRIMARY)
+
+    def test_replicas_are_never_migrated(self):
+        self.assertTrue(self.router.allow_migrate(PRIMARY, 'health'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'health'))
+
+    def test_middleware_pins_after_successful_writes_only(self):
+        factory = RequestFactory()
+        for method, status, user, pinned in [
+            ('post', 201, self.user, True),
+            ('post', 400, User(pk=8), False),
+            ('get', 200, User(pk=9), False),
+            ('post', 201, AnonymousUser(), False),
+        ]:
+            request = getattr(factory, method)('/api/health/allergies/')
+            request.user = user
+            ReplicaPinningMiddleware(lambda request: HttpResponse(status=status))(request)
+            if user.pk is not None:
+                self.assertEqual(is_pinned(user.pk), pinned, (method, status))
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from django.utils.functional import SimpleLazyObject
+
+from health.models import Allergy, ChatMessage, RiskCheckRecord
+from health.routers import PRIMARY, ShardRouter
+from health.sharding import for_user, jump_hash, shard_for_user
+
+SHARDS = ['default', 'shard1', 'shard2']
+
+
+class JumpHashTests(SimpleTestCase):
+
+    def test_mapping_is_stable_and_spread(self):
+        placement = [shard_for_user(user_id, SHARDS) for user_id in range(3000)]
+        self.assertEqual(placement, [shard_for_user(user_id, SHARDS) for user_id in range(3000)])
+        for alias in SHARDS:
+            self.assertAlmostEqual(placement.count(alias) / 3000, 1 / 3, delta=0.05)
+
+    def test_adding_a_shard_only_moves_users_to_it(self):
+        grown = SHARDS + ['shard3']
+        moved = [user_id for user_id in range(3000)
+                 if shard_for_user(user_id, SHARDS) != shard_for_user(user_id, grown)]
+        self.assertAlmostEqual(len(moved) / 3000, 1 / 4, delta=0.05)
+        self.assertEqual({shard_for_user(user_id, grown) for user_id in moved}, {'shard3'})
+
+    def test_single_bucket(self):
+        self.assertEqual(jump_hash(12345, 1), 0)
+        self.assertEqual(shard_for_user(7, ['default']), 'default')
+
+
+@override_settings(HEALTH_SHARDING={'ALIASES': SHARDS, 'ID_BLOCK': 10})
+class ShardRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ShardRouter()
+        self.user = User(pk=42, username='dee')
+        self.shard = shard_for_user(42)
+
+    def test_instances_are_routed_by_their_user(self):
+        record = RiskCheckRecord(user_id=42)
+        self.assertEqual(self.router.db_for_write(RiskCheckRecord, instance=record), self.shard)
+        self.assertEqual(self.router.db_for_read(ChatMessage, instance=self.user), self.shard)
+
+    def test_loaded_instances_stay_on_their_database(self):
+        record = RiskCheckRecord(user_id=42)
+        record._state.db = 'shard2'
+        self.assertEqual(self.router.db_for_write(RiskCheckRecord, instance=record), 'shard2')
+
+    def test_unscoped_queries_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(RiskCheckRecord), PRIMARY)
+
+    def test_unsharded_models_are_left_to_the_next_router(self):
+        self.assertIsNone(self.router.db_for_write(Allergy, instance=Allergy(user_id=42)))
+
+    def test_for_user_queries_the_users_shard(self):
+        self.assertEqual(for_user(RiskCheckRecord, self.user).db, self.shard)
+        self.assertEqual(RiskCheckRecord.objects.for_user(42).db, self.shard)
+
+    def test_relations_with_a_lazy_user(self):
+        lazy_user = SimpleLazyObject(lambda: self.user)
+        self.assertTrue(self.router.allow_relation(RiskCheckRecord(user_id=42), lazy_user))
+        self.assertTrue(self.router.allow_relation(lazy_user, ChatMessage(user_id=42)))
+        self.assertIsNone(self.router.allow_relation(Allergy(user_id=42), lazy_user))
+
+    def test_shards_only_migrate_sharded_tables(self):
+        self.assertTrue(self.router.allow_migrate('shard1', 'health', 'riskcheckrecord'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'health', 'allergy'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'auth'))
+        self.assertFalse(self.router.allow_migrate('shard1', 'health', 'nosuchmodel'))
+        self.assertIsNone(self.router.allow_migrate('default', 'health', 'allergy'))
+
+    @override_settings(HEALTH_SHARDING={'ALIASES': ['default'], 'ID_BLOCK': 10})
+    def test_single_shard_changes_nothing(self):
+        self.assertIsNone(self.router.db_for_read(RiskCheckRecord, instance=self.user))
+        self.assertEqual(RiskCheckRecord.objects.for_user(42).db, PRIMARY)
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from health import throttling
+from health.throttling import AIChatThrottle, TokenBucketStore
+
+
+class TokenBucketStoreTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'throttle.sqlite3')
+        self.store = TokenBucketStore(self.path, prune_interval=60)
+
+    def keys(self):
+        with sqlite3.connect(self.path) as conn:
+            return {row[0] for row in conn.execute('SELECT key FROM token_buckets')}
+
+    def test_capacity_then_refill(self):
+        for _ in range(3):
+            self.assertEqual(self.store.take('k', capacity=3, refill_per_second=1, now=100), (True, 0.0))
+        allowed, wait = self.store.take('k', capacity=3, refill_per_second=1, now=100)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 1.0)
+        self.assertTrue(self.store.take('k', capacity=3, refill_per_second=1, now=101)[0])
+        self.assertFalse(self.store.take('k', capacity=3, refill_per_second=1, now=101)[0])
+
+    def test_refill_never_exceeds_capacity(self):
+        self.store.take('k', capacity=2, refill_per_second=1, now=100)
+        results = [self.store.take('k', capacity=2, refill_per_second=1, now=1000)[0] for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+
+    def test_full_buckets_are_pruned(self):
+        self.store.take('idle', capacity=2, refill_per_second=1, now=100)
+        self.store.take('busy', capacity=2, refill_per_second=0.001, now=100)
+        self.assertEqual(self.keys(), {'idle', 'busy'})
+        # 'idle' is full again after one second, 'busy' needs a thousand
+        self.store.take('other', capacity=2, refill_per_second=1, now=200)
+        self.assertEqual(self.keys(), {'busy', 'other'})
+
+    def test_prune_runs_at_most_once_per_interval(self):
+        self.store.take('a', capacity=1, refill_per_second=1, now=100)
+        self.store.take('b', capacity=1, refill_per_second=1, now=130)
+        self.assertEqual(self.keys(), {'a', 'b'})
+        self.store.take('c', capacity=1, refill_per_second=1, now=170)
+        self.assertEqual(self.keys(), {'c'})
+
+
+class ThrottledView(APIView):
+    permission_classes = [AllowAny]
+    throttle_classes = [AIChatThrottle]
+
+    def post(self, request):
+        return Response({'ok': True})
+
+
+@override_settings(AI_THROTTLE_BUCKETS={'ai_chat': {'capacity': 2, 'refill_per_minute': 1}})
+class TokenBucketThrottleTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        store = TokenBucketStore(os.path.join(tmp.name, 'throttle.sqlite3'))
+        patcher = mock.patch.object(throttling, '_store', store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = APIRequestFactory()
+        self.view = ThrottledView.as_view()
+
+    def post(self, remote_addr='203.0.113.7', **extra):
+        return self.view(self.factory.post('/chat/', {}, format='json', REMOTE_ADDR=remote_addr, **extra))
+
+    def test_exhausted_bucket_returns_429_with_retry_after(self):
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.post().status_code, 200)
+        response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+    def test_forwarded_for_does_not_create_new_buckets(self):
+        statuses = [
+            self.post(HTTP_X_FORWARDED_FOR=f'198.51.100.{i}').status_code
+            for i in range(4)
+        ]
+        self.assertEqual(statuses, [200, 200, 429, 429])
+
+    def test_clients_get_separate_buckets(self):
+        self.post()
+        self.post()
+        self.assertEqual(self.post().status_code, 429)
+        self.assertEqual(self.post(remote_addr='203.0.113.8').status_code, 200)
+
+    def test_trusted_proxy_uses_forwarded_address(self):
+        with mock.patch.object(api_settings, 'NUM_PROXIES', 1):
+            statuses = [
+                self.post(HTTP_X_FORWARDED_FOR=f'198.51.100.{i}').status_code
+                for i in range(3)
+            ]
+        self.assertEqual(statuses, [200, 200, 200])
@@ -0,0 +1,98 @@
+import json
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from health.models import SymptomAnalysis
+from health.triage import LinearTriageModel, reset_model, triage_symptoms
+
+
+class EmergencyNegationTests(SimpleTestCase):
+
+    def assertUrgent(self, text):
+        self.assertTrue(triage_symptoms(text).urgent, text)
+
+    def assertNotUrgent(self, text):
+        self.assertFalse(triage_symptoms(text).urgent, text)
+
+    def test_plain_emergencies_are_urgent(self):
+        self.assertUrgent("I can't breathe")
+        self.assertUrgent('Sudden chest pain after the first dose')
+        self.assertUrgent('My throat is closing')
+        self.assertUrgent('I fainted twice')
+
+    def test_negated_emergencies_are_not_urgent(self):
+        self.assertNotUrgent('Itchy rash, no chest pain')
+        self.assertNotUrgent('No trouble breathing, just hives')
+        self.assertNotUrgent('Patient denies shortness of breath')
+        self.assertNotUrgent('I do not have any chest pain')
+        self.assertNotUrgent('Mild rash without wheezing')
+        self.assertNotUrgent("I haven't fainted")
+        self.assertNotUrgent('no chest pain or trouble breathing')
+
+    def test_negation_stops_at_the_clause(self):
+        self.assertUrgent('No rash but my throat is closing')
+        self.assertUrgent('There is no rash and I have trouble breathing')
+        self.assertUrgent('No fever. Chest pain since this morning')
+        self.assertUrgent('Itching, no hives, trouble breathing')
+
+    def test_pseudo_negations_do_not_cancel(self):
+        self.assertUrgent('I have no idea why my throat is swelling')
+        self.assertUrgent('Not sure if this is anaphylaxis')
+        self.assertUrgent("I don't know why but I can't breathe")
+
+    def test_negated_pattern_still_urgent_when_repeated_unnegated(self):
+        self.assertUrgent('No chest pain yesterday, now chest pain again')
+
+
+@override_settings(SYMPTOM_TRIAGE_MODEL_PATH='/nonexistent/triage_model.json')
+class SymptomAnalysisLabelTests(TestCase):
+
+    def setUp(self):
+        reset_model()
+        self.user = User.objects.create_user('sam')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        reset_model()
+
+    def test_llm_verdict_is_stored_next_to_the_triage_one(self):
+        llm = {'classification': 'allergic_reaction', 'confidence_score': 0.97,
+               'ai_analysis': 'Looks like a reaction.', 'recommendations': ['Stop the drug']}
+        with mock.patch('health.gemini_service.GeminiAIService.analyze_symptoms', return_value=llm):
+            response = self.client.post('/api/health/analyze-symptoms/',
+                                        {'symptoms': 'Mild headache and nausea'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        triage = triage_symptoms('Mild headache and nausea')
+        self.assertEqual(body['classification'], triage.classification)
+        self.assertEqual(body['ai_analysis'], 'Looks like a reaction.')
+        analysis = SymptomAnalysis.objects.get(pk=body['analysis_id'])
+        self.assertEqual(analysis.classification, triage.classification)
+        self.assertEqual(analysis.llm_classification, 'allergic_reaction')
+        self.assertEqual(analysis.llm_confidence_score, 0.97)
+        self.assertNotIn('llm_classification', self.client.get(f'/api/health/symptom-analyses/{analysis.pk}/').json())
+
+    def test_training_uses_llm_labels(self):
+        common = {'user': self.user, 'ai_analysis': '', 'recommendations': ''}
+        for _ in range(20):
+            # Triage said side_effect; the LLM disagreed
+            SymptomAnalysis.objects.create(symptoms='hives and itchy welts', classification='side_effect',
+                                           confidence_score=0.9, llm_classification='allergic_reaction',
+                                           llm_confidence_score=0.9, **common)
+            SymptomAnalysis.objects.create(symptoms='headache and nausea', classification='side_effect',
+                                           confidence_score=0.9, llm_classification='side_effect',
+                                           llm_confidence_score=0.9, **common)
+            # No LLM label (e.g. the call failed): not used
+            SymptomAnalysis.objects.create(symptoms='hives and itchy welts', classification='unrelated',
+                                           confidence_score=0.9, **common)
+        with tempfile.NamedTemporaryFile(suffix='.json') as fh:
+            call_command('train_triage_model', output=fh.name, stdout=mock.MagicMock())
+            model = LinearTriageModel.from_dict(json.load(open(fh.name)))
+        probs = model.predict_proba('hives and itchy welts')
+        self.assertEqual(max(probs, key=probs.get), 'allergic_reaction')
@@ -0,0 +1,125 @@
+import os
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from health.models import RiskCheckRecord
+from health.write_behind import WriteBehindBuffer, insert_rows, recover_spools
+
+T0 = datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc)
+T1 = datetime(2024, 5, 1, 12, 5, tzinfo=dt_timezone.utc)
+
+
+@mock.patch('health.write_behind.record_rows')
+class WriteBehindTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.spool_dir = tmp.name
+        self.user = User.objects.create_user('lee')
+
+    def make_buffer(self):
+        # Never woken by its flusher thread: the tests flush on this thread
+        buffer = WriteBehindBuffer(self.spool_dir, flush_interval=3600, max_batch=1000, id_block=10)
+        self.addCleanup(self.stop, buffer)
+        return buffer
+
+    def stop(self, buffer):
+        buffer._stopped = True
+        buffer._wake.set()
+        buffer._thread.join(5)
+
+    def add(self, buffer, drug='Advil'):
+        return buffer.add(
+            RiskCheckRecord, user=self.user, drug_name=drug, risk_level='low',
+            potential_reactions=[], recommendations='', source='ai',
+        )
+
+    def spools(self):
+        return sorted(name for name in os.listdir(self.spool_dir) if name.endswith('.jsonl'))
+
+    def crash(self, buffer):
+        """Drop the buffer's spool lock without committing, as a dead process would"""
+        os.close(buffer._spool_fd)
+        buffer._spool_fd = None
+        buffer._pending = []
+
+    def test_flush_writes_rows_with_their_reserved_ids(self, record_rows):
+        buffer = self.make_buffer()
+        first, second = self.add(buffer), self.add(buffer, 'Tylenol')
+        self.assertEqual(second.pk, first.pk + 1)
+        self.assertFalse(RiskCheckRecord.objects.exists())
+        self.assertEqual(len(self.spools()), 1)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(
+            list(RiskCheckRecord.objects.order_by('pk').values_list('pk', 'drug_name')),
+            [(first.pk, 'Advil'), (second.pk, 'Tylenol')],
+        )
+        self.assertEqual(self.spools(), [])
+        record_rows.assert_called_once()
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_updated_at_is_the_insert_time(self, record_rows):
+        buffer = self.make_buffer()
+        with mock.patch('health.write_behind.timezone.now', return_value=T0):
+            record = self.add(buffer)
+        with mock.patch('health.write_behind.timezone.now', return_value=T1):
+            buffer.flush()
+        stored = RiskCheckRecord.objects.get(pk=record.pk)
+        self.assertEqual(stored.checked_at, T0)
+        self.assertEqual(stored.updated_at, T1)
+
+    def test_locked_spools_are_left_to_their_owner(self, record_rows):
+        buffer = self.make_buffer()
+        self.add(buffer)
+        self.assertEqual(recover_spools(self.spool_dir), 0)
+        self.assertEqual(len(self.spools()), 1)
+        self.assertFalse(RiskCheckRecord.objects.exists())
+
+    def test_abandoned_spool_is_replayed(self, record_rows):
+        buffer = self.make_buffer()
+        with mock.patch('health.write_behind.timezone.now', return_value=T0):
+            records = [self.add(buffer), self.add(buffer, 'Tylenol')]
+        self.crash(buffer)
+
+        with mock.patch('health.write_behind.timezone.now', return_value=T1):
+            self.assertEqual(recover_spools(self.spool_dir), 2)
+        stored = RiskCheckRecord.objects.order_by('pk')
+        self.assertEqual([row.pk for row in stored], [record.pk for record in records])
+        self.assertEqual({(row.checked_at, row.updated_at) for row in stored}, {(T0, T1)})
+        self.assertEqual(self.spools(), [])
+
+    def test_replay_skips_rows_already_committed(self, record_rows):
+        buffer = self.make_buffer()
+        committed, lost = self.add(buffer), self.add(buffer, 'Tylenol')
+        insert_rows([RiskCheckRecord(**{
+            f.attname: f.value_from_object(committed) for f in committed._meta.concrete_fields
+        })])
+        self.crash(buffer)
+        record_rows.reset_mock()
+
+        self.assertEqual(recover_spools(self.spool_dir), 1)
+        self.assertEqual(set(RiskCheckRecord.objects.values_list('pk', flat=True)), {committed.pk, lost.pk})
+        replayed = record_rows.call_args.args[0]
+        self.assertEqual([row.pk for row in replayed], [lost.pk])
+
+    def test_torn_final_line_is_skipped(self, record_rows):
+        buffer = self.make_buffer()
+        record = self.add(buffer)
+        os.write(buffer._spool_fd, b'{"model": "health.riskcheckrec')
+        self.crash(buffer)
+
+        self.assertEqual(recover_spools(self.spool_dir), 1)
+        self.assertTrue(RiskCheckRecord.objects.filter(pk=record.pk).exists())
+        self.assertEqual(self.spools(), [])
+
+    def test_unrelated_files_are_ignored(self, record_rows):
+        open(os.path.join(self.spool_dir, 'notes.txt'), 'w').close()
+        open(os.path.join(self.spool_dir, '123-abc.jsonl.tmp'), 'w').close()
+        self.assertEqual(recover_spools(self.spool_dir), 0)
+        self.assertEqual(sorted(os.listdir(self.spool_dir)), ['123-abc.jsonl.tmp', 'notes.txt'])
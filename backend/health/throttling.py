@@ -0,0 +1,156 @@
+"""
+Token-bucket throttling for the AI endpoints.
+
+Each (scope, user or client IP) pair owns a bucket that refills at a steady
+rate up to its capacity; a request spends one token or is rejected with a
+429 and a ``Retry-After`` header. Bucket state lives in a small SQLite file
+so every worker process on the host shares it, and each check is a single
+IMMEDIATE transaction. A bucket that has refilled to capacity is no different
+from a missing one, so such rows are pruned periodically and the table only
+holds recently active callers.
+"""
+import logging
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from .idempotency import stored_response
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketStore:
+
+    def __init__(self, path, prune_interval=60.0):
+        self.path = str(path)
+        self.prune_interval = prune_interval
+        self._local = threading.local()
+        self._next_prune = 0.0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS token_buckets ('
+                'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, '
+                'full_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS token_buckets_full_at ON token_buckets (full_at)')
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, capacity, refill_per_second, cost=1.0, now=None):
+        """
+        Spend ``cost`` tokens from the bucket. Returns ``(allowed, wait)``
+        where ``wait`` is the seconds until enough tokens are available.
+        """
+        now = time.time() if now is None else now
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated FROM token_buckets WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                tokens = capacity
+            else:
+                tokens = min(capacity, row[0] + max(0.0, now - row[1]) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            full_at = now + (capacity - tokens) / refill_per_second
+            conn.execute(
+                'INSERT INTO token_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, '
+                'updated = excluded.updated, full_at = excluded.full_at',
+                (key, tokens, now, full_at)
+            )
+            if now >= self._next_prune:
+                self._next_prune = now + self.prune_interval
+                conn.execute('DELETE FROM token_buckets WHERE full_at <= ?', (now,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        wait = 0.0 if allowed else (cost - tokens) / refill_per_second
+        return allowed, wait
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TokenBucketStore(
+                    settings.AI_THROTTLE_STORE_PATH,
+                    prune_interval=settings.AI_THROTTLE_PRUNE_INTERVAL,
+                )
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Throttle keyed by user (or client IP when anonymous) with per-scope
+    ``capacity`` and ``refill_per_minute`` from settings.AI_THROTTLE_BUCKETS.
+    The client IP honours REST_FRAMEWORK['NUM_PROXIES'], so a caller-supplied
+    X-Forwarded-For cannot mint fresh buckets.
+
+    A retry that ``@idempotent(idempotency_endpoint)`` will answer from a
+    stored response is let through without spending a token.
+    """
+    scope = None
+    idempotency_endpoint = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_cache_key(self, request):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'{self.scope}:{ident}'
+
+    def allow_request(self, request, view):
+        config = settings.AI_THROTTLE_BUCKETS.get(self.scope)
+        if not config:
+            return True
+        if self.idempotency_endpoint and stored_response(request, self.idempotency_endpoint):
+            return True
+        try:
+            allowed, self.wait_seconds = get_bucket_store().take(
+                self.get_cache_key(request),
+                capacity=config['capacity'],
+                refill_per_second=config['refill_per_minute'] / 60.0,
+            )
+        except sqlite3.Error:
+            # Never turn a throttle store problem into an outage
+            logger.exception("Token bucket store unavailable; allowing request")
+            return True
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AIChatThrottle(TokenBucketThrottle):
+    scope = 'ai_chat'
+    idempotency_endpoint = 'chat'
+
+
+class DrugRiskThrottle(TokenBucketThrottle):
+    scope = 'drug_risk'
+    idempotency_endpoint = 'check-drug-risk'
+
+
+class SymptomAnalysisThrottle(TokenBucketThrottle):
+    scope = 'symptom_analysis'
+    idempotency_endpoint = 'analyze-symptoms'
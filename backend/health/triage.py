@@ -0,0 +1,230 @@
+"""
+Local symptom triage that runs before the LLM.
+
+Keyword rules catch high-severity patterns (airway, anaphylaxis, chest pain)
+and answer instantly with urgent guidance, unless the pattern is negated
+("no chest pain", "denies trouble breathing"). Everything else is
+classified by a small softmax-regression model over hashed word features,
+trained on the LLM's stored classifications with ``python manage.py
+train_triage_model``. Without a trained model the rules' keyword scores are
+used on their own.
+"""
+import json
+import math
+import random
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+CLASSIFICATIONS = ['allergic_reaction', 'side_effect', 'unrelated', 'unknown']
+FEATURE_DIM = 1 << 12
+
+# (pattern, classification) - any match makes the triage urgent
+EMERGENCY_PATTERNS = [
+    (r"can'?t breathe|cannot breathe|trouble breathing|difficulty breathing|short(ness)? of breath|wheez", 'allergic_reaction'),
+    (r"throat (is )?(swelling|swollen|closing|tight)|swollen (tongue|throat|lips?)|(tongue|lips?|face) (is )?swelling", 'allergic_reaction'),
+    (r"anaphyla", 'allergic_reaction'),
+    (r"chest pain|chest tightness|heart racing|irregular heartbeat", 'side_effect'),
+    (r"unconscious|passed out|fainted|fainting|unresponsive|seizure|convulsion", 'unknown'),
+    (r"coughing (up )?blood|vomiting blood|blood in (stool|vomit)", 'unknown'),
+    (r"overdose|took too (much|many)", 'side_effect'),
+]
+
+KEYWORDS = {
+    'allergic_reaction': ['rash', 'hives', 'itch', 'swelling', 'swollen', 'sneez', 'watery eyes', 'redness', 'welts'],
+    'side_effect': ['nausea', 'dizz', 'drows', 'headache', 'vomit', 'diarrh', 'constipat', 'fatigue', 'dry mouth', 'insomnia'],
+}
+
+URGENT_GUIDANCE = [
+    "Call emergency services (911 or your local emergency number) now.",
+    "If you have a prescribed epinephrine auto-injector, use it as directed.",
+    "Do not take any more of the suspected medication.",
+    "Stay with someone and do not drive yourself to the hospital.",
+]
+
+# A negation cue in the same clause, at most NEGATION_WINDOW words before a
+# pattern, cancels it. Clauses end at punctuation and conjunctions, and
+# phrases like "no idea" or "not sure" are not negations. When in doubt the
+# pattern stays urgent.
+NEGATION_WINDOW = 4
+
+_emergency_res = [(re.compile(p, re.IGNORECASE), c) for p, c in EMERGENCY_PATTERNS]
+_word_re = re.compile(r"[a-z']+")
+_clause_break_re = re.compile(r"[.;:!?,]|\b(?:and|but|however|although|though|except|yet|now)\b", re.IGNORECASE)
+_pseudo_negation_re = re.compile(
+    r"\b(?:no idea|no clue|not sure|no doubt|not certain|not only|no longer able)\b|n't (?:know|sure|tell)\b",
+    re.IGNORECASE,
+)
+_negation_re = re.compile(
+    r"\b(?:no|not|never|without|denies|denied|deny|negative for|free of|absence of|none)\b|n't\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class TriageResult:
+    classification: str
+    confidence_score: float
+    urgent: bool = False
+    matched_patterns: list = field(default_factory=list)
+    source: str = 'rules'
+
+    def as_dict(self):
+        return {
+            'classification': self.classification,
+            'confidence_score': self.confidence_score,
+            'urgent': self.urgent,
+            'matched_patterns': self.matched_patterns,
+            'source': self.source,
+        }
+
+
+def features(text):
+    words = _word_re.findall(text.lower())
+    tokens = words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+    counts = {}
+    for token in tokens:
+        index = zlib.crc32(token.encode('utf-8')) % FEATURE_DIM
+        counts[index] = counts.get(index, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+class LinearTriageModel:
+    """Sparse multinomial logistic regression over hashed unigrams and bigrams"""
+
+    def __init__(self, weights=None, bias=None):
+        self.weights = weights or {c: {} for c in CLASSIFICATIONS}
+        self.bias = bias or {c: 0.0 for c in CLASSIFICATIONS}
+
+    def _scores(self, x):
+        return {
+            c: self.bias[c] + sum(self.weights[c].get(i, 0.0) * v for i, v in x.items())
+            for c in CLASSIFICATIONS
+        }
+
+    def predict_proba(self, text):
+        return self._softmax(self._scores(features(text)))
+
+    @classmethod
+    def train(cls, samples, epochs=15, learning_rate=0.5, l2=1e-4, seed=0):
+        """``samples`` is a list of (symptom text, classification) pairs"""
+        model = cls()
+        data = [(features(text), label) for text, label in samples if label in CLASSIFICATIONS]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch)
+            for x, label in data:
+                probs = model._softmax(model._scores(x))
+                for c in CLASSIFICATIONS:
+                    gradient = probs[c] - (1.0 if c == label else 0.0)
+                    row = model.weights[c]
+                    for i, v in x.items():
+                        row[i] = row.get(i, 0.0) * (1 - rate * l2) - rate * gradient * v
+                    model.bias[c] -= rate * gradient
+        return model
+
+    @staticmethod
+    def _softmax(scores):
+        top = max(scores.values())
+        exp = {c: math.exp(s - top) for c, s in scores.items()}
+        total = sum(exp.values())
+        return {c: e / total for c, e in exp.items()}
+
+    def to_dict(self):
+        return {
+            'feature_dim': FEATURE_DIM,
+            'bias': self.bias,
+            'weights': {
+                c: {str(i): round(w, 6) for i, w in row.items() if abs(w) > 1e-6}
+                for c, row in self.weights.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('feature_dim') != FEATURE_DIM:
+            raise ValueError("Triage model was trained with a different feature size")
+        weights = {c: {int(i): w for i, w in data['weights'].get(c, {}).items()} for c in CLASSIFICATIONS}
+        return cls(weights=weights, bias={c: data['bias'].get(c, 0.0) for c in CLASSIFICATIONS})
+
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """The trained model from SYMPTOM_TRIAGE_MODEL_PATH, or None if not trained yet"""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                try:
+                    with open(settings.SYMPTOM_TRIAGE_MODEL_PATH) as fh:
+                        _model = LinearTriageModel.from_dict(json.load(fh))
+                except (OSError, ValueError, KeyError):
+                    _model = None
+                _model_loaded = True
+    return _model
+
+
+def reset_model():
+    global _model, _model_loaded
+    with _model_lock:
+        _model, _model_loaded = None, False
+
+
+def is_negated(text, start):
+    """Whether the phrase starting at ``start`` is negated within its clause"""
+    clause = _clause_break_re.split(text[:start])[-1]
+    window = ' '.join(clause.split()[-NEGATION_WINDOW:])
+    return bool(_negation_re.search(_pseudo_negation_re.sub(' ', window)))
+
+
+def emergency_matches(symptoms):
+    """(matched text, classification) for each pattern with a non-negated match"""
+    matched = []
+    for regex, classification in _emergency_res:
+        for m in regex.finditer(symptoms):
+            if not is_negated(symptoms, m.start()):
+                matched.append((m.group(0), classification))
+                break
+    return matched
+
+
+def triage_symptoms(symptoms):
+    """Classify a symptom description locally in well under a millisecond"""
+    matched = emergency_matches(symptoms)
+    if matched:
+        return TriageResult(
+            classification=matched[0][1],
+            confidence_score=0.9,
+            urgent=True,
+            matched_patterns=[text for text, _ in matched],
+        )
+
+    model = get_model()
+    if model is not None:
+        probs = model.predict_proba(symptoms)
+        classification = max(probs, key=probs.get)
+        return TriageResult(
+            classification=classification,
+            confidence_score=round(probs[classification], 3),
+            source='model',
+        )
+
+    text = symptoms.lower()
+    hits = {c: sum(k in text for k in words) for c, words in KEYWORDS.items()}
+    best = max(hits, key=hits.get)
+    if not hits[best]:
+        return TriageResult(classification='unknown', confidence_score=0.3)
+    return TriageResult(
+        classification=best,
+        confidence_score=round(min(0.5 + 0.1 * hits[best], 0.8), 3),
+        matched_patterns=[k for k in KEYWORDS[best] if k in text],
+    )
@@ -17,4 +17,8 @@ urlpatterns = [
     path('analyze-symptoms/', views.analyze_symptoms, name='analyze-symptoms'),
     path('chat/', views.chat_with_ai, name='chat-ai'),
     path('summary/', views.health_summary, name='health-summary'),
+    path('sync/', views.sync, name='health-sync'),
+    path('analytics/top-drugs/', views.analytics_top_drugs, name='analytics-top-drugs'),
+    path('analytics/risk-distribution/', views.analytics_risk_distribution, name='analytics-risk-distribution'),
+    path('analytics/symptom-trends/', views.analytics_symptom_trends, name='analytics-symptom-trends'),
 ]
\ No newline at end of file
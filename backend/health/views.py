@@ -1,36 +1,206 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, throttle_classes, action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAdminUser, IsAuthenticated
 from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db import transaction
+from django.utils import timezone
 from .models import (
     UserProfile, Allergy, Medication, RiskCheckRecord, 
-    SymptomAnalysis, ChatMessage, HealthAlert
+    SymptomAnalysis, ChatMessage, HealthAlert, ArchivedRecord
 )
 from .serializers import (
     UserProfileSerializer, AllergySerializer, MedicationSerializer,
     RiskCheckRecordSerializer, SymptomAnalysisSerializer, ChatMessageSerializer,
     HealthAlertSerializer, RiskCheckRequestSerializer, SymptomAnalysisRequestSerializer,
-    ChatRequestSerializer, HealthSummarySerializer
+    ChatRequestSerializer, HealthSummarySerializer, select_field_names
 )
-from .gemini_service import GeminiAIService
+from . import analytics
+from .ai_scheduler import (
+    PRIORITY_CHAT, PRIORITY_DRUG_RISK, PRIORITY_EMERGENCY, PRIORITY_SYMPTOMS,
+    client_key, get_scheduler
+)
+from .archive import ARCHIVED_MODELS, ArchivedHistory
+from .background import run_in_background
+from .conditional import (
+    build_etag, collection_version, not_modified, set_etag, user_fingerprint
+)
+from .counters import get_unread_alert_count, reset_unread_alert_count
+from .fast_serializers import get_values_serializer
+from .gemini_service import CHAT_UNAVAILABLE_MESSAGE, GeminiAIService
+from .idempotency import idempotent
+from .knowledge import allergen_key, lookup as lookup_drug_risk
+from .llm_ledger import record_cache_hit
+from .routers import read_from_replica, replica_scope, use_replica_for
+from .replay import ENDPOINT_CHAT, ENDPOINT_DRUG_RISK, ENDPOINT_SYMPTOMS, note_inputs, note_model_verdict, recorded
+from .similarity_cache import get_chat_cache
+from .summary import build_summary, cached_summary, store_summary, summary_versions
+from .sync import InvalidSyncToken, changes_since, decode_token
+from .throttling import AIChatThrottle, DrugRiskThrottle, SymptomAnalysisThrottle
+from .triage import CLASSIFICATIONS, URGENT_GUIDANCE, triage_symptoms
+from .warmup import warmed_drug_risk
+from .write_behind import flush_pending, record_later
 import json
 import random
+from functools import partial, wraps
+
+
+class SparseFieldsViewMixin:
+    """
+    ``?fields=a,b`` / ``?omit=c`` on GET requests narrow both the serializer
+    output and the columns loaded from the database.
+    """
+
+    def get_sparse_fields(self):
+        if self.request is None or self.request.method not in ('GET', 'HEAD'):
+            return None, None
+        params = self.request.query_params
+        fields = [f for f in params.get('fields', '').split(',') if f.strip()]
+        omit = [f for f in params.get('omit', '').split(',') if f.strip()]
+        return [f.strip() for f in fields] or None, [f.strip() for f in omit] or None
+
+    def get_serializer(self, *args, **kwargs):
+        fields, omit = self.get_sparse_fields()
+        if fields or omit:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('omit', omit)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, omit = self.get_sparse_fields()
+        if not fields and not omit:
+            return queryset
+        serializer_fields = self.get_serializer_class()().fields
+        selected = select_field_names(list(serializer_fields), fields, omit)
+        columns = {'pk'}
+        for name in selected:
+            source = serializer_fields[name].source
+            try:
+                columns.add(queryset.model._meta.get_field(source).name)
+            except FieldDoesNotExist:
+                pass
+        return queryset.only(*columns)
+
+
+class ValuesListMixin(SparseFieldsViewMixin):
+    """
+    Serves the read-only list action from .values() rows through the fast
+    path, skipping model instantiation and per-object field setup.
+    """
+
+    def list(self, request, *args, **kwargs):
+        fast = get_values_serializer(self.get_serializer_class()).narrowed(*self.get_sparse_fields())
+        queryset = fast.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(fast.render(page))
+        return Response(fast.render(queryset))
+
+
+class ArchiveReadMixin:
+    """
+    Lets list actions reach archived history when the client asks for it
+    with ``?include_archived=true``; otherwise only hot rows are read.
+    """
+    archive_record_type = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('include_archived', '').lower() not in ('1', 'true', 'yes'):
+            return super().list(request, *args, **kwargs)
+
+        _, timestamp_field = ARCHIVED_MODELS[self.archive_record_type]
+        queryset = self.filter_queryset(self.get_queryset()).order_by(f'-{timestamp_field}', '-id')
+        archived = ArchivedRecord.objects.filter(
+            user=request.user, record_type=self.archive_record_type
+        ).order_by('-created_at', '-original_id')
+        history = ArchivedHistory(queryset, archived)
+
+        page = self.paginate_queryset(history)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(list(history), many=True)
+        return Response(serializer.data)
+
+
+class ReplicaReadMixin:
+    """Read-only requests read from a replica unless the user is pinned to the primary"""
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_scope():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            use_replica_for(request.user)
+
+
+def replica_reads(view):
+    """``ReplicaReadMixin`` for a function view; place it directly above the function"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with read_from_replica(request.user):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    ETag on list and retrieve, computed from the user's row count and
+    latest ``updated_at`` so an unchanged resource gets a 304 before any
+    serialization happens.
+    """
+
+    def get_validator_extra(self):
+        return ()
+
+    def conditional(self, versions, render):
+        etag = build_etag(self.request, versions, self.get_validator_extra())
+        response = not_modified(self.request, etag)
+        if response is None:
+            response = render()
+        return set_etag(response, etag)
 
+    def list(self, request, *args, **kwargs):
+        versions = [collection_version(self.get_queryset())]
+        return self.conditional(versions, partial(super().list, request, *args, **kwargs))
 
-class UserProfileViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            updated_at = (self.get_queryset()
+                          .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                          .values_list('updated_at', flat=True)
+                          .first())
+        except (ValueError, TypeError, ValidationError):
+            # Malformed lookup value (e.g. a non-numeric pk)
+            updated_at = None
+        if updated_at is None:
+            # Missing object: let the normal path produce the 404
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional([(1, updated_at)], partial(super().retrieve, request, *args, **kwargs))
+
+
+class UserProfileViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = UserProfileSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         return UserProfile.objects.filter(user=self.request.user)
 
+    def get_validator_extra(self):
+        return user_fingerprint(self.request.user)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class AllergyViewSet(viewsets.ModelViewSet):
+class AllergyViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = AllergySerializer
     permission_classes = [IsAuthenticated]
 
@@ -41,7 +211,7 @@ class AllergyViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class MedicationViewSet(viewsets.ModelViewSet):
+class MedicationViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = MedicationSerializer
     permission_classes = [IsAuthenticated]
 
@@ -52,40 +222,44 @@ class MedicationViewSet(viewsets.ModelViewSet):
         serializer.save(user=self.request.user)
 
 
-class RiskCheckViewSet(viewsets.ModelViewSet):
+class RiskCheckViewSet(ReplicaReadMixin, ConditionalGetMixin, ArchiveReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    archive_record_type = 'risk_check'
     serializer_class = RiskCheckRecordSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return RiskCheckRecord.objects.filter(user=self.request.user)
+        return RiskCheckRecord.objects.for_user(self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        # Kept out of the population-level knowledge table
+        serializer.save(user=self.request.user, source='manual')
 
 
-class SymptomAnalysisViewSet(viewsets.ModelViewSet):
+class SymptomAnalysisViewSet(ReplicaReadMixin, ConditionalGetMixin, ArchiveReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    archive_record_type = 'symptom_analysis'
     serializer_class = SymptomAnalysisSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return SymptomAnalysis.objects.filter(user=self.request.user)
+        return SymptomAnalysis.objects.for_user(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+class ChatMessageViewSet(ReplicaReadMixin, ConditionalGetMixin, ArchiveReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    archive_record_type = 'chat_message'
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return ChatMessage.objects.filter(user=self.request.user)
+        return ChatMessage.objects.for_user(self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class HealthAlertViewSet(viewsets.ModelViewSet):
+class HealthAlertViewSet(ReplicaReadMixin, ConditionalGetMixin, ValuesListMixin, viewsets.ModelViewSet):
     serializer_class = HealthAlertSerializer
     permission_classes = [IsAuthenticated]
 
@@ -94,12 +268,26 @@ class HealthAlertViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        HealthAlert.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        with transaction.atomic():
+            HealthAlert.objects.filter(user=request.user, is_read=False).update(
+                is_read=True, updated_at=timezone.now()
+            )
+            reset_unread_alert_count(request.user.id)
         return Response({'status': 'success'})
 
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """
+        Lightweight badge endpoint answered from the denormalized counter
+        """
+        return Response({'unread_count': get_unread_alert_count(request.user)})
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([DrugRiskThrottle])
+@recorded(ENDPOINT_DRUG_RISK)
+@idempotent('check-drug-risk')
 def check_drug_risk(request):
     """
     Check drug risk based on user allergies using AI analysis
@@ -115,20 +303,79 @@ def check_drug_risk(request):
         
         # Combine with provided allergies
         all_allergies = list(set(known_allergies + user_allergies))
+        checked_key = allergen_key(all_allergies)
+        note_inputs(request, drug_name=drug_name, allergies=sorted(all_allergies))
+        
+        # Common drug/allergen combinations are answered from the
+        # population-level knowledge table without an AI call
+        known_result = lookup_drug_risk(drug_name, all_allergies)
+        if known_result:
+            record_cache_hit('drug_risk', 'knowledge', user_id=request.user.id)
+            risk_record = record_later(
+                RiskCheckRecord,
+                user=request.user,
+                drug_name=drug_name,
+                risk_level=known_result['risk_level'],
+                potential_reactions=known_result['potential_reactions'],
+                recommendations='\n'.join(known_result['recommendations']),
+                source='knowledge',
+                allergen_key=checked_key
+            )
+            
+            return Response({
+                'risk_level': known_result['risk_level'],
+                'potential_reactions': known_result['potential_reactions'],
+                'recommendations': known_result['recommendations'],
+                'ai_analysis': '',
+                'record_id': risk_record.id,
+                'source': 'knowledge'
+            })
+        
+        # Medications the user already takes may have been resolved by the
+        # login warm-up
+        warmed_result = warmed_drug_risk(request.user.id, drug_name, all_allergies)
+        if warmed_result:
+            record_cache_hit('drug_risk', 'warm', user_id=request.user.id)
+            risk_record = record_later(
+                RiskCheckRecord,
+                user=request.user,
+                drug_name=drug_name,
+                risk_level=warmed_result['risk_level'],
+                potential_reactions=warmed_result['potential_reactions'],
+                recommendations='\n'.join(warmed_result['recommendations']),
+                source='ai',
+                allergen_key=checked_key
+            )
+            
+            return Response({
+                'risk_level': warmed_result['risk_level'],
+                'potential_reactions': warmed_result['potential_reactions'],
+                'recommendations': warmed_result['recommendations'],
+                'ai_analysis': '',
+                'record_id': risk_record.id,
+                'source': 'ai'
+            })
         
         # Use AI for comprehensive drug risk analysis
         try:
-            ai_service = GeminiAIService()
-            analysis_result = ai_service.analyze_drug_risk(drug_name, all_allergies)
+            ai_service = GeminiAIService(user_id=request.user.id)
+            analysis_result = get_scheduler().run(
+                PRIORITY_DRUG_RISK, client_key(request),
+                ai_service.analyze_drug_risk, drug_name, all_allergies
+            )
             
             if analysis_result:
+                source = 'fallback' if analysis_result.get('fallback') else 'ai'
                 # Save the risk check record
-                risk_record = RiskCheckRecord.objects.create(
+                risk_record = record_later(
+                    RiskCheckRecord,
                     user=request.user,
                     drug_name=drug_name,
                     risk_level=analysis_result['risk_level'],
                     potential_reactions=analysis_result['potential_reactions'],
-                    recommendations='\n'.join(analysis_result['recommendations'])
+                    recommendations='\n'.join(analysis_result['recommendations']),
+                    source=source,
+                    allergen_key=checked_key
                 )
                 
                 return Response({
@@ -136,7 +383,8 @@ def check_drug_risk(request):
                     'potential_reactions': analysis_result['potential_reactions'],
                     'recommendations': analysis_result['recommendations'],
                     'ai_analysis': analysis_result.get('analysis', ''),
-                    'record_id': risk_record.id
+                    'record_id': risk_record.id,
+                    'source': source
                 })
             else:
                 return Response({'error': 'Failed to analyze drug risk'}, status=500)
@@ -147,12 +395,15 @@ def check_drug_risk(request):
             potential_reactions = ['Consult healthcare provider for personalized risk assessment']
             recommendations = ['Please consult with a healthcare professional before taking this medication']
             
-            risk_record = RiskCheckRecord.objects.create(
+            risk_record = record_later(
+                RiskCheckRecord,
                 user=request.user,
                 drug_name=drug_name,
                 risk_level=risk_level,
                 potential_reactions=potential_reactions,
-                recommendations='\n'.join(recommendations)
+                recommendations='\n'.join(recommendations),
+                source='fallback',
+                allergen_key=checked_key
             )
             
             return Response({
@@ -166,8 +417,51 @@ def check_drug_risk(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+URGENT_ANALYSIS_PENDING = (
+    "Your symptoms may indicate a medical emergency. Follow the urgent guidance now; "
+    "a detailed analysis will be added to this record shortly."
+)
+
+
+def llm_verdict(result):
+    """The LLM's own classification, stored next to the triage one as a training label"""
+    classification = result.get('classification')
+    if classification not in CLASSIFICATIONS:
+        return {}
+    try:
+        confidence = float(result.get('confidence_score'))
+    except (TypeError, ValueError):
+        confidence = None
+    return {'llm_classification': classification, 'llm_confidence_score': confidence}
+
+
+def complete_urgent_analysis(analysis_id, user_key, symptoms, medications, user_id=None):
+    """Fill in the LLM write-up for an analysis that was answered by triage"""
+    result = get_scheduler().run(
+        PRIORITY_SYMPTOMS, user_key,
+        GeminiAIService(user_id=user_id).analyze_symptoms, symptoms, medications
+    )
+    detail = result.get('ai_analysis') or result.get('analysis')
+    if not detail or 'error' in result:
+        return
+    recommendations = URGENT_GUIDANCE + [
+        r for r in result.get('recommendations', []) if r not in URGENT_GUIDANCE
+    ]
+    # The placeholder row may still be in the write-behind queue
+    flush_pending()
+    SymptomAnalysis.objects.for_user(user_id).filter(pk=analysis_id).update(
+        ai_analysis=detail,
+        recommendations='\n'.join(recommendations),
+        **llm_verdict(result),
+        updated_at=timezone.now()
+    )
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([SymptomAnalysisThrottle])
+@recorded(ENDPOINT_SYMPTOMS)
+@idempotent('analyze-symptoms')
 def analyze_symptoms(request):
     """
     Analyze symptoms for potential allergic reactions or side effects using AI
@@ -176,41 +470,83 @@ def analyze_symptoms(request):
     if serializer.is_valid():
         symptoms = serializer.validated_data['symptoms']
         medications = serializer.validated_data.get('current_medications', [])
+        note_inputs(request, symptoms=symptoms, medications=medications)
+        
+        # Local triage classifies instantly; high-severity patterns get urgent
+        # guidance right away and the LLM write-up follows in the background
+        triage = triage_symptoms(symptoms)
+        if triage.urgent:
+            analysis = record_later(
+                SymptomAnalysis,
+                user=request.user,
+                symptoms=symptoms,
+                classification=triage.classification,
+                confidence_score=triage.confidence_score,
+                ai_analysis=URGENT_ANALYSIS_PENDING,
+                recommendations='\n'.join(URGENT_GUIDANCE)
+            )
+            run_in_background(
+                complete_urgent_analysis, analysis.id, client_key(request), symptoms, medications,
+                user_id=request.user.id
+            )
+            
+            return Response({
+                'classification': triage.classification,
+                'confidence_score': triage.confidence_score,
+                'ai_analysis': URGENT_ANALYSIS_PENDING,
+                'recommendations': URGENT_GUIDANCE,
+                'analysis_id': analysis.id,
+                'urgent': True,
+                'triage': triage.as_dict()
+            })
         
-        # Use AI for comprehensive symptom analysis
+        # The classification is the local one; the LLM only writes the detailed analysis
         try:
-            ai_service = GeminiAIService()
-            analysis_result = ai_service.analyze_symptoms(symptoms, medications)
+            ai_service = GeminiAIService(user_id=request.user.id)
+            analysis_result = get_scheduler().run(
+                PRIORITY_SYMPTOMS, client_key(request),
+                ai_service.analyze_symptoms, symptoms, medications
+            )
             
             if analysis_result:
+                ai_analysis = analysis_result.get('ai_analysis', analysis_result.get('analysis', ''))
+                verdict = llm_verdict(analysis_result)
+                if verdict:
+                    note_model_verdict(request, classification=verdict['llm_classification'],
+                                       confidence_score=verdict['llm_confidence_score'])
                 # Save the analysis
-                analysis = SymptomAnalysis.objects.create(
+                analysis = record_later(
+                    SymptomAnalysis,
                     user=request.user,
                     symptoms=symptoms,
-                    classification=analysis_result['classification'],
-                    confidence_score=analysis_result['confidence_score'],
-                    ai_analysis=analysis_result['analysis'],
-                    recommendations='\n'.join(analysis_result['recommendations'])
+                    classification=triage.classification,
+                    confidence_score=triage.confidence_score,
+                    ai_analysis=ai_analysis,
+                    recommendations='\n'.join(analysis_result['recommendations']),
+                    **verdict
                 )
                 
                 return Response({
-                    'classification': analysis_result['classification'],
-                    'confidence_score': analysis_result['confidence_score'],
-                    'ai_analysis': analysis_result['analysis'],
+                    'classification': triage.classification,
+                    'confidence_score': triage.confidence_score,
+                    'ai_analysis': ai_analysis,
                     'recommendations': analysis_result['recommendations'],
-                    'analysis_id': analysis.id
+                    'analysis_id': analysis.id,
+                    'urgent': False,
+                    'triage': triage.as_dict()
                 })
             else:
                 return Response({'error': 'Failed to analyze symptoms'}, status=500)
                 
         except Exception as e:
-            # Fallback to basic analysis if AI fails
-            classification = 'unrelated'
-            confidence = 0.5
+            # Fall back to the local triage result if AI fails
+            classification = triage.classification
+            confidence = triage.confidence_score
             ai_analysis = "Basic analysis - Please consult a healthcare professional"
             recommendations = ["Consult with a healthcare professional for proper diagnosis"]
             
-            analysis = SymptomAnalysis.objects.create(
+            analysis = record_later(
+                SymptomAnalysis,
                 user=request.user,
                 symptoms=symptoms,
                 classification=classification,
@@ -224,7 +560,9 @@ def analyze_symptoms(request):
             'confidence_score': confidence,
             'ai_analysis': ai_analysis,
             'recommendations': recommendations,
-            'analysis_id': analysis.id
+            'analysis_id': analysis.id,
+            'urgent': False,
+            'triage': triage.as_dict()
         })
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -232,6 +570,9 @@ def analyze_symptoms(request):
 
 @api_view(['POST'])
 @permission_classes([])  # Allow unauthenticated access for development
+@throttle_classes([AIChatThrottle])
+@recorded(ENDPOINT_CHAT)
+@idempotent('chat')
 def chat_with_ai(request):
     """
     Chat with AI health assistant using Gemini AI
@@ -247,23 +588,44 @@ def chat_with_ai(request):
         if request.user.is_authenticated:
             user_allergies = list(Allergy.objects.filter(user=request.user).values_list('name', flat=True))
             user_medications = list(Medication.objects.filter(user=request.user).values_list('name', flat=True))
+        note_inputs(request, message=message, message_type=message_type,
+                    allergies=user_allergies, medications=user_medications)
+        
+        # Questions without user-specific context can be answered from the
+        # near-duplicate cache of earlier answers
+        chat_cache = None
+        if not user_allergies and not user_medications:
+            chat_cache = get_chat_cache()
+        response_text = chat_cache.get(message_type, message) if chat_cache is not None else None
+        if response_text is not None:
+            record_cache_hit('chat', 'hit', user_id=request.user.id)
         
         # Use AI for intelligent health assistance
-        try:
-            ai_service = GeminiAIService()
-            response_text = ai_service.chat_health_assistant(message, user_allergies, user_medications)
-            
-            if not response_text:
-                response_text = "I'm here to help with your health questions. Please try rephrasing your question or consult a healthcare professional for specific medical advice."
+        if response_text is None:
+            try:
+                ai_service = GeminiAIService(user_id=request.user.id)
+                # Emergency questions take the scheduler's fast lane
+                priority = PRIORITY_EMERGENCY if message_type == 'emergency' else PRIORITY_CHAT
+                response_text = get_scheduler().run(
+                    priority, client_key(request),
+                    ai_service.chat_health_assistant,
+                    message, user_allergies, user_medications, message_type
+                )
                 
-        except Exception as e:
-            # Fallback response if AI fails
-            response_text = "I'm currently unable to provide a detailed response. For important health questions, please consult with a healthcare professional."
+                if not response_text:
+                    response_text = "I'm here to help with your health questions. Please try rephrasing your question or consult a healthcare professional for specific medical advice."
+                elif chat_cache is not None and response_text != CHAT_UNAVAILABLE_MESSAGE:
+                    chat_cache.set(message_type, message, response_text)
+                    
+            except Exception as e:
+                # Fallback response if AI fails
+                response_text = "I'm currently unable to provide a detailed response. For important health questions, please consult with a healthcare professional."
         
         # Save the chat message (only if user is authenticated)
         message_id = None
         if request.user.is_authenticated:
-            chat_message = ChatMessage.objects.create(
+            chat_message = record_later(
+                ChatMessage,
                 user=request.user,
                 message=message,
                 response=response_text,
@@ -282,33 +644,100 @@ def chat_with_ai(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@replica_reads
 def health_summary(request):
     """
     Get comprehensive health summary for user
     """
     user = request.user
     
-    # Get or create user profile
-    try:
-        profile = UserProfile.objects.get(user=user)
-    except UserProfile.DoesNotExist:
-        profile = UserProfile.objects.create(user=user)
-    
-    # Get related health data
-    allergies = Allergy.objects.filter(user=user)
-    medications = Medication.objects.filter(user=user, is_active=True)
-    recent_risk_checks = RiskCheckRecord.objects.filter(user=user)[:5]
-    recent_symptom_analyses = SymptomAnalysis.objects.filter(user=user)[:5]
-    unread_alerts = HealthAlert.objects.filter(user=user, is_read=False)
+    # ETag from per-table counts and latest updated_at; an unchanged
+    # summary is answered with 304 before anything below runs
+    versions = summary_versions(user)
+    etag = build_etag(request, versions, user_fingerprint(user))
+    response = not_modified(request, etag)
+    if response is not None:
+        return set_etag(response, etag)
     
-    # Serialize the data
-    data = {
-        'user_profile': UserProfileSerializer(profile).data,
-        'allergies': AllergySerializer(allergies, many=True).data,
-        'medications': MedicationSerializer(medications, many=True).data,
-        'recent_risk_checks': RiskCheckRecordSerializer(recent_risk_checks, many=True).data,
-        'recent_symptom_analyses': SymptomAnalysisSerializer(recent_symptom_analyses, many=True).data,
-        'unread_alerts': HealthAlertSerializer(unread_alerts, many=True).data,
-    }
+    # Built earlier by the login warm-up, or by a previous request
+    data = cached_summary(user, versions)
+    if data is not None:
+        return set_etag(Response(data), etag)
     
+    data, profile_created = build_summary(user)
+    if not profile_created:
+        store_summary(user, versions, data)
+        return set_etag(Response(data), etag)
     return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """
+    Delta sync: rows created, updated or deleted since the given sync token.
+    Omit ``since`` for a full download; store the returned ``sync_token``
+    for the next call.
+    """
+    token = request.query_params.get('since')
+    try:
+        since = decode_token(token) if token else None
+    except InvalidSyncToken as exc:
+        return Response({'since': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(changes_since(request.user, since))
+
+
+
+def _query_int(request, name, default, maximum):
+    """Positive integer query parameter clamped to ``maximum``; None if malformed"""
+    try:
+        value = int(request.query_params.get(name, default))
+    except ValueError:
+        return None
+    return min(value, maximum) if value > 0 else None
+
+
+def _bad_param(name):
+    return Response({name: 'Must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@replica_reads
+def analytics_top_drugs(request):
+    """
+    Most checked drugs over the last ``days`` days, served from the daily rollups
+    """
+    days = _query_int(request, 'days', 30, analytics.get_config()['MAX_DAYS'])
+    if days is None:
+        return _bad_param('days')
+    limit = _query_int(request, 'limit', 20, 100)
+    if limit is None:
+        return _bad_param('limit')
+    return Response({'days': days, 'results': analytics.top_drugs(days, limit)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@replica_reads
+def analytics_risk_distribution(request):
+    """
+    Risk checks per day by risk level over the last ``days`` days
+    """
+    days = _query_int(request, 'days', 30, analytics.get_config()['MAX_DAYS'])
+    if days is None:
+        return _bad_param('days')
+    return Response({'days': days, 'results': analytics.risk_distribution(days)})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@replica_reads
+def analytics_symptom_trends(request):
+    """
+    Symptom analyses per day by classification over the last ``days`` days
+    """
+    days = _query_int(request, 'days', 30, analytics.get_config()['MAX_DAYS'])
+    if days is None:
+        return _bad_param('days')
+    return Response({'days': days, 'results': analytics.symptom_trends(days)})
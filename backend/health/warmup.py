@@ -0,0 +1,90 @@
+"""
+Background cache warm-up after login and registration.
+
+``schedule_warmup(user)`` queues ``warm_user`` on the background pool, off
+the auth response. It builds the user's health summary into the shared cache
+and resolves drug risk for up to ``MAX_MEDICATIONS`` active medications
+against the user's current allergies. Combinations the knowledge table
+already answers are skipped. The rest go to Gemini at the scheduler's lowest
+priority and are kept for ``DRUG_RISK_TTL`` seconds, so ``check-drug-risk``
+can answer a medication the user already takes without waiting for the model.
+"""
+import hashlib
+
+from django.contrib.auth.models import User
+
+from .ai_scheduler import PRIORITY_WARMUP, SchedulerBusy, get_scheduler
+from .background import run_in_background
+from .gemini_service import GeminiAIService
+from .knowledge import canonical_drug, lookup
+from .models import Allergy, Medication, UserProfile
+from .summary import (
+    build_summary, cached_summary, get_cache, get_config, store_summary, summary_versions
+)
+
+
+def drug_risk_cache_key(user_id, drug_name, allergies):
+    allergy_set = sorted({a.strip().lower() for a in allergies if a and a.strip()})
+    digest = hashlib.blake2b('|'.join(allergy_set).encode('utf-8'), digest_size=12).hexdigest()
+    drug = hashlib.blake2b(canonical_drug(drug_name).encode('utf-8'), digest_size=12).hexdigest()
+    return f'health:drug-risk:{user_id}:{drug}:{digest}'
+
+
+def warmed_drug_risk(user_id, drug_name, allergies):
+    """A drug risk result resolved by the warm-up, or None"""
+    if not get_config()['ENABLED']:
+        return None
+    return get_cache().get(drug_risk_cache_key(user_id, drug_name, allergies))
+
+
+def warm_summary(user):
+    # A new user's profile is created here rather than by the first request
+    UserProfile.objects.get_or_create(user=user)
+    versions = summary_versions(user)
+    if cached_summary(user, versions) is None:
+        data, _ = build_summary(user)
+        store_summary(user, versions, data)
+
+
+def warm_drug_risks(user):
+    config = get_config()
+    allergies = list(Allergy.objects.filter(user=user).values_list('name', flat=True))
+    medications = (Medication.objects.filter(user=user, is_active=True)
+                   .order_by('-updated_at').values_list('name', flat=True)[:config['MAX_MEDICATIONS']])
+    cache = get_cache()
+    service = GeminiAIService(user_id=user.pk, operation='warmup')
+    resolved = 0
+    for drug_name in medications:
+        key = drug_risk_cache_key(user.pk, drug_name, allergies)
+        if lookup(drug_name, allergies) is not None or cache.get(key) is not None:
+            continue
+        try:
+            result = get_scheduler().run(
+                PRIORITY_WARMUP, user.pk, service.analyze_drug_risk, drug_name, allergies
+            )
+        except SchedulerBusy:
+            # Live traffic has the capacity; the rest resolve on demand
+            break
+        if result.get('fallback'):
+            continue
+        cache.set(key, {
+            'risk_level': result['risk_level'],
+            'potential_reactions': result['potential_reactions'],
+            'recommendations': result['recommendations'],
+        }, config['DRUG_RISK_TTL'])
+        resolved += 1
+    return resolved
+
+
+def warm_user(user_id):
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    warm_summary(user)
+    if get_config()['RESOLVE_DRUG_RISK']:
+        warm_drug_risks(user)
+
+
+def schedule_warmup(user):
+    if get_config()['ENABLED']:
+        run_in_background(warm_user, user.pk)
@@ -0,0 +1,350 @@
+"""
+Write-behind persistence for AI result records.
+
+``record_later(model, **fields)`` gives the row its final primary key,
+appends it to a per-process spool file and returns the unsaved instance, so
+the response does not wait for the INSERT. A flusher thread writes queued
+rows in batched transactions every ``FLUSH_INTERVAL`` seconds (sooner when
+``MAX_BATCH`` rows are waiting), and everything left is flushed at exit.
+
+Primary keys come from blocks reserved by bumping the table's entry in
+``sqlite_sequence``. Django creates SQLite primary keys as AUTOINCREMENT, so
+ordinary inserts never reuse a reserved id. Rows keep the ``auto_now_add``
+timestamps they were given at request time, while ``auto_now`` fields such
+as ``updated_at`` are stamped when the row is actually inserted, so delta sync
+(which filters on ``updated_at``) still picks up rows written late or
+replayed after a crash. Each spool file is deleted once its rows are
+committed. The process that creates a spool holds an exclusive ``flock`` on
+it until then, so a spool nobody has locked was left behind by a crashed
+process. Those are replayed (idempotently, by primary
+key) when the next buffer starts or by ``python manage.py flush_write_behind``.
+
+Other database backends, or ``ENABLED = False``, fall back to a synchronous
+``create_record``.
+"""
+import atexit
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from itertools import count
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connection, connections, router
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from .analytics import record_rows
+from .db import create_record, reserve_ids, write_with_retry
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    return settings.HEALTH_WRITE_BEHIND
+
+
+def _spool_name(filename):
+    """(pid, token, seq) for a spool file name, or None for anything else"""
+    if not filename.endswith('.jsonl'):
+        return None
+    try:
+        pid, token, seq = filename[:-len('.jsonl')].split('-')
+        return int(pid), token, int(seq)
+    except ValueError:
+        return None
+
+
+def _try_lock(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+def encode_row(instance):
+    fields = {f.attname: f.value_from_object(instance) for f in instance._meta.concrete_fields}
+    return json.dumps({'model': instance._meta.label_lower, 'fields': fields},
+                      cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def decode_row(line):
+    data = json.loads(line)
+    model = apps.get_model(data['model'])
+    values = {
+        f.attname: f.to_python(data['fields'][f.attname])
+        for f in model._meta.concrete_fields
+        if f.attname in data['fields']
+    }
+    return model(**values)
+
+
+def insert_rows(instances):
+    """
+    Insert rows that already carry their primary keys.
+
+    ``auto_now`` fields are set to the insert time; a raw insert keeps the
+    request-time ``auto_now_add`` values (bulk_create would overwrite them)
+    and conflicts on the primary key are ignored, so replaying a spool twice
+    is harmless. Rows are counted for analytics only once every alias has
+    been written: when a later alias fails the caller retries the whole batch.
+    """
+    now = timezone.now()
+    by_target = {}
+    for instance in instances:
+        model = type(instance)
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                setattr(instance, field.attname, now)
+        # History rows go to their user's shard
+        alias = router.db_for_write(model, instance=instance)
+        by_target.setdefault(alias, {}).setdefault(model, []).append(instance)
+
+    written = []
+    for alias, by_model in by_target.items():
+        def write(alias=alias, by_model=by_model):
+            for model, rows in by_model.items():
+                fields = model._meta.concrete_fields
+                batch_size = max(connections[alias].ops.bulk_batch_size(fields, rows), 1)
+                for start in range(0, len(rows), batch_size):
+                    model._base_manager._insert(
+                        rows[start:start + batch_size], fields=fields, raw=True,
+                        on_conflict=OnConflict.IGNORE, using=alias,
+                    )
+
+        try:
+            write_with_retry(write, using=alias)
+        except IntegrityError:
+            # A bad row (e.g. its user was deleted meanwhile) must not sink the batch
+            for model, rows in by_model.items():
+                for row in rows:
+                    try:
+                        _insert_one(row, alias)
+                    except IntegrityError:
+                        logger.warning("Dropping write-behind %s #%s: integrity error", model.__name__, row.pk)
+                    else:
+                        written.append(row)
+        else:
+            written.extend(row for rows in by_model.values() for row in rows)
+    record_rows(written)
+
+
+def _insert_one(instance, alias):
+    write_with_retry(lambda: type(instance)._base_manager._insert(
+        [instance], fields=instance._meta.concrete_fields, raw=True, on_conflict=OnConflict.IGNORE,
+        using=alias,
+    ), using=alias)
+
+
+def _unwritten(instances):
+    """Drop rows already committed before the crash, so analytics count each row once"""
+    by_target = {}
+    for instance in instances:
+        model = type(instance)
+        alias = router.db_for_write(model, instance=instance)
+        by_target.setdefault((alias, model), []).append(instance)
+    existing = set()
+    for (alias, model), rows in by_target.items():
+        pks = [row.pk for row in rows]
+        for start in range(0, len(pks), 500):
+            found = model._base_manager.using(alias).filter(pk__in=pks[start:start + 500]).values_list('pk', flat=True)
+            existing.update((model, pk) for pk in found)
+    return [instance for instance in instances if (type(instance), instance.pk) not in existing]
+
+
+def recover_spools(spool_dir=None):
+    """Replay spool files left by processes that are no longer running"""
+    spool_dir = spool_dir or get_config()['SPOOL_DIR']
+    if not os.path.isdir(spool_dir):
+        return 0
+    replayed = 0
+    for filename in sorted(os.listdir(spool_dir)):
+        if _spool_name(filename) is None:
+            continue
+        path = os.path.join(spool_dir, filename)
+        try:
+            fh = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            continue  # committed and removed by its owner meanwhile
+        with fh:
+            # Locked: its process is alive and still owns it. Unlinked after
+            # we opened it: its rows are committed.
+            if not _try_lock(fh.fileno()) or os.fstat(fh.fileno()).st_nlink == 0:
+                continue
+            rows = []
+            for line in fh:
+                try:
+                    rows.append(decode_row(line))
+                except (ValueError, KeyError, LookupError):
+                    # Torn final line from a crash mid-append
+                    logger.warning("Skipping unreadable line in %s", path)
+            rows = _unwritten(rows)
+            if rows:
+                insert_rows(rows)
+            os.unlink(path)
+        replayed += len(rows)
+    return replayed
+
+
+class WriteBehindBuffer:
+
+    def __init__(self, spool_dir, flush_interval, max_batch, id_block, fsync=False):
+        self.spool_dir = spool_dir
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.id_block = id_block
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._pending = []
+        self._ids = {}  # model -> (next id, end of reserved block)
+        # Unique per buffer, so a restarted process that reuses a PID never
+        # touches a spool of its predecessor
+        self._spool_token = uuid.uuid4().hex
+        self._spool_seq = count()
+        self._spool_fd = None
+        self._spool_path = None
+        self._closed_spools = []  # (path, fd), kept open and locked until committed
+        os.makedirs(spool_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='health-write-behind', daemon=True)
+        self._thread.start()
+
+    def _next_id(self, model):
+        next_id, end = self._ids.get(model, (0, 0))
+        if next_id >= end:
+            next_id = reserve_ids(model, self.id_block)
+            end = next_id + self.id_block
+        self._ids[model] = (next_id + 1, end)
+        return next_id
+
+    def _open_spool(self):
+        name = f'{os.getpid()}-{self._spool_token}-{next(self._spool_seq)}.jsonl'
+        path = os.path.join(self.spool_dir, name)
+        # Created and locked under a name recovery ignores, then renamed, so
+        # recovery never sees it unlocked
+        fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(path + '.tmp', path)
+        return path, fd
+
+    def _append(self, line):
+        if self._spool_fd is None:
+            self._spool_path, self._spool_fd = self._open_spool()
+        os.write(self._spool_fd, (line + '\n').encode('utf-8'))
+        if self.fsync:
+            os.fsync(self._spool_fd)
+
+    def add(self, model, **fields):
+        instance = model(**fields)
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                setattr(instance, field.attname, now)
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError('write-behind buffer is shut down')
+            instance.pk = self._next_id(model)
+            self._append(encode_row(instance))
+            self._pending.append(instance)
+            if len(self._pending) >= self.max_batch:
+                self._wake.set()
+        return instance
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+                if self._spool_fd is not None:
+                    self._closed_spools.append((self._spool_path, self._spool_fd))
+                    self._spool_fd = self._spool_path = None
+            if not batch:
+                return 0
+            try:
+                insert_rows(batch)
+            except Exception:
+                with self._lock:
+                    self._pending = batch + self._pending
+                raise
+            # Every row in these spools is now committed; unlink before
+            # releasing the lock
+            for path, fd in self._closed_spools:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                os.close(fd)
+            self._closed_spools = []
+            return len(batch)
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; will retry")
+                connections['default'].close()
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+        self._wake.set()
+        self._thread.join(timeout=self.flush_interval * 10)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {'pending': len(self._pending)}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """Process-wide buffer, or None when write-behind is off"""
+    global _buffer
+    config = get_config()
+    if not config['ENABLED'] or connection.vendor != 'sqlite':
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                recover_spools(config['SPOOL_DIR'])
+                _buffer = WriteBehindBuffer(
+                    spool_dir=config['SPOOL_DIR'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_batch=config['MAX_BATCH'],
+                    id_block=config['ID_BLOCK'],
+                    fsync=config['FSYNC'],
+                )
+                atexit.register(_buffer.shutdown)
+    return _buffer
+
+
+def record_later(model, **fields):
+    """
+    Persist a new row without waiting for the INSERT; the returned instance
+    already has its final primary key. Inside a transaction, or with
+    write-behind off, this is a synchronous ``create_record``.
+    """
+    buffer = get_write_buffer()
+    if buffer is None or connection.in_atomic_block:
+        return create_record(model, **fields)
+    return buffer.add(model, **fields)
+
+
+def flush_pending():
+    """Make sure every queued row is in the database (e.g. before updating one)"""
+    buffer = get_write_buffer()
+    if buffer is not None:
+        buffer.flush()